@@ -9,7 +9,7 @@ from urllib.parse import urlencode
 
 import flask
 import statsd
-from flask import Flask, session, jsonify, request
+from flask import Flask, session, request
 from flask_cache import Cache
 from flask_cors import CORS
 from flask_jwt import JWT
@@ -17,9 +17,14 @@ from flask_login import LoginManager
 from flask_oauthlib.contrib.oauth2 import bind_cache_grant
 from flask_oauthlib.provider import OAuth2Provider
 
+from api import compression, json_encoding, prometheus
 from api.deployment.deployment_manager import DeploymentManager
 from api.error import ApiException
+from api.instrumentation import metrics
 from api.jwt_user import JwtUser
+from api.profiler import profiler
+from api.response_cache import DatabaseTagVersions, ResponseCache
+from api.slow_queries import slow_query_log
 from api.user import User, UserGroup
 
 __version__ = '0.7.0'
@@ -44,12 +49,20 @@ login_manager.init_app(app)
 
 _make_response = app.make_response
 
+
+def json_response(data):
+    """
+    Like `flask.jsonify`, but never pretty-printed, see `json_encoding`.
+    """
+    return app.response_class(json_encoding.dumps(data), mimetype='application/json')
+
+
 @app.after_request
 def after_request(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
     response.headers['Access-Control-Allow-Methods'] = 'GET,PUT,POST,DELETE'
-    return response
+    return compression.compress_response(response, request.accept_encodings)
 
 @app.errorhandler(ApiException)
 def handle_api_exception(error):
@@ -62,7 +75,7 @@ def handle_api_exception(error):
         'application/vnd.api+json',
         )
     if mt.startswith('application'):
-        response = jsonify(error.to_dict())
+        response = json_response(error.to_dict())
         response.status_code = error.status_code
         response.headers['content-type'] = mt
         return response
@@ -91,6 +104,11 @@ def default_cache_key():
         [(k, v) for k in sorted(args) for v in sorted(args.getlist(k))])
     return key
 
+
+# Caches responses of public GET endpoints; configured in `api_init`
+response_cache = ResponseCache(default_cache_key)
+
+
 def jwt_identity(payload):
     return User.get_by_id(payload['identity'])
 
@@ -105,14 +123,14 @@ def make_response_json(rv):
     if isinstance(rv, app.response_class):
         return rv
     if isinstance(rv, dict):
-        response = jsonify(rv)
+        response = json_response(rv)
         response.headers['content-type'] = 'application/vnd.api+json'
         return response
     elif isinstance(rv, tuple):
         values = dict(zip(['response', 'status', 'headers'], rv))
         response, status, headers = values.get('response', ''), values.get('status', 200), values.get('headers', [])
         if isinstance(response, dict):
-            response = jsonify(values['response'])
+            response = json_response(values['response'])
         else:
             response = _make_response(response)
         response.status_code = values.get('status', 200)
@@ -153,21 +171,46 @@ def api_init():
     app.secret_key = app.config['FLASK_LOGIN_SECRET_KEY']
     flask_jwt.init_app(app)
     cache.init_app(app)
+    app.extensions['cache'][cache] = prometheus.CountingCache(app.extensions['cache'][cache], 'flask_cache',
+                                                              prometheus.cache_requests)
+    prometheus.registry.configure(directory=app.config.get('PROMETHEUS_MULTIPROCESS_DIR'))
+    slow_query_log.configure(threshold=app.config.get('SLOW_QUERY_THRESHOLD'),
+                             explain=app.config.get('SLOW_QUERY_EXPLAIN'))
+    response_cache.configure(max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES'),
+                             default_timeout=app.config.get('RESPONSE_CACHE_TIMEOUT'),
+                             stale_timeout=app.config.get('RESPONSE_CACHE_STALE_TIMEOUT'),
+                             tag_versions=DatabaseTagVersions(),
+                             sync_interval=app.config.get('RESPONSE_CACHE_SYNC_INTERVAL'))
 
 
     if app.config.get('STATSD_SERVER'):
         host, port = app.config['STATSD_SERVER'].split(':')
-        stats = statsd.StatsClient(host, port)
+        metrics.configure(statsd.StatsClient(host, port))
+
+    @app.before_request
+    def before_req():
+        request._start_time = time.time()
+
+    @app.after_request
+    def after_req(response):
+        duration = time.time() - request._start_time
+        prometheus.request_duration.observe(duration, request.endpoint or 'unknown', str(response.status_code))
+        prometheus.registry.start_writer()
+        metrics.record_request(request.endpoint, response.status_code, duration * 1000, response.content_length)
+        return response
+
+    if app.config.get('PROFILER_SAMPLE_RATE'):
+        profiler.configure(sample_rate=app.config['PROFILER_SAMPLE_RATE'],
+                           interval=app.config.get('PROFILER_INTERVAL'))
 
         @app.before_request
-        def before_req():
-            request._start_time = time.time()
+        def start_profiling():
+            profiler.start_request(request.endpoint)
+
+        @app.teardown_request
+        def stop_profiling(exception):
+            profiler.stop_request()
 
-        @app.after_request
-        def after_req(response):
-            stats.timing('api.request', (time.time()-request._start_time)*1000)
-            return response
-            
 
 # ======== Init OAuth =======
 
@@ -182,7 +225,8 @@ def get_current_user():
 oauth = OAuth2Provider(app)
 app.config.update({'OAUTH2_CACHE_TYPE': 'simple'})
 
-bind_cache_grant(app, oauth, get_current_user)
+bind_cache_grant(app, prometheus.CountingGrantProvider(oauth, 'oauth_grant', prometheus.cache_requests),
+                 get_current_user)
 
 # ======== Import (initialize) oauth2 handlers =====
 import api.oauth_handlers
@@ -204,3 +248,4 @@ import api.players
 import api.users_route
 import api.featured_mods
 import api.deployment.routes
+import api.admin
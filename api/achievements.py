@@ -5,57 +5,25 @@ from api import *
 import faf.db as db
 
 from api.error import ApiException, Error, ErrorCode
-from api.query_commons import fetch_data
+from api.message_catalog import MessageCatalog
+from api.query_commons import fetch_data, get_updated_since_filter, get_select_expressions, get_page_attributes, \
+    sort_items, dump_items
 
 MAX_PAGE_SIZE = 1000
 
-ACHIEVERS_COUNT_TABLE = """
-(SELECT count(*) as count FROM login WHERE id IN (SELECT player_id FROM player_achievements)) AS achievers_count
-"""
-
-UNLOCK_STATS_TABLE = """
-(SELECT
-    achievement_id,
-    count(*) AS count,
-    ROUND(MIN(TIMESTAMPDIFF(SECOND, GREATEST(ach.create_time, login.create_time), pa.update_time))) AS min_time,
-    ROUND(AVG(TIMESTAMPDIFF(SECOND, GREATEST(ach.create_time, login.create_time), pa.update_time))) AS avg_time,
-    ROUND(MAX(TIMESTAMPDIFF(SECOND, GREATEST(ach.create_time, login.create_time), pa.update_time))) AS max_time
- FROM achievement_definitions ach
- LEFT JOIN player_achievements pa
-    ON pa.achievement_id = ach.id
- LEFT JOIN login
-    ON login.id = pa.player_id
- WHERE pa.state = 'UNLOCKED'
- GROUP BY achievement_id
-) AS unlock_stats
-"""
+# The unlock stats of the achievements and the number of achievers are kept in summary tables, so listing achievements
+# doesn't need to aggregate the whole player_achievements table on every request, see
+# db_migrations/002_achievement_stats.sql. They're kept up to date by `update_steps`, `unlock_achievement` and
+# `reveal_achievement` and rebuilt by `reconcile_achievement_stats`.
+
+# Unknown (NULL) if the player's login has been deleted
+UNLOCK_TIME_EXPRESSION = 'TIMESTAMPDIFF(SECOND, GREATEST(ach.create_time, login.create_time), pa.update_time)'
 
 ACHIEVEMENTS_TABLE = """achievement_definitions ach
-                LEFT OUTER JOIN messages name_langReg
-                    ON ach.name_key = name_langReg.key
-                        AND name_langReg.language = %(language)s
-                        AND name_langReg.region = %(region)s
-                LEFT OUTER JOIN messages name_lang
-                    ON ach.name_key = name_lang.key
-                        AND name_lang.language = %(language)s
-                LEFT OUTER JOIN messages name_def
-                    ON ach.name_key = name_def.key
-                        AND name_def.language = 'en'
-                        AND name_def.region = 'US'
-                LEFT OUTER JOIN messages desc_langReg
-                    ON ach.description_key = desc_langReg.key
-                        AND desc_langReg.language = %(language)s
-                        AND desc_langReg.region = %(region)s
-                LEFT OUTER JOIN messages desc_lang
-                    ON ach.description_key = desc_lang.key
-                        AND desc_lang.language = %(language)s
-                LEFT OUTER JOIN messages desc_def
-                    ON ach.description_key = desc_def.key
-                        AND desc_def.language = 'en'
-                        AND desc_def.region = 'US'
-                LEFT OUTER JOIN """ + UNLOCK_STATS_TABLE + """
-                     ON unlock_stats.achievement_id = ach.id,
-                """ + ACHIEVERS_COUNT_TABLE
+                LEFT OUTER JOIN achievement_unlock_stats unlock_stats
+                    ON unlock_stats.achievement_id = ach.id
+                LEFT OUTER JOIN achievers_count
+                    ON achievers_count.id = 1"""
 
 ACHIEVEMENT_SELECT_EXPRESSIONS = {
     'id': 'ach.id',
@@ -66,16 +34,22 @@ ACHIEVEMENT_SELECT_EXPRESSIONS = {
     'unlocked_icon_url': 'ach.unlocked_icon_url',
     'experience_points': 'ach.experience_points',
     'initial_state': 'ach.initial_state',
-    'name': 'COALESCE(name_langReg.value, name_lang.value, name_def.value)',
-    'description': 'COALESCE(desc_langReg.value, desc_lang.value, desc_def.value)',
-    'create_time': 'create_time',
+    # name and description are resolved to the requested language by the enricher, see LOCALIZED_FIELDS
+    'name': 'ach.name_key',
+    'description': 'ach.description_key',
+    'create_time': 'ach.create_time',
     'unlockers_count': 'COALESCE(unlock_stats.count, 0)',
     'unlockers_percent': 'COALESCE(ROUND(100 * (unlock_stats.count / achievers_count.count), 2), 0)',
     'unlockers_min_duration': 'unlock_stats.min_time',
-    'unlockers_avg_duration': 'unlock_stats.avg_time',
+    'unlockers_avg_duration': 'ROUND(unlock_stats.sum_time / NULLIF(unlock_stats.timed_count, 0))',
     'unlockers_max_duration': 'unlock_stats.max_time'
 }
 
+# Fields that are only known after localization, so sorting by them happens in memory
+LOCALIZED_FIELDS = ('name', 'description')
+
+message_catalog = MessageCatalog()
+
 PLAYER_ACHIEVEMENT_SELECT_EXPRESSIONS = {
     'id': 'id',
     'achievement_id': 'achievement_id',
@@ -87,6 +61,8 @@ PLAYER_ACHIEVEMENT_SELECT_EXPRESSIONS = {
 
 
 @app.route('/achievements')
+# Unlock statistics change with every unlock, so entries aren't purged but expire quickly
+@response_cache.cached('achievements', timeout=300)
 def achievements_list():
     """
     Lists all achievement definitions.
@@ -139,12 +115,29 @@ def achievements_list():
     language = request.args.get('language', 'en')
     region = request.args.get('region', 'US')
     sort = request.args.get('sort', 'order')
+    enricher = localizer(language, region)
 
-    return fetch_data(AchievementSchema(), ACHIEVEMENTS_TABLE, ACHIEVEMENT_SELECT_EXPRESSIONS, MAX_PAGE_SIZE, request,
-                      args={'language': language, 'region': region}, sort=sort)
+    if not any(field.lstrip('-') in LOCALIZED_FIELDS for field in sort.split(',')):
+        return fetch_data(AchievementSchema(), ACHIEVEMENTS_TABLE, ACHIEVEMENT_SELECT_EXPRESSIONS, MAX_PAGE_SIZE,
+                          request, sort=sort, enricher=enricher)
+
+    page, page_size = get_page_attributes(MAX_PAGE_SIZE, request)
+
+    with db.connection:
+        cursor = db.connection.cursor(db.pymysql.cursors.DictCursor)
+        cursor.execute('SELECT {} FROM {}'.format(get_select_expressions(None, ACHIEVEMENT_SELECT_EXPRESSIONS),
+                                                  ACHIEVEMENTS_TABLE))
+        achievements = list(cursor.fetchall())
+
+    for achievement in achievements:
+        enricher(achievement)
+    sort_items(achievements, sort, ACHIEVEMENT_SELECT_EXPRESSIONS)
+
+    return dump_items(AchievementSchema(), achievements[(page - 1) * page_size:page * page_size], request)
 
 
 @app.route('/achievements/<achievement_id>')
+@response_cache.cached('achievements', timeout=300)
 def achievements_get(achievement_id):
     """
     Gets an achievement definition.
@@ -197,8 +190,22 @@ def achievements_get(achievement_id):
 
     return fetch_data(AchievementSchema(), ACHIEVEMENTS_TABLE, ACHIEVEMENT_SELECT_EXPRESSIONS, MAX_PAGE_SIZE, request,
                       where='ach.id = %(id)s',
-                      args={'id': achievement_id, 'language': language, 'region': region},
-                      many=False)
+                      args={'id': achievement_id},
+                      many=False, enricher=localizer(language, region))
+
+
+def localizer(language, region):
+    """
+    Returns an enricher that replaces the message keys of an achievement with the messages in the given language.
+    """
+
+    def enricher(achievement):
+        if 'name' in achievement:
+            achievement['name'] = message_catalog.get(achievement['name'], language, region)
+        if 'description' in achievement:
+            achievement['description'] = message_catalog.get(achievement['description'], language, region)
+
+    return enricher
 
 
 @app.route('/achievements/<achievement_id>/increment', methods=['POST'])
@@ -449,16 +456,29 @@ def achievements_list_player(player_id):
               "create_time": long,
               "update_time": long
             }
-          ]
+          ],
+          "meta": {
+            "server_time": long
+          }
         }
 
 
     :param player_id: ID of the player.
     :type player_id: int
+    :query long filter[updated_since]: Only returns achievements updated at or after this time (unix timestamp). Use
+        ``meta.server_time`` of the previous response.
     :status 200: No error
     """
-    return fetch_data(PlayerAchievementSchema(), 'player_achievements', PLAYER_ACHIEVEMENT_SELECT_EXPRESSIONS,
-                      MAX_PAGE_SIZE, request, where='player_id = %s', args=player_id)
+    updated_since_where, updated_since_args, server_time = get_updated_since_filter(request)
+
+    where = 'player_id = %s'
+    if updated_since_where:
+        where += ' AND ' + updated_since_where
+
+    result = fetch_data(PlayerAchievementSchema(), 'player_achievements', PLAYER_ACHIEVEMENT_SELECT_EXPRESSIONS,
+                        MAX_PAGE_SIZE, request, where=where, args=(player_id,) + updated_since_args)
+    result['meta'] = {'server_time': server_time}
+    return result
 
 
 def increment_achievement(achievement_id, player_id, steps):
@@ -515,6 +535,9 @@ def update_steps(achievement_id, player_id, steps, steps_function):
             new_current_steps = achievement['total_steps']
             newly_unlocked = player_achievement['state'] != 'UNLOCKED' if player_achievement else True
 
+        if not player_achievement:
+            count_new_achiever(cursor, player_id)
+
         cursor.execute("""INSERT INTO player_achievements (player_id, achievement_id, current_steps, state)
                         VALUES
                             (%(player_id)s, %(achievement_id)s, %(current_steps)s, %(state)s)
@@ -528,6 +551,9 @@ def update_steps(achievement_id, player_id, steps, steps_function):
                            'state': new_state,
                        })
 
+        if newly_unlocked:
+            count_unlock(cursor, achievement_id, player_id)
+
     return dict(current_steps=new_current_steps, current_state=new_state, newly_unlocked=newly_unlocked)
 
 
@@ -565,6 +591,9 @@ def unlock_achievement(achievement_id, player_id):
         newly_unlocked = not player_achievement or player_achievement['state'] != 'UNLOCKED'
 
         if newly_unlocked:
+            if not player_achievement:
+                count_new_achiever(cursor, player_id)
+
             cursor.execute("""INSERT INTO player_achievements (player_id, achievement_id, state)
                             VALUES
                                 (%(player_id)s, %(achievement_id)s, %(state)s)
@@ -576,6 +605,8 @@ def unlock_achievement(achievement_id, player_id):
                                'state': 'UNLOCKED',
                            })
 
+            count_unlock(cursor, achievement_id, player_id)
+
     return dict(newly_unlocked=newly_unlocked)
 
 
@@ -604,6 +635,9 @@ def reveal_achievement(achievement_id, player_id):
 
         new_state = player_achievement['state'] if player_achievement else 'REVEALED'
 
+        if not player_achievement:
+            count_new_achiever(cursor, player_id)
+
         cursor.execute("""INSERT INTO player_achievements (player_id, achievement_id, state)
                         VALUES
                             (%(player_id)s, %(achievement_id)s, %(state)s)
@@ -618,6 +652,80 @@ def reveal_achievement(achievement_id, player_id):
     return dict(current_state=new_state)
 
 
+def count_new_achiever(cursor, player_id):
+    """
+    Increments the number of achievers if the player doesn't have any player achievements yet. Must be called before
+    inserting the player's first player achievement, in the same transaction.
+    """
+    # Locks the player until the transaction ends, so that concurrent updates of the player's achievements can't both
+    # see no player achievements. The check is part of the INSERT, which reads the latest committed rows.
+    cursor.execute("SELECT id FROM login WHERE id = %s FOR UPDATE", player_id)
+    cursor.execute("""INSERT INTO achievers_count (id, count)
+                      SELECT 1, 1 FROM login
+                      WHERE id = %(player_id)s
+                        AND NOT EXISTS (SELECT 1 FROM player_achievements WHERE player_id = %(player_id)s)
+                      ON DUPLICATE KEY UPDATE count = count + 1""", {'player_id': player_id})
+
+
+def count_unlock(cursor, achievement_id, player_id):
+    """
+    Adds an unlock that has just been written to player_achievements to the unlock stats of its achievement.
+    """
+    cursor.execute("""INSERT INTO achievement_unlock_stats
+                        (achievement_id, count, timed_count, sum_time, min_time, max_time)
+                      SELECT
+                        achievement_id, 1, unlock_time IS NOT NULL, COALESCE(unlock_time, 0), unlock_time, unlock_time
+                      FROM (SELECT pa.achievement_id, """ + UNLOCK_TIME_EXPRESSION + """ AS unlock_time
+                            FROM player_achievements pa
+                              JOIN achievement_definitions ach ON ach.id = pa.achievement_id
+                              LEFT JOIN login ON login.id = pa.player_id
+                            WHERE pa.achievement_id = %s AND pa.player_id = %s) unlocked
+                      ON DUPLICATE KEY UPDATE
+                        count = count + 1,
+                        timed_count = timed_count + VALUES(timed_count),
+                        sum_time = sum_time + VALUES(sum_time),
+                        min_time = COALESCE(LEAST(min_time, VALUES(min_time)), min_time, VALUES(min_time)),
+                        max_time = COALESCE(GREATEST(max_time, VALUES(max_time)), max_time, VALUES(max_time))""",
+                   (achievement_id, player_id))
+
+
+def reconcile_achievement_stats():
+    """
+    (Re-)builds the achievement unlock stats and the number of achievers from player_achievements, correcting any
+    drift of the incrementally maintained values, e.g. after player achievements have been deleted.
+    """
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("DELETE FROM achievement_unlock_stats")
+        cursor.execute("""INSERT INTO achievement_unlock_stats
+                            (achievement_id, count, timed_count, sum_time, min_time, max_time)
+                          SELECT
+                            pa.achievement_id,
+                            count(*),
+                            count(""" + UNLOCK_TIME_EXPRESSION + """),
+                            COALESCE(SUM(""" + UNLOCK_TIME_EXPRESSION + """), 0),
+                            MIN(""" + UNLOCK_TIME_EXPRESSION + """),
+                            MAX(""" + UNLOCK_TIME_EXPRESSION + """)
+                          FROM player_achievements pa
+                            JOIN achievement_definitions ach ON ach.id = pa.achievement_id
+                            LEFT JOIN login ON login.id = pa.player_id
+                          WHERE pa.state = 'UNLOCKED'
+                          GROUP BY pa.achievement_id""")
+        achievements = cursor.rowcount
+
+        cursor.execute("DELETE FROM achievers_count")
+        cursor.execute("""INSERT INTO achievers_count (id, count)
+                          SELECT 1, count(*) FROM login WHERE id IN (SELECT player_id FROM player_achievements)""")
+
+        return achievements
+
+
+@app.cli.command('reconcile_achievement_stats')
+def reconcile_achievement_stats_command():
+    """Rebuilds the achievement unlock stats; meant to run periodically, e.g. `FLASK_APP=passenger_wsgi.py flask reconcile_achievement_stats` from cron"""
+    print('Reconciled unlock stats of {} achievements'.format(reconcile_achievement_stats()))
+
+
 def update_multiple(player_id, updates):
     result = dict(updated_achievements=[])
 
@@ -0,0 +1,159 @@
+"""
+Diagnostics endpoints, only accessible to administrators or, in case of ``/metrics``, to scrapers with the metrics
+token.
+"""
+import hmac
+
+from flask import request
+
+from api import app, oauth
+from api.error import ApiException, Error, ErrorCode
+from api.profiler import profiler
+from api.prometheus import registry
+from api.slow_queries import SORT_FIELDS, slow_query_log
+from api.user import User, UserGroup
+
+MAX_SLOW_QUERIES = 100
+
+
+def require_admin():
+    """
+    Raises an `ApiException` unless the request is authorized by an administrator.
+    """
+    valid, req = oauth.verify_request([])
+    if not valid:
+        raise ApiException([Error(ErrorCode.AUTHENTICATION_NEEDED)])
+
+    current_user = User.get_by_id(req.user.id)
+    if not current_user.usergroup() >= UserGroup.ADMIN:
+        raise ApiException([Error(ErrorCode.FORBIDDEN)])
+
+
+@app.route('/admin/slow_queries')
+def slow_queries():
+    """
+    Lists the slowest query shapes recorded by the slow query log, see ``SLOW_QUERY_THRESHOLD``.
+
+    **Example Request**:
+
+    .. sourcecode:: http
+
+       GET /admin/slow_queries?sort=max_time&limit=10
+
+    **Example Response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Vary: Accept
+        Content-Type: text/javascript
+
+        {
+          "data": [
+            {
+              "id": "1f0b3c4d5e6f7a8b",
+              "type": "slow_query",
+              "attributes": {
+                "shape": "SELECT map.display_name AS `display_name`, ... FROM map ... LIMIT ?, ?",
+                "count": 12,
+                "total_time": 10312.5,
+                "mean_time": 859.4,
+                "max_time": 1203.9,
+                "endpoints": ["maps"],
+                "last_sql": "SELECT map.display_name AS `display_name`, ... FROM map ... LIMIT 0, 1000",
+                "last_args": "None",
+                "last_row_count": 1000,
+                "last_seen": 1476873605.0,
+                "explain": [
+                  {"id": 1, "select_type": "SIMPLE", "table": "map", "type": "ALL", "rows": 4211, ...},
+                  ...
+                ]
+              }
+            },
+            ...
+          ]
+        }
+
+    :query sort: the statistic to order by: ``total_time`` (default), ``max_time`` or ``count``
+    :query limit: the number of query shapes to return, at most 100 (default 20)
+    """
+    require_admin()
+
+    sort = request.args.get('sort', 'total_time')
+    if sort not in SORT_FIELDS:
+        raise ApiException([Error(ErrorCode.QUERY_INVALID_SORT_FIELD, sort)])
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_SLOW_QUERIES)
+
+    return {'data': [{'id': query_shape.pop('id'), 'type': 'slow_query', 'attributes': query_shape}
+                     for query_shape in slow_query_log.top(limit, sort)]}
+
+
+@app.route('/admin/profile', methods=['GET', 'DELETE'])
+def profile():
+    """
+    Returns the stacks sampled by the request profiler (see ``PROFILER_SAMPLE_RATE``) in the collapsed format of
+    flamegraph.pl, with the endpoint as outermost frame. ``DELETE`` discards all samples.
+
+    **Example Request**:
+
+    .. sourcecode:: http
+
+       GET /admin/profile?endpoint=maps
+
+    **Example Response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: text/plain
+
+        maps;flask.app:wsgi_app:1968;...;api.query_commons:fetch_data:100;pymysql.cursors:execute:146 42
+        maps;flask.app:wsgi_app:1968;...;api.query_commons:fetch_data:100;marshmallow.schema:dump:496 17
+        ...
+
+    :query endpoint: only return the stacks of this endpoint
+    """
+    require_admin()
+
+    if request.method == 'DELETE':
+        profiler.clear()
+        return app.response_class(status=204)
+
+    return app.response_class(profiler.collapsed(request.args.get('endpoint')), mimetype='text/plain')
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Exposes request latencies, cache hit rates, in-flight uploads, deployment workers and the state of the database
+    connection in the Prometheus text format. Only accessible with the bearer token ``METRICS_TOKEN``, and not at all
+    if it isn't set. The metrics are those of the process that handles the request unless
+    ``PROMETHEUS_MULTIPROCESS_DIR`` is set, in which case all processes are aggregated.
+
+    **Example Request**:
+
+    .. sourcecode:: http
+
+       GET /metrics
+       Authorization: Bearer <METRICS_TOKEN>
+
+    **Example Response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: text/plain; version=0.0.4
+
+        # HELP faf_api_request_duration_seconds Time spent handling requests.
+        # TYPE faf_api_request_duration_seconds histogram
+        faf_api_request_duration_seconds_bucket{endpoint="maps",status="200",le="0.005"} 0
+        ...
+    """
+    # Not restricted by address: behind a local reverse proxy, every request comes from a local address
+    token = app.config.get('METRICS_TOKEN')
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                            'Bearer {}'.format(token).encode('utf-8')):
+        raise ApiException([Error(ErrorCode.FORBIDDEN)])
+
+    return app.response_class(registry.render(), content_type='text/plain; version=0.0.4')
@@ -222,6 +222,8 @@ class Avatar:
             cursor = db.connection.cursor(db.pymysql.cursors.DictCursor)
             cursor.execute("DELETE FROM avatars_list WHERE id=%s", self.id)
 
+# Avatar assignments aren't cached: the lobby server also assigns avatars and their assignments expire, neither of which
+# purges the response cache
 @app.route("/user_avatars", methods=['GET', 'POST', 'DELETE'])
 def user_avatars():
     if request.method != 'GET':
@@ -257,6 +259,7 @@ def user_avatars():
 
 
 @app.route("/avatar", methods=['GET', 'POST', 'PUT', 'DELETE'])
+@response_cache.cached('avatars')
 def avatars():
     """
     Displays avatars
@@ -306,6 +309,7 @@ def avatars():
                 avatar.update()
             if avatar_file is not None:
                 avatar.upload(avatar_file, overwrite=True)
+            response_cache.purge('avatars')
             return avatar.dict()
         else:
             raise ApiException([Error(ErrorCode.AVATAR_NOT_FOUND)])
@@ -325,6 +329,7 @@ def avatars():
                 pass
             raise ApiException([Error(ErrorCode.AVATAR_INTEGRITY_ERROR, e.args)])
 
+        response_cache.purge('avatars')
         return avatar.dict()
     elif request.method == 'DELETE':
         avatar_id = request.form.get('id')
@@ -333,6 +338,7 @@ def avatars():
             if avatar is not None:
                 try:
                     avatar.delete()
+                    response_cache.purge('avatars')
                     try:
                         avatar.delete_file()
                     except:
@@ -357,6 +363,7 @@ def avatars():
 
 
 @app.route("/avatar/<int:id>", methods=['GET'])
+@response_cache.cached('avatars')
 def avatar(id):
     """
     Displays individual avatars
@@ -389,6 +396,7 @@ def avatar(id):
         else:
             raise ApiException([Error(ErrorCode.AVATAR_NOT_FOUND)])
 
+# Not cached, like /user_avatars
 @app.route("/avatar/<int:id>/users", methods=['GET'])
 def avatar_users(id):
     if request.method == 'GET':
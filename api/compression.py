@@ -0,0 +1,69 @@
+"""
+Compression of response bodies, negotiated via ``Accept-Encoding``.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/vnd.api+json', 'text/plain', 'text/html')
+
+
+def available_encodings():
+    """
+    Returns the supported content codings, most preferred first.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(accept_encodings):
+    """
+    Returns the preferred content coding the client accepts, or ``None`` if the body should be sent uncompressed.
+
+    :param accept_encodings: the request's parsed ``Accept-Encoding`` header, e.g. ``request.accept_encodings``
+    """
+    return accept_encodings.best_match(available_encodings())
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(data, GZIP_LEVEL)
+    raise ValueError('Unsupported content coding: {}'.format(encoding))
+
+
+def is_compressible(response):
+    return (response.status_code == 200
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compresses the body of `response` in place, if it's compressible and large enough and the client accepts any of
+    the available encodings.
+    """
+    if not is_compressible(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
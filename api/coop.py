@@ -1,9 +1,13 @@
 from faf.api.coop_leaderboard_schema import CoopLeaderboardSchema
 from faf.api.coop_mission_schema import CoopMissionSchema
 from flask import request
+from marshmallow_jsonapi import Schema, fields
+from pymysql.cursors import DictCursor
 
-from api import app
-from api.query_commons import fetch_data
+from api import app, response_cache
+from api.coop_leaderboard import CoopLeaderboard
+from api.query_commons import fetch_data, get_page_attributes, sort_items, dump_items
+from faf import db
 
 import urllib.parse
 
@@ -22,41 +26,69 @@ SELECT_EXPRESSIONS = {
     'folder_name': "SUBSTRING(filename, LOCATE('/', filename)+1, LOCATE('.zip', filename)-6)"
 }
 
-LEADERBOARD_SELECT_EXPRESSIONS = {
-    'id': 'leaderboard.id',
-    'game_id': 'leaderboard.gameid',
-    'player_names': 'leaderboard.player_names',
-    'player_count': 'leaderboard.player_count',
-    'secondary_objectives': 'leaderboard.secondary',
-    'duration': 'TIME_TO_SEC(leaderboard.time)',
-    'ranking': '@rownum := @rownum + 1'
-}
-
-LEADERBOARD_BASE_TABLE = """
-  (SELECT
-    c.id,
-    GROUP_CONCAT(login.login ORDER BY login SEPARATOR ', ') AS player_names,
-    gameid,
-    c.time,
-    c.secondary,
-    c.mission,
-    c.player_count
-   FROM (SELECT @rownum := 0) n,
-    coop_leaderboard c
-    INNER JOIN game_player_stats ON game_player_stats.gameid = c.gameuid
-    INNER JOIN login ON game_player_stats.playerId = login.id
-    WHERE mission = %(mission)s {}
-  GROUP BY gameid
-  ORDER BY time ASC) leaderboard
-"""
-
-LEADERBOARD_TABLE_BY_PLAYER_COUNT = LEADERBOARD_BASE_TABLE.format("AND player_count = %(player_count)s")
-LEADERBOARD_TABLE_ALL = LEADERBOARD_BASE_TABLE.format("")
+LEADERBOARD_FIELDS = ['id', 'game_id', 'player_names', 'player_count', 'secondary_objectives', 'duration',
+                      'ranking']
 
 MAX_PAGE_SIZE = 1000
 
 
+class CoopRecordSchema(Schema):
+    """
+    A player's record on a coop leaderboard; faftools has no schema for it yet.
+    """
+    id = fields.String()
+    game_id = fields.Integer()
+    mission = fields.Integer()
+    player_count = fields.Integer()
+    ranking = fields.Integer()
+    player_names = fields.String()
+    secondary_objectives = fields.Boolean()
+    duration = fields.Integer()
+
+    class Meta:
+        type_ = 'coop_record'
+
+
+def load_leaderboard_records(after=None):
+    """
+    Loads all coop leaderboard records, or only those with an ID greater than `after`, ordered by ID.
+    """
+    where = ''
+    args = None
+    if after is not None:
+        where = 'WHERE c.id > %s'
+        args = (after,)
+
+    with db.connection:
+        cursor = db.connection.cursor(DictCursor)
+        cursor.execute("""SELECT
+                            c.id,
+                            c.gameuid AS game_id,
+                            c.mission,
+                            c.player_count,
+                            c.secondary AS secondary_objectives,
+                            TIME_TO_SEC(c.time) AS duration,
+                            GROUP_CONCAT(login.login ORDER BY login SEPARATOR ', ') AS player_names,
+                            GROUP_CONCAT(login.id) AS player_ids
+                          FROM coop_leaderboard c
+                            INNER JOIN game_player_stats ON game_player_stats.gameid = c.gameuid
+                            INNER JOIN login ON game_player_stats.playerId = login.id
+                          {}
+                          GROUP BY c.id
+                          ORDER BY c.id""".format(where), args)
+        rows = cursor.fetchall()
+
+    for row in rows:
+        row['player_ids'] = [int(player_id) for player_id in row['player_ids'].split(',')]
+
+    return rows
+
+
+coop_leaderboard = CoopLeaderboard(load_leaderboard_records)
+
+
 @app.route('/coop/missions')
+@response_cache.cached('coop')
 def coop_missions():
     """
     Lists all coop missions.
@@ -140,14 +172,60 @@ def coop_leaderboards(mission, player_count):
 
     """
 
-    if player_count <= 0:
-        table = LEADERBOARD_TABLE_ALL
-    else:
-        table = LEADERBOARD_TABLE_BY_PLAYER_COUNT
+    page, page_size = get_page_attributes(MAX_PAGE_SIZE, request)
+
+    records = coop_leaderboard.ranking(mission, player_count)
+    sort_items(records, request.values.get('sort'), LEADERBOARD_FIELDS)
+
+    return dump_items(CoopLeaderboardSchema(), records[(page - 1) * page_size:page * page_size], request)
+
+
+@app.route("/coop/players/<int:player_id>/records")
+def coop_player_records(player_id):
+    """
+    Lists the best record and its ranking of a player for every coop mission and player count the player has a
+    record for. `ranking` is the record's ranking on the leaderboard of its mission and player count.
+
+    **Example Request**:
+
+    .. sourcecode:: http
+
+       GET /coop/players/781/records
+
+    **Example Response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Vary: Accept
+        Content-Type: text/javascript
 
-    return fetch_data(CoopLeaderboardSchema(), table, LEADERBOARD_SELECT_EXPRESSIONS,
-                      MAX_PAGE_SIZE, request, args={'player_count': player_count, 'mission': mission},
-                      enricher=enricher)
+        {
+          "data": [
+            {
+              "attributes": {
+                "id": "112",
+                "game_id": 1337,
+                "mission": 1,
+                "player_count": 2,
+                "ranking": 3,
+                "player_names": "Someone, SomeoneElse",
+                "secondary_objectives": true,
+                "duration": 3600
+              },
+              "id": "112",
+              "type": "coop_record"
+            },
+            ...
+          ]
+        }
+
+    :param player_id: Player ID
+    :type player_id: int
+    :status 200: No error
+
+    """
+    return dump_items(CoopRecordSchema(), coop_leaderboard.player_records(player_id), request)
 
 
 def enricher(mission):
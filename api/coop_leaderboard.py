@@ -0,0 +1,113 @@
+"""
+In-memory coop leaderboards, ranked per mission and player count and updated as new records come in.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+
+class CoopLeaderboard(object):
+    """
+    Ranks coop records by duration, once per mission and player count and once per mission for all player counts.
+
+    Records are provided by `loader`, a function that takes an optional record ID and returns all records with a
+    greater ID as rows (dicts) with the keys ``id``, ``game_id``, ``mission``, ``player_count``,
+    ``secondary_objectives``, ``duration``, ``player_names`` and ``player_ids`` (a list). If a game has more than one
+    record, only the first one counts.
+
+    New records are loaded at most once every `refresh_interval` seconds. Since records may also be deleted (e.g.
+    if they turn out to be cheated), the whole leaderboard is rebuilt every `rebuild_interval` seconds.
+    """
+
+    def __init__(self, loader, refresh_interval=10, rebuild_interval=3600):
+        self._loader = loader
+        self._refresh_interval = refresh_interval
+        self._rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._records = {}  # record ID -> row
+        self._game_records = {}  # game ID -> record ID
+        self._player_records = {}  # player ID -> set of record IDs
+        self._boards = {}  # (mission, player count) -> sorted list of (duration, record ID); player count 0 is "all"
+        self._watermark = None
+        self._last_refresh = None
+        self._last_rebuild = None
+
+    def refresh(self):
+        """
+        Adds all records that were created since the last refresh, or loads all records if there are none yet.
+        """
+        with self._lock:
+            for row in self._loader(self._watermark):
+                self.add(row)
+                if self._watermark is None or row['id'] > self._watermark:
+                    self._watermark = row['id']
+
+            self._last_refresh = time.time()
+            if self._last_rebuild is None:
+                self._last_rebuild = self._last_refresh
+
+    def rebuild(self):
+        """
+        Discards and reloads all records.
+        """
+        with self._lock:
+            self._clear()
+            self.refresh()
+
+    def add(self, row):
+        """
+        Adds a single record, unless there already is one for the same game.
+        """
+        with self._lock:
+            if row['id'] in self._records or row['game_id'] in self._game_records:
+                return
+
+            self._records[row['id']] = row
+            self._game_records[row['game_id']] = row['id']
+            for player_id in row['player_ids']:
+                self._player_records.setdefault(player_id, set()).add(row['id'])
+
+            key = (row['duration'], row['id'])
+            insort(self._boards.setdefault((row['mission'], row['player_count']), []), key)
+            insort(self._boards.setdefault((row['mission'], 0), []), key)
+
+    def ranking(self, mission, player_count=0):
+        """
+        Returns the records of a mission ordered by duration, as dicts with an additional ``ranking``. If
+        `player_count` is not positive, records of all player counts are returned.
+        """
+        self._refresh_if_due()
+
+        with self._lock:
+            board = self._boards.get((mission, max(player_count, 0)), [])
+            return [dict(self._records[record_id], ranking=index + 1)
+                    for index, (_, record_id) in enumerate(board)]
+
+    def player_records(self, player_id):
+        """
+        Returns the best record of a player for every mission and player count they played, as dicts with an
+        additional ``ranking``, ordered by mission and player count.
+        """
+        self._refresh_if_due()
+
+        with self._lock:
+            best = {}  # (mission, player count) -> (duration, record ID)
+            for record_id in self._player_records.get(player_id, ()):
+                row = self._records[record_id]
+                board_key = (row['mission'], row['player_count'])
+                key = (row['duration'], record_id)
+                if board_key not in best or key < best[board_key]:
+                    best[board_key] = key
+
+            return [dict(self._records[key[1]], ranking=bisect_left(self._boards[board_key], key) + 1)
+                    for board_key, key in sorted(best.items())]
+
+    def _refresh_if_due(self):
+        now = time.time()
+        if self._last_rebuild is not None and now - self._last_rebuild >= self._rebuild_interval:
+            self.rebuild()
+        elif self._last_refresh is None or now - self._last_refresh >= self._refresh_interval:
+            self.refresh()
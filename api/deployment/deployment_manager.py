@@ -112,6 +112,13 @@ class DeploymentManager(object):
     def on_deployment_finished(self, deploy_id: str, message: str, configuration: DeploymentConfiguration) -> None:
         logger.debug("performing post-deployment activities")
 
+        # Deployments change the files of featured mods
+        from api import response_cache
+        response_cache.purge('featured_mods')
+
+        from api.prometheus import deployments_finished
+        deployments_finished.inc()
+
         deploy_message = "[%s] %s" % (self._environment, message)
 
         self._slack.send_message(username='deploybot', text=deploy_message)
@@ -0,0 +1,45 @@
+"""
+Downsampling of time series for charting clients.
+"""
+import numpy as np
+
+
+def largest_triangle_three_buckets(x, y, threshold):
+    """
+    Selects `threshold` points of the series (`x`, `y`) that preserve its visual shape, using the "Largest Triangle
+    Three Buckets" algorithm by Sveinn Steinarsson. The first and last points are always selected.
+
+    :param x: NumPy array of ascending x values (e.g. timestamps)
+    :param y: NumPy array of y values, of the same length as `x`
+    :param threshold: the maximum number of points to select
+    :return: a NumPy array of the indices of the selected points, in ascending order
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    # The inner points are split into `threshold - 2` buckets, bucket i spans [bounds[i], bounds[i + 1])
+    every = (length - 2) / (threshold - 2)
+    bounds = np.append((np.arange(threshold - 1) * every).astype(np.intp) + 1, length)
+    # Guard against floating point errors; the last bucket's successor is always the last point
+    bounds[-2] = length - 1
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = length - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        next_start, next_end = bounds[bucket + 1], bounds[bucket + 2]
+
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+
+        areas = np.abs((x[previous] - average_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (average_y - y[previous]))
+
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
@@ -227,6 +227,22 @@ class ErrorCode(Enum):
         code=153,
         title='UID conflict',
         detail='Mod uid {} is already occupied.')
+    QUERY_TOO_MANY_IDS = dict(
+        code=154,
+        title='Too many IDs',
+        detail='At most {0} IDs can be requested at once, was: {1}')
+    QUERY_INVALID_BUCKET_WIDTH = dict(
+        code=155,
+        title='Invalid bucket width',
+        detail='Bucket width must be a positive multiple of {0}, was: {1}')
+    QUERY_INVALID_MAX_POINTS = dict(
+        code=156,
+        title='Invalid number of points',
+        detail='At least {0} points have to be requested, was: {1}')
+    QUERY_INVALID_TIMESTAMP = dict(
+        code=157,
+        title='Invalid timestamp',
+        detail='{0} must be a unix timestamp, was: {1}')
 
 
 class Error:
@@ -4,7 +4,7 @@ from faf.api.event_schema import EventSchema
 from flask_jwt import jwt_required, current_identity
 from api import *
 import faf.db as db
-from api.query_commons import fetch_data
+from api.query_commons import fetch_data, get_updated_since_filter
 
 MAX_PAGE_SIZE = 1000
 
@@ -157,10 +157,15 @@ def events_list_player(player_id):
                   "update_time": long
               }
             }
-          ]
+          ],
+          "meta": {
+            "server_time": long
+          }
         }
 
 
+    :query long filter[updated_since]: Only returns events updated at or after this time (unix timestamp). Use
+        ``meta.server_time`` of the previous response.
     :status 200: No error
     """
     select_expressions = copy(PLAYER_EVENTS_SELECT_EXPRESSIONS)
@@ -175,8 +180,15 @@ def events_list_player(player_id):
         where += ' AND event_id IN ({})'.format(','.join(['%s'] * len(ids)))
         args += tuple(ids)
 
-    return fetch_data(PlayerEventSchema(), 'player_events', select_expressions,
-                      MAX_PAGE_SIZE, request, where=where, args=args)
+    updated_since_where, updated_since_args, server_time = get_updated_since_filter(request)
+    if updated_since_where:
+        where += ' AND ' + updated_since_where
+        args += updated_since_args
+
+    result = fetch_data(PlayerEventSchema(), 'player_events', select_expressions,
+                        MAX_PAGE_SIZE, request, where=where, args=args)
+    result['meta'] = {'server_time': server_time}
+    return result
 
 
 @app.route('/jwt/events/recordMultiple', methods=['POST'])
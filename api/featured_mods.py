@@ -7,7 +7,7 @@ from faf.api.featured_mod_schema import FeaturedModSchema
 from flask import request
 from pymysql.cursors import DictCursor
 
-from api import app, cache, default_cache_key
+from api import app, cache, response_cache
 from api.error import Error, ErrorCode, ApiException
 from api.query_commons import fetch_data
 
@@ -46,7 +46,7 @@ MAX_PAGE_SIZE = 1000
 
 
 @app.route('/featured_mods')
-@cache.cached(timeout=300, key_prefix=default_cache_key)
+@response_cache.cached('featured_mods')
 def featured_mods():
     """
     Lists featured mods.
@@ -93,7 +93,7 @@ def featured_mods():
 
 
 @app.route('/featured_mods/<int:mod_id>')
-@cache.cached(timeout=300, key_prefix=default_cache_key)
+@response_cache.cached('featured_mods')
 def get_featured_mod(mod_id):
     """
     Gets a  featured mod.
@@ -136,7 +136,6 @@ def get_featured_mod(mod_id):
 
 
 @app.route('/featured_mods/<string:id>/files')
-@cache.cached(timeout=300, key_prefix=default_cache_key)
 def featured_mod_files_latest(id):
     """
     Lists the latest files of the specified mod.
@@ -177,7 +176,7 @@ def featured_mod_files_latest(id):
 
 
 @app.route('/featured_mods/<string:id>/files/<string:version>')
-@cache.cached(timeout=300, key_prefix=default_cache_key)
+@response_cache.cached('featured_mods')
 def featured_mod_files(id, version):
     """
     Lists the files of a specific version of the specified mod. If the version is "latest", the latest version is
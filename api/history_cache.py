@@ -0,0 +1,136 @@
+"""
+In-memory cache of player rating histories, which only ever grow and therefore only need to be appended to.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class RatingHistory(object):
+    """
+    A player's rating history, stored as parallel arrays of score time (unix timestamp), mean, deviation and game
+    ID, sorted by score time.
+    """
+
+    def __init__(self, times=None, means=None, deviations=None, game_ids=None):
+        self.times = np.empty(0, dtype=np.float64) if times is None else times
+        self.means = np.empty(0, dtype=np.float64) if means is None else means
+        self.deviations = np.empty(0, dtype=np.float64) if deviations is None else deviations
+        self.game_ids = np.empty(0, dtype=np.int64) if game_ids is None else game_ids
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.means.nbytes + self.deviations.nbytes + self.game_ids.nbytes
+
+    @property
+    def last_time(self):
+        # A Python float, as NumPy scalars can't be passed to the database driver
+        return float(self.times[-1]) if len(self.times) else None
+
+    def game_ids_at(self, time):
+        """
+        Returns the set of IDs of the games scored at `time`.
+        """
+        start = np.searchsorted(self.times, time, side='left')
+        end = np.searchsorted(self.times, time, side='right')
+        return set(self.game_ids[start:end].tolist())
+
+    def append(self, rows):
+        """
+        Returns a new history with `rows` of (score time, mean, deviation, game ID), sorted by score time, appended.
+        """
+        if not rows:
+            return self
+
+        new = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        return RatingHistory(np.concatenate((self.times, new[:, 0])),
+                             np.concatenate((self.means, new[:, 1])),
+                             np.concatenate((self.deviations, new[:, 2])),
+                             np.concatenate((self.game_ids, new[:, 3].astype(np.int64))))
+
+    def slice(self, time_from=None, time_to=None):
+        """
+        Returns the part of the history with ``time_from <= score time <= time_to``.
+        """
+        start = 0 if time_from is None else np.searchsorted(self.times, time_from, side='left')
+        end = len(self.times) if time_to is None else np.searchsorted(self.times, time_to, side='right')
+        return RatingHistory(self.times[start:end], self.means[start:end], self.deviations[start:end],
+                             self.game_ids[start:end])
+
+
+class RatingHistoryCache(object):
+    """
+    Caches the rating histories of the most recently requested players, up to a total of `max_bytes`.
+
+    `loader` is a function taking a player ID, a game mod and a score time (unix timestamp, or ``None``) which
+    returns the player's history entries of that game mod scored at or after the given time, as rows of (score time,
+    mean, deviation, game ID) sorted by score time. On a cache hit, only entries scored at or after the last cached
+    one are loaded, since more games may have been scored in the same second; those already cached are skipped.
+    """
+
+    def __init__(self, loader, max_bytes):
+        self._loader = loader
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (player ID, game mod) -> RatingHistory, least recently used first
+        self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._size
+
+    def get(self, player_id, game_mod):
+        """
+        Returns the up to date `RatingHistory` of a player.
+        """
+        key = (player_id, game_mod)
+        with self._lock:
+            history = self._entries.get(key)
+
+        if history is None:
+            history = RatingHistory().append(self._loader(player_id, game_mod, None))
+        else:
+            last_time = history.last_time
+            cached_game_ids = history.game_ids_at(last_time)
+            history = history.append([row for row in self._loader(player_id, game_mod, last_time)
+                                      if row[0] > last_time or row[3] not in cached_game_ids])
+
+        with self._lock:
+            cached = self._entries.pop(key, None)
+            if cached is not None:
+                self._size -= cached.nbytes
+                # Another request may have appended more entries in the meantime
+                if len(cached) > len(history):
+                    history = cached
+
+            self._entries[key] = history
+            self._size += history.nbytes
+            self._evict()
+
+        return history
+
+    def invalidate(self, player_id=None, game_mod=None):
+        """
+        Removes a player's history, or all histories if no player is given.
+        """
+        with self._lock:
+            if player_id is None:
+                self._entries.clear()
+                self._size = 0
+                return
+
+            for key in [key for key in self._entries if key[0] == player_id and game_mod in (None, key[1])]:
+                self._size -= self._entries.pop(key).nbytes
+
+    def _evict(self):
+        # The most recently used entry is kept even if it exceeds the limit on its own
+        while self._size > self._max_bytes and len(self._entries) > 1:
+            _, history = self._entries.popitem(last=False)
+            self._size -= history.nbytes
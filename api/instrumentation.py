@@ -0,0 +1,72 @@
+"""
+Timers and counters per endpoint, sent to statsd if it's configured.
+
+Metrics of an endpoint are named ``api.endpoints.<endpoint>.<name>``, where ``<endpoint>`` is the Flask endpoint, i.e.
+the name of the view function.
+"""
+import time
+from contextlib import contextmanager
+
+
+def endpoint_metric(endpoint, name):
+    """
+    Returns the name of metric `name` of `endpoint`, which may be ``None`` if no route matched.
+    """
+    return 'endpoints.{}.{}'.format((endpoint or 'unknown').replace('.', '_'), name)
+
+
+class Metrics(object):
+    """
+    Sends metrics, prefixed with `prefix`, to a statsd client. Until a client is set using `configure`, nothing is
+    measured at all.
+    """
+
+    def __init__(self, prefix='api'):
+        self._prefix = prefix
+        self._client = None
+
+    def configure(self, client):
+        self._client = client
+
+    @property
+    def enabled(self):
+        return self._client is not None
+
+    def timing(self, name, value):
+        """
+        Records a duration in milliseconds, or any other value whose distribution is of interest (like row counts).
+        """
+        if self._client is not None:
+            self._client.timing(self._prefix + '.' + name, value)
+
+    def incr(self, name, count=1):
+        if self._client is not None:
+            self._client.incr(self._prefix + '.' + name, count)
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Context manager that records how long its block took.
+        """
+        if self._client is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timing(name, (time.perf_counter() - start) * 1000)
+
+    def record_request(self, endpoint, status_code, duration, response_bytes=None):
+        """
+        Records a handled request, its duration (in milliseconds) and the size of its response body.
+        """
+        self.timing('request', duration)
+        self.timing(endpoint_metric(endpoint, status_code), duration)
+        self.incr(endpoint_metric(endpoint, status_code))
+        if response_bytes is not None:
+            self.timing(endpoint_metric(endpoint, 'response_bytes'), response_bytes)
+
+
+metrics = Metrics()
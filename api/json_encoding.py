@@ -0,0 +1,39 @@
+"""
+JSON encoding of response bodies.
+
+The output is the same as that of `flask.jsonify` with ``JSONIFY_PRETTYPRINT_REGULAR`` disabled: compact separators,
+sorted keys, ``\\u`` escapes for non-ASCII characters, dates as HTTP dates and a trailing newline. Compact output is
+encoded by the C accelerator of the stdlib `json` module, which isn't used when indenting. Unlike Flask's encoder,
+decimals (e.g. from pymysql rows) are encoded as numbers.
+"""
+import json
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from werkzeug.http import http_date
+
+
+def default(obj):
+    """
+    Converts the values JSON can't represent natively, most notably the ones in pymysql rows.
+    """
+    if isinstance(obj, date):
+        return http_date(obj.timetuple())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError('{!r} is not JSON serializable'.format(obj))
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=True, default=default)
+
+
+def dumps(obj):
+    """
+    Encodes `obj` as UTF-8 encoded JSON.
+    """
+    return (_encoder.encode(obj) + '\n').encode('utf-8')
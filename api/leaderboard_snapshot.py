@@ -0,0 +1,141 @@
+"""
+Leaderboards that are periodically built in the background and served from memory.
+"""
+import logging
+import threading
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderboardSnapshot(object):
+    """
+    An immutable, ordered leaderboard stored as parallel arrays. Entry ``i`` is the player ranked ``i + 1``.
+    """
+
+    def __init__(self, rows, generated_at):
+        self.generated_at = generated_at
+        self.ids = array('l')
+        self.logins = []
+        self.means = array('d')
+        self.deviations = array('d')
+        self.ratings = array('l')
+        self.num_games = array('l')
+        self.won_games = array('l')
+        self.winning_percentages = array('l')
+
+        for row in rows:
+            self.ids.append(row['id'])
+            self.logins.append(row['login'])
+            self.means.append(row['mean'])
+            self.deviations.append(row['deviation'])
+            self.ratings.append(int(row['rating']))
+            self.num_games.append(row['num_games'])
+            self.won_games.append(row.get('won_games') or 0)
+            self.winning_percentages.append(int(row.get('winning_percentage') or 0))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def entries(self, start, end, include_win_stats=False):
+        """
+        Returns the entries ranked ``start + 1`` to ``end`` as dicts, like the ones of the SQL based leaderboard.
+        """
+        entries = []
+        for index in range(start, min(end, len(self.ids))):
+            entry = {
+                'id': self.ids[index],
+                'login': self.logins[index],
+                'mean': self.means[index],
+                'deviation': self.deviations[index],
+                'num_games': self.num_games[index],
+                'is_active': 1,
+                'rating': self.ratings[index],
+                'ranking': index + 1
+            }
+            if include_win_stats:
+                entry['won_games'] = self.won_games[index]
+                entry['lost_games'] = self.num_games[index] - self.won_games[index]
+                entry['winning_percentage'] = self.winning_percentages[index]
+            entries.append(entry)
+
+        return entries
+
+
+class LeaderboardSnapshotter(object):
+    """
+    Rebuilds the leaderboard of `table_name` every `interval` seconds in a background thread and swaps it in once
+    it's complete, so that readers always see a consistent snapshot.
+
+    `connect` is a function returning a new database connection; the background thread doesn't share the request
+    connection. Win statistics are only loaded if `include_win_stats` is set, since not every rating table has them.
+    """
+
+    def __init__(self, table_name, connect, interval, include_win_stats=False):
+        self._table_name = table_name
+        self._connect = connect
+        self._interval = interval
+        self._include_win_stats = include_win_stats
+        self._snapshot = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self):
+        """
+        The most recent snapshot, or ``None`` if none has been built yet.
+        """
+        return self._snapshot
+
+    def start(self):
+        """
+        Starts the background thread, unless it's already running.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='leaderboard-' + self._table_name, daemon=True)
+            self._thread.start()
+
+    def refresh(self, connection=None):
+        """
+        Builds a new snapshot and swaps it in.
+        """
+        win_stats_select = ''
+        if self._include_win_stats:
+            win_stats_select = """,
+                                    r.winGames AS won_games,
+                                    ROUND((r.winGames / r.numGames) * 100) AS winning_percentage"""
+
+        own_connection = connection is None
+        if own_connection:
+            connection = self._connect()
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("""SELECT
+                                    r.id AS id,
+                                    l.login AS login,
+                                    r.mean AS mean,
+                                    r.deviation AS deviation,
+                                    ROUND(r.mean - 3 * r.deviation) AS rating,
+                                    r.numGames AS num_games""" + win_stats_select + """
+                                  FROM """ + self._table_name + """ r JOIN login l ON r.id = l.id
+                                  WHERE r.is_active = 1 AND r.numGames > 0
+                                  ORDER BY rating DESC, r.id ASC""")
+                columns = [column[0] for column in cursor.description]
+                snapshot = LeaderboardSnapshot((dict(zip(columns, row)) for row in cursor.fetchall()), time.time())
+        finally:
+            if own_connection:
+                connection.close()
+
+        self._snapshot = snapshot
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('Refreshing the leaderboard snapshot of %s failed', self._table_name)
+            time.sleep(self._interval)
@@ -1,3 +1,6 @@
+from bisect import bisect_left
+
+import pymysql
 from faf.api import LeaderboardSchema
 from faf.api import LeaderboardStatsSchema
 from flask import request
@@ -6,10 +9,13 @@ from pymysql.cursors import DictCursor
 from api import app
 from api.error import ApiException, ErrorCode
 from api.error import Error
-from api.query_commons import fetch_data
+from api.leaderboard_snapshot import LeaderboardSnapshotter
+from api.query_commons import fetch_data, get_page_attributes, dump_items
+from api.rating_distribution import RatingDistribution, BUCKET_WIDTH
 from faf import db
 
 MAX_PAGE_SIZE = 5000
+MAX_PLAYERS_PER_REQUEST = 100
 
 SELECT_EXPRESSIONS = {
     'id': 'r.id',
@@ -25,6 +31,16 @@ SELECT_EXPRESSIONS = {
 TABLE1V1 = 'ladder1v1_rating r JOIN login l on r.id = l.id, (SELECT @rownum:=%(row_num)s) n'
 TABLEGLOBAL = 'global_rating r JOIN login l on r.id = l.id, (SELECT @rownum:=%(row_num)s) n'
 
+DEFAULT_BUCKET_WIDTH = 100
+
+rating_distributions = {
+    '1v1': RatingDistribution('ladder1v1_rating'),
+    'global': RatingDistribution('global_rating')
+}
+
+# Created on first use if LEADERBOARD_SNAPSHOT_INTERVAL is configured
+leaderboard_snapshotters = {}
+
 
 @app.route('/leaderboards/<string:leaderboard_type>')
 def leaderboards_type(leaderboard_type):
@@ -68,13 +84,23 @@ def leaderboards_type(leaderboard_type):
                   "type": "ranked1v1"
                 },
                 ...
-              ]
+              ],
+              "meta": {
+                "generated_at": 1477052000
+              }
             }
 
+        If ``LEADERBOARD_SNAPSHOT_INTERVAL`` is configured, pages are served from a snapshot of the leaderboard that is
+        rebuilt in the background every ``LEADERBOARD_SNAPSHOT_INTERVAL`` seconds. ``meta.generated_at`` is the time
+        the snapshot was built (unix timestamp); it's missing if the page was read from the database.
+
         :param page[number]: The page number being requested (EX.: /leaderboards/1v1?page[number]=2)
         :type page[number]: int
         :param page[size]: The total amount of players to grab by default (EX.: /leaderboards/1v1?page[size]=10)
         :type page[size]: int
+        :param filter[id]: Only returns the players with the given comma separated IDs, ranked or not
+            (EX.: /leaderboards/1v1?filter[id]=781,21447)
+        :type filter[id]: string
         :param leaderboard_type: Finds players in the 1v1 or global rating
         :type leaderboard_type: 1v1 OR global
         :status 200: No error
@@ -84,6 +110,10 @@ def leaderboards_type(leaderboard_type):
     if sort_field:
         raise ApiException([Error(ErrorCode.QUERY_INVALID_SORT_FIELD, sort_field)])
 
+    id_filter = request.values.get('filter[id]')
+    if id_filter:
+        return get_players(leaderboard_type, id_filter.split(','))
+
     page = int(request.values.get('page[number]', 1))
     page_size = int(request.values.get('page[size]', MAX_PAGE_SIZE))
     row_num = (page - 1) * page_size
@@ -93,6 +123,12 @@ def leaderboards_type(leaderboard_type):
 
     rating = find_leaderboard_type(leaderboard_type, select)
 
+    snapshotter = get_snapshotter(leaderboard_type)
+    if snapshotter:
+        snapshotter.start()
+        if snapshotter.snapshot:
+            return get_snapshot_page(snapshotter.snapshot, leaderboard_type)
+
     return fetch_data(LeaderboardSchema(), rating['table'], rating['select'], MAX_PAGE_SIZE, request, sort='-rating',
                       args=args, where='is_active = 1 AND r.numGames > 0')
 
@@ -164,6 +200,94 @@ def leaderboards_type_get_player(leaderboard_type, player_id):
     return result
 
 
+def get_snapshotter(leaderboard_type):
+    """
+    Returns the `LeaderboardSnapshotter` of a leaderboard, or ``None`` if snapshots are disabled.
+    """
+    interval = app.config.get('LEADERBOARD_SNAPSHOT_INTERVAL')
+    if not interval:
+        return None
+
+    if leaderboard_type not in leaderboard_snapshotters:
+        table_name = find_leaderboard_type(leaderboard_type)['tableName']
+        leaderboard_snapshotters.setdefault(leaderboard_type, LeaderboardSnapshotter(
+            table_name, lambda: pymysql.connect(**app.config['DATABASE']), interval,
+            include_win_stats=leaderboard_type == '1v1'))
+
+    return leaderboard_snapshotters[leaderboard_type]
+
+
+def get_snapshot_page(snapshot, leaderboard_type):
+    """
+    Returns the requested page of a `LeaderboardSnapshot`, in the same format as `fetch_data`.
+    """
+    page, page_size = get_page_attributes(MAX_PAGE_SIZE, request)
+    items = snapshot.entries((page - 1) * page_size, page * page_size, include_win_stats=leaderboard_type == '1v1')
+
+    data = dump_items(LeaderboardSchema(), items, request)
+    data['meta'] = {'generated_at': int(snapshot.generated_at)}
+    return data
+
+
+def get_players(leaderboard_type, player_ids):
+    """
+    Gets the leaderboard entries of multiple players. Instead of counting the better players once per row, the ranks of
+    all players are computed from a single rating histogram. This function is NOT an endpoint.
+    """
+    player_ids = [player_id for player_id in player_ids if player_id]
+    if not player_ids:
+        raise ApiException([Error(ErrorCode.PARAMETER_MISSING, 'filter[id]')])
+    if len(player_ids) > MAX_PLAYERS_PER_REQUEST:
+        raise ApiException([Error(ErrorCode.QUERY_TOO_MANY_IDS, MAX_PLAYERS_PER_REQUEST, len(player_ids))])
+
+    rating = find_leaderboard_type(leaderboard_type, SELECT_EXPRESSIONS.copy())
+    rating['select']['ranking'] = 'NULL'
+
+    args = {'id{}'.format(index): player_id for index, player_id in enumerate(player_ids)}
+    id_placeholders = ','.join('%({})s'.format(key) for key in sorted(args))
+
+    ranks = get_ranks(rating['tableName'], id_placeholders, args)
+
+    def enricher(item):
+        if 'ranking' in item:
+            item['ranking'] = ranks.get(item['id'])
+
+    args['row_num'] = 0
+    return fetch_data(LeaderboardSchema(), rating['table'], rating['select'], MAX_PAGE_SIZE, request, limit=False,
+                      where='r.id IN ({})'.format(id_placeholders), args=args, enricher=enricher)
+
+
+def get_ranks(table_name, id_placeholders, args):
+    """
+    Returns a dict of player ID to ranking, where the ranking is the number of active players whose rating is at least
+    as high as the player's.
+    """
+    with db.connection:
+        cursor = db.connection.cursor(DictCursor)
+        cursor.execute("""SELECT id, ROUND(mean - 3 * deviation) AS rating FROM """ + table_name + """
+                          WHERE id IN (""" + id_placeholders + ")", args)
+        player_ratings = {row['id']: row['rating'] for row in cursor.fetchall()}
+
+        if not player_ratings:
+            return {}
+
+        cursor.execute("""SELECT ROUND(mean - 3 * deviation) AS rating, count(*) AS count FROM """ + table_name + """
+                          WHERE is_active = 1
+                            AND numGames > 0
+                            AND ROUND(mean - 3 * deviation) >= %s
+                          GROUP BY rating
+                          ORDER BY rating ASC""", (min(player_ratings.values()),))
+        histogram = cursor.fetchall()
+
+    ratings = [row['rating'] for row in histogram]
+    at_least = [0] * (len(histogram) + 1)
+    for index in range(len(histogram) - 1, -1, -1):
+        at_least[index] = at_least[index + 1] + histogram[index]['count']
+
+    return {player_id: at_least[bisect_left(ratings, player_rating)]
+            for player_id, player_rating in player_ratings.items()}
+
+
 @app.route("/leaderboards/<string:rating_type>/stats")
 def rating_stats(rating_type):
     """
@@ -225,37 +349,100 @@ def rating_stats(rating_type):
           }
         }
 
+    :query int bucket_width: The width of the rating buckets, a multiple of 10. Default is 100.
     :status 200: No error
 
     """
-
-    rating = find_leaderboard_type(rating_type)
-
-    with db.connection:
-        cursor = db.connection.cursor(DictCursor)
-        cursor.execute("""
-        SELECT
-            FLOOR((mean - 3 * deviation)/100) * 100 AS `rating`,
-            count(*) as count
-        FROM """ + rating['tableName'] + """
-        WHERE `is_active` = 1
-            AND mean BETWEEN 0 AND 3000
-            AND deviation <= 240
-            AND numGames > 0
-        GROUP BY `rating`
-        ORDER BY CAST(`rating` as SIGNED) ASC;
-        """)
-
-        result = cursor.fetchall()
+    distribution = get_rating_distribution(rating_type)
+    bucket_width = get_bucket_width()
 
     data = dict(id='/leaderboards/' + rating_type + '/stats', rating_distribution={})
 
-    for item in result:
-        data['rating_distribution'][str(int(item['rating']))] = item['count']
+    for rating, count in distribution.distribution(bucket_width).items():
+        data['rating_distribution'][str(rating)] = count
 
     return LeaderboardStatsSchema().dump(data, many=False).data
 
 
+@app.route("/leaderboards/<string:rating_type>/stats/percentiles")
+def rating_percentiles(rating_type):
+    """
+    Looks up the percentile of a rating, or the rating at a percentile.
+
+    **Example Request**:
+
+    .. sourcecode:: http
+
+       GET /leaderboards/1v1/stats/percentiles?rating=1500
+
+    **Example Response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Vary: Accept
+        Content-Type: text/javascript
+
+        {
+          "data": {
+            "attributes": {
+              "rating": 1500,
+              "percentile": 97.12
+            },
+            "id": "/leaderboards/1v1/stats/percentiles",
+            "type": "leaderboard_percentile"
+          }
+        }
+
+    :query int rating: The rating to get the percentage of players with a lower rating for
+    :query float percentile: If `rating` is not specified, the percentile to get the rating for
+    :status 200: No error
+
+    """
+    distribution = get_rating_distribution(rating_type)
+
+    rating = request.values.get('rating', type=int)
+    percentile = request.values.get('percentile', type=float)
+
+    if rating is not None:
+        percentile = round(distribution.percentile(rating), 2)
+    elif percentile is not None:
+        rating = distribution.rating_at_percentile(percentile)
+    else:
+        raise ApiException([Error(ErrorCode.PARAMETER_MISSING, 'rating')])
+
+    return {
+        'data': {
+            'attributes': {
+                'rating': rating,
+                'percentile': percentile
+            },
+            'id': '/leaderboards/' + rating_type + '/stats/percentiles',
+            'type': 'leaderboard_percentile'
+        }
+    }
+
+
+def get_rating_distribution(rating_type):
+    if rating_type not in rating_distributions:
+        raise ApiException([Error(ErrorCode.QUERY_INVALID_RATING_TYPE, rating_type)])
+
+    return rating_distributions[rating_type]
+
+
+def get_bucket_width():
+    raw_bucket_width = request.values.get('bucket_width', DEFAULT_BUCKET_WIDTH)
+    try:
+        bucket_width = int(raw_bucket_width)
+    except ValueError:
+        raise ApiException([Error(ErrorCode.QUERY_INVALID_BUCKET_WIDTH, BUCKET_WIDTH, raw_bucket_width)])
+
+    if bucket_width <= 0 or bucket_width % BUCKET_WIDTH != 0:
+        raise ApiException([Error(ErrorCode.QUERY_INVALID_BUCKET_WIDTH, BUCKET_WIDTH, bucket_width)])
+
+    return bucket_width
+
+
 def find_leaderboard_type(rating_type, select=None):
     rating = {}
 
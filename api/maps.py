@@ -12,9 +12,11 @@ from faf.tools.fa.maps import generate_map_previews, parse_map_info, generate_zi
 from flask import request
 from werkzeug.utils import secure_filename
 
-from api import app, oauth
+from api import app, oauth, response_cache
 from api.error import ApiException, Error, ErrorCode, req_post_param
+from api.prometheus import uploads_in_progress
 from api.query_commons import fetch_data
+from api.search import SearchIndex, fetch_search_results
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +54,12 @@ TABLE = 'map ' \
         'JOIN map_version version ON version.map_id = map.id ' \
         'LEFT JOIN login l ON l.id = map.author'
 
+SEARCH_FIELD_WEIGHTS = {
+    'display_name': 3,
+    'author': 2,
+    'description': 1
+}
+
 
 @app.route('/maps/upload', methods=['POST'])
 @oauth.require_oauth('upload_map')
@@ -91,7 +99,7 @@ def maps_upload():
 
     metadata = json.loads(metadata_string)
 
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with uploads_in_progress.track_in_progress('map'), tempfile.TemporaryDirectory() as temp_dir:
         temp_map_path = os.path.join(temp_dir, secure_filename(file.filename))
         file.save(temp_map_path)
         process_uploaded_map(temp_map_path, metadata.get('is_ranked', False))
@@ -100,6 +108,7 @@ def maps_upload():
 
 
 @app.route('/maps')
+@response_cache.cached('maps')
 def maps():
     """
     Lists all map definitions.
@@ -146,12 +155,20 @@ def maps():
           ]
         }
 
+    :query string filter[folder_name]: Only returns the map with the given folder name
+    :query string filter[search]: Only returns maps whose name, description or author match all given words (or
+        prefixes of them), ordered by relevance unless `sort` is specified
 
     """
     where = ''
     args = None
     many = True
 
+    search_filter = request.values.get('filter[search]')
+    if search_filter:
+        return fetch_search_results(search_index, search_filter, MapSchema(), TABLE, SELECT_EXPRESSIONS,
+                                    MAX_PAGE_SIZE, request, 'version.id', enricher=enricher)
+
     filename_filter = request.values.get('filter[folder_name]')
     if filename_filter:
         where = ' filename = %s'
@@ -163,6 +180,7 @@ def maps():
 
 
 @app.route('/maps/<int:map_id>')
+@response_cache.cached('maps')
 def get_map(map_id):
     """
     Gets a map.
@@ -214,6 +232,7 @@ def get_map(map_id):
 
 
 @app.route('/maps/ladder1v1', methods=['GET'])
+@response_cache.cached('maps')
 def laddermaps():
     """
     Lists all maps of the current ladder map pool ( for 1v1)
@@ -364,6 +383,32 @@ def process_uploaded_map(temp_map_path, is_ranked):
                            'ranked': 1 if is_ranked else 0
                        })
 
+    search_index.notify_update()
+    response_cache.purge('maps')
+
+
+def load_search_documents(after=None):
+    where = ''
+    args = None
+    if after is not None:
+        where = 'WHERE version.id > %s'
+        args = (after,)
+
+    with db.connection:
+        cursor = db.connection.cursor(db.pymysql.cursors.DictCursor)
+        cursor.execute("""SELECT
+                            version.id AS id,
+                            version.id AS watermark,
+                            map.display_name AS display_name,
+                            version.description AS description,
+                            l.login AS author
+                          FROM """ + TABLE + ' ' + where, args)
+
+        return cursor.fetchall()
+
+
+search_index = SearchIndex(load_search_documents, SEARCH_FIELD_WEIGHTS)
+
 
 def validate_map_info(map_info):
     errors = []
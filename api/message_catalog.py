@@ -0,0 +1,72 @@
+"""
+In-memory copy of the localized strings in the ``messages`` table.
+"""
+import threading
+import time
+
+from faf import db
+
+DEFAULT_LANGUAGE = 'en'
+DEFAULT_REGION = 'US'
+
+
+class MessageCatalog(object):
+    """
+    Resolves message keys to localized strings, falling back from language and region to language only and then to
+    `DEFAULT_LANGUAGE` and `DEFAULT_REGION`.
+
+    The catalog is loaded on first use. After that, the table's checksum is checked at most once every
+    `check_interval` seconds and the catalog is reloaded only if the checksum changed.
+    """
+
+    def __init__(self, check_interval=10):
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._messages = {}  # (key, language, region) -> value
+        self._language_messages = {}  # (key, language) -> value, for the language only fallback
+        self._checksum = None
+        self._last_check = None
+
+    def refresh(self):
+        """
+        Reloads the catalog if the ``messages`` table changed since it was last loaded.
+        """
+        with self._lock:
+            with db.connection:
+                cursor = db.connection.cursor()
+                cursor.execute("CHECKSUM TABLE messages")
+                checksum = cursor.fetchone()[1]
+
+                if self._checksum is None or checksum != self._checksum:
+                    cursor.execute("""SELECT `key`, language, region, value FROM messages
+                                      ORDER BY `key`, language, region""")
+                    messages = {}
+                    language_messages = {}
+                    for key, language, region, value in cursor.fetchall():
+                        messages[(key, language, region)] = value
+                        language_messages.setdefault((key, language), value)
+
+                    self._messages = messages
+                    self._language_messages = language_messages
+                    self._checksum = checksum
+
+            self._last_check = time.time()
+
+    def get(self, key, language=DEFAULT_LANGUAGE, region=DEFAULT_REGION):
+        """
+        Returns the message of `key` in the requested language and region, or the best fallback, or ``None`` if
+        there is no message for `key`.
+        """
+        if key is None:
+            return None
+
+        if self._last_check is None or time.time() - self._last_check >= self._check_interval:
+            self.refresh()
+
+        messages = self._messages
+        value = messages.get((key, language, region))
+        if value is None:
+            value = self._language_messages.get((key, language))
+        if value is None:
+            value = messages.get((key, DEFAULT_LANGUAGE, DEFAULT_REGION))
+        return value
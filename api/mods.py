@@ -10,14 +10,17 @@ from faf.tools.fa.mods import parse_mod_info, generate_thumbnail_file_name, gene
 from flask import request
 from werkzeug.utils import secure_filename
 
-from api import app, oauth
+from api import app, oauth, response_cache
 from api.error import ApiException, ErrorCode
 from api.error import Error
+from api.prometheus import uploads_in_progress
 from api.query_commons import fetch_data
+from api.search import SearchIndex, fetch_search_results
 from faf import db
 
 ALLOWED_EXTENSIONS = ['zip']
 MAX_PAGE_SIZE = 1000
+MAX_SYNC_UIDS = 1000
 
 SELECT_EXPRESSIONS = {
     'id': 'v.uid',
@@ -40,10 +43,16 @@ SELECT_EXPRESSIONS = {
 MODS_TABLE = '''`mod` m
     JOIN mod_version v ON m.id = v.mod_id
     LEFT JOIN mod_stats s ON m.id = s.mod_id
-    JOIN (SELECT mod_id, max(version) version FROM mod_version GROUP BY mod_id) newest_version
+    JOIN mod_latest_version newest_version
         ON newest_version.mod_id = m.id AND newest_version.version = v.version
 '''
 
+SEARCH_FIELD_WEIGHTS = {
+    'display_name': 3,
+    'author': 2,
+    'description': 1
+}
+
 
 @app.route('/mods/upload', methods=['POST'])
 @oauth.require_oauth('upload_mod')
@@ -79,7 +88,7 @@ def mods_upload():
     if not file_allowed(file.filename):
         raise ApiException([Error(ErrorCode.UPLOAD_INVALID_FILE_EXTENSION, *ALLOWED_EXTENSIONS)])
 
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with uploads_in_progress.track_in_progress('mod'), tempfile.TemporaryDirectory() as temp_dir:
         temp_mod_path = os.path.join(temp_dir, secure_filename(file.filename))
         file.save(temp_mod_path)
         process_uploaded_mod(temp_mod_path)
@@ -87,7 +96,59 @@ def mods_upload():
     return {'response': 'ok'}
 
 
+@app.route('/mods/sync', methods=['POST'])
+def mods_sync():
+    """
+    Checks a list of installed mods for updates.
+
+    **Example Request**:
+
+    .. sourcecode:: http
+
+       POST /mods/sync
+
+    .. sourcecode:: http
+
+        {
+          "uids": ["DF8825E2-DDB0-11DC-90F3-3F9B55D89593", "unknown-uid"]
+        }
+
+    **Example Response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Vary: Accept
+        Content-Type: text/javascript
+
+        {
+          "mods": [
+            {
+              "uid": "DF8825E2-DDB0-11DC-90F3-3F9B55D89593",
+              "version": 1,
+              "outdated": true,
+              "newest_uid": "EE8825E2-DDB0-11DC-90F3-3F9B55D89593",
+              "newest_version": 2,
+              "download_url": "http://content.faforever.com/faf/vault/mods/Terrain%20Deform%20for%20FA.v0002.zip"
+            }
+          ],
+          "unknown_uids": ["unknown-uid"]
+        }
+
+    :status 200: No error
+    """
+    uids = (request.get_json(silent=True) or {}).get('uids')
+    if not isinstance(uids, list):
+        raise ApiException([Error(ErrorCode.PARAMETER_MISSING, 'uids')])
+
+    if len(uids) > MAX_SYNC_UIDS:
+        raise ApiException([Error(ErrorCode.QUERY_TOO_MANY_IDS, MAX_SYNC_UIDS, len(uids))])
+
+    return sync_mods(uids)
+
+
 @app.route('/mods/<mod_uid>')
+@response_cache.cached('mods')
 def mod(mod_uid):
     """
     Gets a specific mod definition.
@@ -138,6 +199,7 @@ def mod(mod_uid):
 
 
 @app.route('/mods')
+@response_cache.cached('mods')
 def mods():
     """
     Lists the newest version of all non-hidden mods.
@@ -180,8 +242,15 @@ def mods():
           ]
         }
 
+    :query string filter[search]: Only returns mods whose name, description or author match all given words (or
+        prefixes of them), ordered by relevance unless `sort` is specified
 
     """
+    search_filter = request.values.get('filter[search]')
+    if search_filter:
+        return fetch_search_results(search_index, search_filter, ModSchema(), MODS_TABLE, SELECT_EXPRESSIONS,
+                                    MAX_PAGE_SIZE, request, 'v.uid', where='v.hidden = 0', enricher=enricher)
+
     return fetch_data(ModSchema(), MODS_TABLE, SELECT_EXPRESSIONS, MAX_PAGE_SIZE, request, enricher=enricher,
                       where='v.hidden = 0')
 
@@ -197,6 +266,39 @@ def enricher(mod):
         mod['download_url'] = '{}/faf/vault/{}'.format(app.config['CONTENT_URL'], urllib.parse.quote(mod['download_url']))
 
 
+def sync_mods(uids):
+    """
+    Looks up the newest version of all mods in `uids` with a single query. This function is NOT an endpoint.
+    """
+    uids = list(set(str(uid) for uid in uids))
+    if not uids:
+        return dict(mods=[], unknown_uids=[])
+
+    with db.connection:
+        cursor = db.connection.cursor(db.pymysql.cursors.DictCursor)
+        cursor.execute("""SELECT
+                            installed.uid AS uid,
+                            installed.version AS version,
+                            newest.uid AS newest_uid,
+                            newest.version AS newest_version,
+                            newest.filename AS download_url
+                          FROM mod_version installed
+                          JOIN mod_latest_version latest ON latest.mod_id = installed.mod_id
+                          JOIN mod_version newest
+                            ON newest.mod_id = latest.mod_id AND newest.version = latest.version
+                          WHERE installed.uid IN ({})""".format(','.join(['%s'] * len(uids))), uids)
+
+        result = cursor.fetchall()
+
+    for item in result:
+        item['outdated'] = item['newest_version'] > item['version']
+        enricher(item)
+
+    known_uids = set(item['uid'] for item in result)
+
+    return dict(mods=result, unknown_uids=[uid for uid in uids if uid not in known_uids])
+
+
 def file_allowed(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1] in ALLOWED_EXTENSIONS
@@ -262,10 +364,46 @@ def process_uploaded_mod(temp_mod_path):
                            'display_name': display_name,
                        })
 
+        # Projection of the newest version of each mod, see db_migrations/001_mod_latest_version.sql
+        cursor.execute("""INSERT INTO mod_latest_version (mod_id, version)
+                        SELECT id, %(version)s FROM `mod` WHERE lower(display_name) = lower(%(display_name)s)
+                        ON DUPLICATE KEY UPDATE version = GREATEST(version, VALUES(version))""",
+                       {
+                           'version': version,
+                           'display_name': display_name,
+                       })
+
         cursor.execute("""INSERT INTO mod_stats (mod_id, likers)
                         SELECT id, '' FROM `mod` WHERE lower(display_name) = lower(%s)
                         AND NOT EXISTS (SELECT mod_id FROM mod_stats WHERE mod_id = id)""", (display_name,))
 
+    search_index.notify_update()
+    response_cache.purge('mods')
+
+
+def load_search_documents(after=None):
+    where = 'WHERE v.hidden = 0'
+    args = None
+    if after is not None:
+        where += ' AND v.id > %s'
+        args = (after,)
+
+    with db.connection:
+        cursor = db.connection.cursor(db.pymysql.cursors.DictCursor)
+        cursor.execute("""SELECT
+                            v.uid AS id,
+                            v.id AS watermark,
+                            m.id AS `group`,
+                            m.display_name AS display_name,
+                            v.description AS description,
+                            m.author AS author
+                          FROM """ + MODS_TABLE + ' ' + where, args)
+
+        return cursor.fetchall()
+
+
+search_index = SearchIndex(load_search_documents, SEARCH_FIELD_WEIGHTS)
+
 
 def validate_mod_info(mod_info):
     errors = []
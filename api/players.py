@@ -1,11 +1,12 @@
+import numpy as np
 from faf.api import PlayerSchema
-from faf.api.client.client_base import ApiException
 from faf.api.history_schema import HistorySchema
 from flask import request
-from pymysql.cursors import DictCursor
 
 from api import app, oauth
-from api.error import Error, ErrorCode
+from api.downsampling import largest_triangle_three_buckets
+from api.error import ApiException, Error, ErrorCode
+from api.history_cache import RatingHistoryCache
 from api.query_commons import fetch_data
 from faf import db
 
@@ -15,6 +16,72 @@ PLAYER_SELECT_EXPRESSIONS = {
     'login': 'l.login'
 }
 
+MAX_PLAYERS_PER_REQUEST = 200
+MIN_HISTORY_POINTS = 3
+HISTORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+@app.route('/players')
+def get_players():
+    """
+        Gets the public profiles of multiple players, selected by ID or by login.
+
+        **Example Request**:
+
+        .. sourcecode:: http
+
+           GET /players?filter[id]=21447,781
+
+        **Example Response**:
+
+        .. sourcecode:: http
+
+            HTTP/1.1 200 OK
+            Vary: Accept
+            Content-Type: text/javascript
+
+            {
+              "data": [
+                {
+                  "attributes": {
+                    "id": "21447",
+                    "login": "Downlord"
+                  },
+                  "id": "21447",
+                  "type": "player"
+                },
+                ...
+              ]
+            }
+
+        :query string filter[id]: Comma separated list of player IDs
+        :query string filter[login]: Comma separated list of player logins, used if `filter[id]` is not specified
+
+        :status 200: No error
+        :status 400: Neither filter was specified, or too many players were requested
+
+        """
+    id_filter = request.values.get('filter[id]')
+    login_filter = request.values.get('filter[login]')
+
+    if id_filter:
+        column, values = 'l.id', id_filter.split(',')
+    elif login_filter:
+        column, values = 'l.login', login_filter.split(',')
+    else:
+        raise ApiException([Error(ErrorCode.PARAMETER_MISSING, 'filter[id]')])
+
+    values = [value for value in values if value]
+    if not values:
+        raise ApiException([Error(ErrorCode.PARAMETER_MISSING, 'filter[id]')])
+    if len(values) > MAX_PLAYERS_PER_REQUEST:
+        raise ApiException([Error(ErrorCode.QUERY_TOO_MANY_IDS, MAX_PLAYERS_PER_REQUEST, len(values))])
+
+    return fetch_data(PlayerSchema(), PLAYER_TABLE, PLAYER_SELECT_EXPRESSIONS, MAX_PLAYERS_PER_REQUEST, request,
+                      many=True, limit=False, where='{} IN ({})'.format(column, ','.join(['%s'] * len(values))),
+                      args=tuple(values))
+
+
 @app.route('/players/active')
 def get_active_players():
     """Gets active players, i.e. active in the last x days, max. 30, def. 7"""
@@ -154,6 +221,9 @@ def users_type_get_player_history(rating_type, player_id):
         :type rating_type: 1v1 OR global
         :param player_id: Player ID
         :type player_id: int
+        :query int from: Only returns ratings from this time on (unix timestamp)
+        :query int to: Only returns ratings up to this time (unix timestamp)
+        :query int max_points: Downsamples the history to at most this many points, preserving its shape
 
         :status 200: No error
 
@@ -165,12 +235,43 @@ def users_type_get_player_history(rating_type, player_id):
     else:
         raise ApiException([Error(ErrorCode.QUERY_INVALID_RATING_TYPE, rating_type)])
 
+    time_from = request.values.get('from', type=int)
+    time_to = request.values.get('to', type=int)
+    max_points = request.values.get('max_points', type=int)
+    if max_points is not None and max_points < MIN_HISTORY_POINTS:
+        raise ApiException([Error(ErrorCode.QUERY_INVALID_MAX_POINTS, MIN_HISTORY_POINTS, max_points)])
+
+    history = rating_history_cache.get(player_id, game_mod).slice(time_from, time_to)
+    history = np.column_stack((history.times, history.means, history.deviations))
+
+    if max_points is not None:
+        history = history[largest_triangle_three_buckets(history[:, 0], history[:, 1], max_points)]
+
+    data = dict(id=player_id, history={})
+
+    for score_time, mean, deviation in history.tolist():
+        data['history'][int(score_time)] = [mean, deviation]
+
+    return HistorySchema().dump(data, many=False).data
+
+
+def load_rating_history(player_id, game_mod, after=None):
+    """
+    Loads a player's rating history entries of a game mod, optionally only those scored at or after the unix
+    timestamp `after`.
+    """
+    where = ''
+    if after is not None:
+        # Not strictly after, as other games may have been scored in the same second; see `RatingHistoryCache`
+        where = ' AND scoreTime >= FROM_UNIXTIME(%(after)s)'
+
     with db.connection:
-        cursor = db.connection.cursor(DictCursor)
+        cursor = db.connection.cursor()
         cursor.execute("""SELECT
+                              UNIX_TIMESTAMP(scoreTime) as scoreTime,
                               after_mean,
                               after_deviation,
-                              UNIX_TIMESTAMP(scoreTime) as scoreTime
+                              gameId
                             FROM game_player_stats
                               JOIN game_stats ON game_player_stats.gameId = game_stats.id
                               JOIN game_featuredMods ON game_stats.gameMod = game_featuredMods.id
@@ -180,17 +281,15 @@ def users_type_get_player_history(rating_type, player_id):
                                   AND scoreTime IS NOT NULL
                                   AND game_featuredMods.gamemod = %(game_mod)s
                                   AND game_player_stats.playerId = %(player_id)s
-                            """,
+                            """ + where + """
+                            ORDER BY scoreTime, gameId""",
                        {
                            'game_mod': game_mod,
-                           'player_id': player_id
+                           'player_id': player_id,
+                           'after': after
                        })
 
-        result = cursor.fetchall()
+        return cursor.fetchall()
 
-    data = dict(id=player_id, history={})
 
-    for item in result:
-        data['history'][item['scoreTime']] = [item['after_mean'], item['after_deviation']]
-
-    return HistorySchema().dump(data, many=False).data
+rating_history_cache = RatingHistoryCache(load_rating_history, HISTORY_CACHE_MAX_BYTES)
@@ -0,0 +1,125 @@
+"""
+Statistical profiler that samples the stacks of a fraction of requests and aggregates them per endpoint.
+"""
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+TRUNCATED_STACK = '[truncated]'
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return '{}:{}:{}'.format(frame.f_globals.get('__name__', code.co_filename), code.co_name, code.co_firstlineno)
+
+
+def collapse(frame, max_depth):
+    """
+    Returns the stack of `frame` in the collapsed format, outermost frame first and frames separated by ``;``.
+    """
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler(object):
+    """
+    Samples the stack of the threads handling profiled requests every `interval` seconds in a background thread.
+
+    A request is profiled with a probability of `sample_rate`; call `start_request` when it starts and `stop_request`
+    when it's done. Per endpoint, at most `max_stacks` distinct stacks are kept, further ones are counted as
+    `TRUNCATED_STACK`. The sampling thread is only started once the first request is profiled and sleeps while no
+    request is.
+    """
+
+    def __init__(self, sample_rate=0.0, interval=0.005, max_depth=100, max_stacks=10000):
+        self._sample_rate = sample_rate
+        self._interval = interval
+        self._max_depth = max_depth
+        self._max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._active = {}  # thread ID -> endpoint
+        self._stacks = {}  # endpoint -> Counter of collapsed stacks
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def configure(self, sample_rate=None, interval=None):
+        if sample_rate is not None:
+            self._sample_rate = sample_rate
+        if interval is not None:
+            self._interval = interval
+
+    @property
+    def enabled(self):
+        return self._sample_rate > 0
+
+    def start_request(self, endpoint):
+        """
+        Decides whether the current request is profiled and, if so, starts sampling the current thread.
+        """
+        if random.random() >= self._sample_rate:
+            return
+
+        with self._lock:
+            self._active[threading.get_ident()] = endpoint or 'unknown'
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop_request(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def sample(self):
+        """
+        Takes one sample of every thread that handles a profiled request.
+        """
+        with self._lock:
+            active = dict(self._active)
+
+        frames = sys._current_frames()
+        samples = [(endpoint, collapse(frames[thread_id], self._max_depth))
+                   for thread_id, endpoint in active.items() if thread_id in frames]
+
+        with self._lock:
+            for endpoint, stack in samples:
+                stacks = self._stacks.setdefault(endpoint, Counter())
+                if stack not in stacks and len(stacks) >= self._max_stacks:
+                    stack = TRUNCATED_STACK
+                stacks[stack] += 1
+
+    def collapsed(self, endpoint=None):
+        """
+        Returns the sampled stacks in the collapsed format of flamegraph.pl: one line per stack, the endpoint being
+        the outermost frame, followed by a space and the number of samples. If `endpoint` is given, only its stacks are
+        returned.
+        """
+        with self._lock:
+            lines = ['{};{} {}'.format(stack_endpoint, stack, count)
+                     for stack_endpoint, stacks in sorted(self._stacks.items())
+                     if endpoint in (None, stack_endpoint)
+                     for stack, count in sorted(stacks.items())]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def clear(self):
+        with self._lock:
+            self._stacks.clear()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+                    continue
+
+            self.sample()
+            time.sleep(self._interval)
+
+
+profiler = SamplingProfiler()
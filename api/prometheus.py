@@ -0,0 +1,433 @@
+"""
+Metrics in the Prometheus text exposition format, served at ``/metrics``.
+"""
+import fcntl
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from faf import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Samples of the processes that exited, in a directory of multiple processes
+ARCHIVE_FILENAME = 'archive.json'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join('{}="{}"'.format(name, value) for name, value in zip(names, escaped)) + '}'
+
+
+def process_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metric(object):
+    """
+    Base class of metrics with the label names `labels`, whose samples are kept per combination of label values.
+    """
+    type_ = None
+    # Whether the samples of processes that exited are still included when aggregating multiple processes
+    include_exited = True
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # tuple of label values -> sample
+
+    def samples(self):
+        """
+        Returns a copy of the current samples, a dict of tuples of label values to samples.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, samples_list):
+        """
+        Returns the sum of several processes' samples.
+        """
+        merged = {}
+        for samples in samples_list:
+            for label_values, sample in samples.items():
+                merged[label_values] = self._add(merged[label_values], sample) if label_values in merged else sample
+        return merged
+
+    def render(self, samples=None):
+        """
+        Returns the lines of the metric's samples, or of `samples` if given.
+        """
+        if samples is None:
+            samples = self.samples()
+
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} {}'.format(self.name, self.type_)]
+        for label_values, value in sorted(samples.items()):
+            lines.extend(self._render_sample(label_values, value))
+        return lines
+
+    def _add(self, sample, other):
+        return sample + other
+
+    def _render_sample(self, label_values, value):
+        return ['{}{} {}'.format(self.name, format_labels(self.labels, label_values), format_value(value))]
+
+
+class Counter(Metric):
+    type_ = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    type_ = 'gauge'
+    include_exited = False
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    @contextmanager
+    def track_in_progress(self, *label_values):
+        """
+        Context manager that increments the gauge while its block runs.
+        """
+        self.inc(*label_values)
+        try:
+            yield
+        finally:
+            self.dec(*label_values)
+
+
+class CallbackGauge(Metric):
+    """
+    A gauge whose value is determined by calling `callback` at scrape time. The callback returns either a single value
+    or, if the gauge has labels, a dict of tuples of label values to values.
+    """
+    type_ = 'gauge'
+    include_exited = False
+
+    def __init__(self, name, help, callback, labels=()):
+        super().__init__(name, help, labels)
+        self._callback = callback
+
+    def samples(self):
+        values = self._callback()
+        return dict(values) if self.labels else {(): values}
+
+
+class Histogram(Metric):
+    type_ = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            sample = self._values.get(label_values)
+            if sample is None:
+                # Counts per bucket (not cumulative, the last one being +Inf), sum
+                sample = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0]
+            sample[0][bisect_left(self.buckets, value)] += 1
+            sample[1] += value
+
+    def samples(self):
+        with self._lock:
+            return {label_values: [list(bucket_counts), total]
+                    for label_values, (bucket_counts, total) in self._values.items()}
+
+    def _add(self, sample, other):
+        return [[count + other_count for count, other_count in zip(sample[0], other[0])], sample[1] + other[1]]
+
+    def _render_sample(self, label_values, sample):
+        bucket_counts, total = sample
+        labels = self.labels + ('le',)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), bucket_counts):
+            cumulative += count
+            bucket_labels = format_labels(labels, label_values + (format_value(bound),))
+            lines.append('{}_bucket{} {}'.format(self.name, bucket_labels, cumulative))
+        lines.append('{}_sum{} {}'.format(self.name, format_labels(self.labels, label_values), format_value(total)))
+        lines.append('{}_count{} {}'.format(self.name, format_labels(self.labels, label_values), cumulative))
+        return lines
+
+
+class Registry(object):
+    """
+    The metrics served at ``/metrics``.
+
+    Metrics are kept in memory, so by default only those of the current process are rendered. If `directory` is
+    configured, all processes using it are aggregated: each process writes its samples to a file in it every
+    `write_interval` seconds (see `start_writer`). Counters and histograms are summed over all processes that ever
+    wrote to the directory, so they don't go backwards when a process exits. Gauges are summed over running
+    processes. When rendering, the files of exited processes are merged into a single archive file and deleted, so
+    the directory doesn't grow with every process that ever ran. The directory should be emptied whenever the whole
+    application is restarted.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._directory = None
+        self._write_interval = 1
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, directory=None, write_interval=None):
+        if directory is not None:
+            self._directory = directory
+        if write_interval is not None:
+            self._write_interval = write_interval
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Returns all metrics in the text exposition format.
+        """
+        processes = None
+        if self._directory is not None:
+            self.write()
+            self.archive()
+            processes = self.read()
+
+        lines = []
+        for metric in self._metrics:
+            if processes is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(metric.merge(samples.get(metric.name, {}) for running, samples in processes
+                                                        if running or metric.include_exited)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """
+        Writes the samples of the current process to its file in `directory`.
+        """
+        self._write_file('{}.json'.format(os.getpid()), {metric.name: metric.samples() for metric in self._metrics})
+
+    def archive(self):
+        """
+        Merges the samples of the processes in `directory` that exited into the archive file and deletes their files.
+        Only the metrics that include exited processes are kept.
+        """
+        with open(os.path.join(self._directory, ARCHIVE_FILENAME + '.lock'), 'w') as lock:
+            # Processes archiving at the same time would count the exited processes twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            exited = [filename for pid, filename in self._process_files() if not process_running(pid)]
+            if not exited:
+                return
+
+            archived = self._read_file(ARCHIVE_FILENAME)
+            if archived is None:
+                # Replacing an unreadable archive would lose its samples
+                return
+
+            samples_list = [archived] + [self._read_file(filename) for filename in exited]
+            self._write_file(ARCHIVE_FILENAME, {
+                metric.name: metric.merge(samples.get(metric.name, {}) for samples in samples_list if samples)
+                for metric in self._metrics if metric.include_exited
+            })
+            for filename in exited:
+                os.remove(os.path.join(self._directory, filename))
+
+    def read(self):
+        """
+        Returns the samples of all processes in `directory`, as a list of tuples of whether the process is running and
+        a dict of metric names to samples. The archive counts as a single process that isn't running.
+        """
+        processes = []
+        for pid, filename in self._process_files():
+            samples = self._read_file(filename)
+            if samples is not None:
+                processes.append((process_running(pid), samples))
+
+        if os.path.exists(os.path.join(self._directory, ARCHIVE_FILENAME)):
+            samples = self._read_file(ARCHIVE_FILENAME)
+            if samples is not None:
+                processes.append((False, samples))
+        return processes
+
+    def _process_files(self):
+        """
+        Returns the PIDs and file names of the processes that wrote to `directory`.
+        """
+        files = []
+        for filename in os.listdir(self._directory):
+            name, extension = os.path.splitext(filename)
+            if extension == '.json' and name.isdigit():
+                files.append((int(name), filename))
+        return files
+
+    def _read_file(self, filename):
+        """
+        Returns the samples in a file of `directory` as a dict of metric names to samples, an empty dict if the file
+        doesn't exist or ``None`` if it can't be read.
+        """
+        try:
+            with open(os.path.join(self._directory, filename)) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning('Could not read metrics file %s', filename)
+            return None
+
+        return {metric_name: {tuple(label_values): sample for label_values, sample in metric_samples}
+                for metric_name, metric_samples in data.items()}
+
+    def _write_file(self, filename, samples):
+        """
+        Atomically replaces a file of `directory` with `samples`, a dict of metric names to samples.
+        """
+        data = {metric_name: [[list(label_values), sample] for label_values, sample in metric_samples.items()]
+                for metric_name, metric_samples in samples.items()}
+
+        path = os.path.join(self._directory, filename)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(path + '.tmp', path)
+
+    def start_writer(self):
+        """
+        Starts the thread that writes the current process's samples if a directory is configured. Call it in every
+        process, e.g. on each request, as threads don't survive forking.
+        """
+        if self._directory is None or self._writer_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+
+        threading.Thread(target=self._write_periodically, name='prometheus_writer', daemon=True).start()
+
+    def _write_periodically(self):
+        while True:
+            time.sleep(self._write_interval)
+            try:
+                self.write()
+            except OSError:
+                logger.exception('Could not write metrics to %s', self._directory)
+
+
+class CountingCache(object):
+    """
+    Wraps a werkzeug cache and counts the hits and misses of `get` in `counter`, labeled with `cache_name`. All other
+    attributes are passed through.
+    """
+
+    def __init__(self, cache, cache_name, counter):
+        self._cache = cache
+        self._cache_name = cache_name
+        self._counter = counter
+
+    def get(self, key):
+        value = self._cache.get(key)
+        self._counter.inc(self._cache_name, 'miss' if value is None else 'hit')
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+
+class CountingGrantProvider(object):
+    """
+    Wraps an OAuth2 provider to be passed to ``bind_cache_grant``, so that the grant getter it registers counts its
+    hits and misses like `counting_getter`. All other attributes are passed through.
+    """
+
+    def __init__(self, provider, cache_name, counter):
+        self._provider = provider
+        self._cache_name = cache_name
+        self._counter = counter
+
+    def grantgetter(self, getter):
+        return self._provider.grantgetter(counting_getter(getter, self._cache_name, self._counter))
+
+    def __getattr__(self, name):
+        return getattr(self._provider, name)
+
+
+def counting_getter(getter, cache_name, counter):
+    """
+    Wraps a function that looks up a cached value, or returns ``None`` if there is none, and counts its hits and misses
+    like `CountingCache`.
+    """
+
+    @functools.wraps(getter)
+    def counted_getter(*args, **kwargs):
+        value = getter(*args, **kwargs)
+        counter.inc(cache_name, 'miss' if value is None else 'hit')
+        return value
+
+    return counted_getter
+
+
+def db_connection_open():
+    connection = db.connection
+    return int(connection is not None and bool(connection.open))
+
+
+def deployment_workers():
+    # See GameDeploymentConfiguration.deploy
+    return sum(1 for thread in threading.enumerate() if thread.name == 'deploy_worker')
+
+
+def response_cache_size():
+    from api import response_cache
+    return {('entries',): len(response_cache), ('bytes',): response_cache.nbytes}
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'faf_api_request_duration_seconds', 'Time spent handling requests.', ('endpoint', 'status')))
+cache_requests = registry.register(Counter(
+    'faf_api_cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result')))
+uploads_in_progress = registry.register(Gauge(
+    'faf_api_uploads_in_progress', 'Uploads that are currently being processed.', ('type',)))
+deployments_finished = registry.register(Counter(
+    'faf_api_deployments_finished_total', 'Finished deployments.'))
+registry.register(CallbackGauge(
+    'faf_api_db_connection_open', 'Open database connections; each process has one, shared by all its requests.',
+    db_connection_open))
+registry.register(CallbackGauge(
+    'faf_api_deployment_workers', 'Game deployments that are currently being built.', deployment_workers))
+registry.register(CallbackGauge(
+    'faf_api_response_cache_size', 'Size of the response cache.', response_cache_size, ('unit',)))
@@ -1,7 +1,11 @@
+import time
+
 from faf import db
 from pymysql.cursors import DictCursor
 
 from api.error import ApiException, Error, ErrorCode
+from api.instrumentation import endpoint_metric, metrics
+from api.slow_queries import slow_query_log
 
 
 def get_select_expressions(fields, field_expression_dict):
@@ -155,25 +159,36 @@ def fetch_data(schema, table, root_select_expression_dict, max_page_size, reques
     if where_extension:
         where = where + " " + where_extension
 
+    endpoint = request.endpoint
+    sql = "SELECT {} FROM {} {} {} {}".format(select_expressions, table, where, order_by_expression, limit_expression)
     with db.connection:
         cursor = db.connection.cursor(DictCursor)
-        cursor.execute("SELECT {} FROM {} {} {} {}"
-                       .format(select_expressions, table, where, order_by_expression, limit_expression),
-                       args)
+        start = time.perf_counter()
+        cursor.execute(sql, args)
+        duration = (time.perf_counter() - start) * 1000
+        metrics.timing(endpoint_metric(endpoint, 'fetch_data.sql'), duration)
 
-        if many:
-            result = cursor.fetchall()
-        else:
-            result = cursor.fetchone()
+        with metrics.timer(endpoint_metric(endpoint, 'fetch_data.fetch')):
+            if many:
+                result = cursor.fetchall()
+            else:
+                result = cursor.fetchone()
+
+        row_count = len(result) if many else int(result is not None)
+        slow_query_log.record(sql, args, endpoint, duration, row_count, cursor)
+
+    metrics.timing(endpoint_metric(endpoint, 'fetch_data.rows'), row_count)
 
     if enricher:
-        if many:
-            for item in result:
-                enricher(item)
-        elif result:
-            enricher(result)
+        with metrics.timer(endpoint_metric(endpoint, 'fetch_data.enrich')):
+            if many:
+                for item in result:
+                    enricher(item)
+            elif result:
+                enricher(result)
 
-    data = schema.dump(result, many=many).data
+    with metrics.timer(endpoint_metric(endpoint, 'fetch_data.dump')):
+        data = schema.dump(result, many=many).data
 
     # TODO `id` is treated specially, that means it's put into ['data'] and NOT into ['attributes']
     # Schema().loads() however only returns ['attributes'] - and I found no way to either change that, or add 'id'
@@ -190,6 +205,125 @@ def fetch_data(schema, table, root_select_expression_dict, max_page_size, reques
     return data
 
 
+def sort_items(items, sort_expression, valid_fields):
+    """
+    Sorts a list of dicts in place according to a json-api conform sort expression, like `get_order_by` does for
+    queries. ``None`` values are sorted first, like in MySQL.
+
+    :param items: the list of dicts to sort
+    :param sort_expression: a json-api conform sort expression, e.g. ``likes,-timestamp``
+    :param valid_fields: a list of valid sort fields
+    """
+    if not sort_expression:
+        return
+
+    sort_fields = []
+    for expression in sort_expression.split(','):
+        if not expression or expression == '-':
+            continue
+
+        descending = expression[0] == '-'
+        column = expression[1:] if descending else expression
+
+        if column not in valid_fields:
+            raise ApiException([Error(ErrorCode.QUERY_INVALID_SORT_FIELD, column)])
+
+        sort_fields.append((column, descending))
+
+    # Python's sort is stable, so sorting by the least significant field first results in a multi-field sort
+    for column, descending in reversed(sort_fields):
+        items.sort(key=lambda item: (item.get(column) is not None, item.get(column)), reverse=descending)
+
+
+def dump_items(schema, items, request, many=True):
+    """
+    Dumps items that have been loaded already (e.g. from memory) like `fetch_data` does, including the selection of
+    the requested fields.
+
+    :param schema: the marshmallow schema to use for serialization
+    :param items: a list of dicts if `many` is ``True``, a single dict otherwise
+    :param request: the flask HTTP request
+    """
+    requested_fields = request.values.get('fields[{}]'.format(schema.Meta.type_))
+
+    id_selected = True
+    if requested_fields:
+        fields = set(requested_fields.split(','))
+        id_selected = 'id' in fields
+        fields.add('id')
+        if many:
+            items = [{key: value for key, value in item.items() if key in fields} for item in items]
+        else:
+            items = {key: value for key, value in items.items() if key in fields}
+
+    with metrics.timer(endpoint_metric(request.endpoint, 'dump_items.dump')):
+        data = schema.dump(items, many=many).data
+
+    if id_selected:
+        for item in data['data'] if many else [data['data']]:
+            if 'id' in item and 'attributes' in item:
+                item['attributes']['id'] = item['id']
+
+    return data
+
+
+class DatabaseClock(object):
+    """
+    The database's current time as a unix timestamp, without querying the database on every call: the offset of its
+    clock to the local one is only measured every `check_interval` seconds.
+    """
+
+    def __init__(self, check_interval=600):
+        self.check_interval = check_interval
+        self._offset = None
+        self._last_check = None
+
+    def time(self):
+        now = time.time()
+        if self._last_check is None or now - self._last_check >= self.check_interval:
+            with db.connection:
+                cursor = db.connection.cursor()
+                cursor.execute("SELECT UNIX_TIMESTAMP()")
+                database_time = cursor.fetchone()[0]
+            # Measured after the query, so that the offset errs towards the past; clients then receive rows they
+            # already know rather than miss some
+            now = time.time()
+            self._offset = database_time - now
+            self._last_check = now
+
+        return int(now + self._offset)
+
+
+database_clock = DatabaseClock()
+
+
+def get_updated_since_filter(request, column='update_time'):
+    """
+    Builds a WHERE clause for delta syncs from the ``filter[updated_since]`` parameter (a unix timestamp), along with
+    the database's current time (see `DatabaseClock`), which clients pass as ``filter[updated_since]`` on their next
+    sync.
+
+    The clause includes rows updated within the same second as the timestamp, so clients may receive rows they already
+    know, but never miss one.
+
+    :param request: the flask HTTP request
+    :param column: the SQL expression of the update time
+    :return: a tuple of the WHERE clause (empty if no filter is requested), its arguments and the server time
+    """
+    server_time = database_clock.time()
+
+    raw_updated_since = request.values.get('filter[updated_since]')
+    if raw_updated_since is None:
+        return '', (), server_time
+
+    try:
+        updated_since = int(raw_updated_since)
+    except ValueError:
+        raise ApiException([Error(ErrorCode.QUERY_INVALID_TIMESTAMP, 'filter[updated_since]', raw_updated_since)])
+
+    return '{} >= FROM_UNIXTIME(%s)'.format(column), (updated_since,), server_time
+
+
 def get_page_attributes(max_page_size, request):
     raw_page_size = request.values.get('page[size]', max_page_size)
     try:
@@ -0,0 +1,153 @@
+"""
+In-memory rating distribution, kept up to date by applying rating changes instead of aggregating the whole rating
+table on every request.
+"""
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+from faf import db
+
+# The finest supported bucket width; coarser distributions are aggregated from buckets of this width
+BUCKET_WIDTH = 10
+# Only players with 0 <= mean <= 3000 and deviation <= 240 are counted, so ratings are within [-720, 3000]
+MIN_RATING = -800
+MAX_RATING = 3100
+
+
+class RatingDistribution(object):
+    """
+    Histogram of the ratings (``mean - 3 * deviation``) of all active players in `table_name`.
+
+    The histogram is loaded on first use. After that, only rows whose ``update_time`` changed since the last poll are
+    read, at most once every `poll_interval` seconds, and applied as deltas. Rating changes that are known to the API
+    can be applied right away using `update_player`.
+
+    Polling can't see deleted rows, nor rows whose ``update_time`` is NULL, so the whole histogram is rebuilt every
+    `rebuild_interval` seconds.
+    """
+
+    def __init__(self, table_name, poll_interval=10, rebuild_interval=3600):
+        self._table_name = table_name
+        self._poll_interval = poll_interval
+        self._rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._counts = array('l', [0] * ((MAX_RATING - MIN_RATING) // BUCKET_WIDTH))
+        self._player_buckets = {}  # player ID -> index of the bucket the player is counted in
+        self._watermark = None
+        self._last_poll = None
+        self._last_rebuild = None
+
+    def refresh(self):
+        """
+        Applies all rating changes since the last refresh, or loads the whole table if it hasn't been loaded yet.
+        """
+        with self._lock:
+            where = ''
+            args = None
+            if self._watermark is not None:
+                # Rows updated within the same second as the watermark are read again; applying them is idempotent
+                where = 'WHERE update_time >= %s'
+                args = (self._watermark,)
+
+            with db.connection:
+                cursor = db.connection.cursor()
+                # The watermark is the database's time rather than the newest update_time read, so that it advances
+                # even if no row read has an update_time
+                cursor.execute("SELECT NOW()")
+                watermark = cursor.fetchone()[0]
+                cursor.execute("SELECT id, mean, deviation, numGames, is_active FROM {} {}"
+                               .format(self._table_name, where), args)
+
+                for player_id, mean, deviation, num_games, is_active in cursor.fetchall():
+                    self.update_player(player_id, mean, deviation, num_games, is_active)
+
+            self._watermark = watermark
+            self._last_poll = time.time()
+            if self._last_rebuild is None:
+                self._last_rebuild = self._last_poll
+
+    def rebuild(self):
+        """
+        Discards the histogram and loads the whole table.
+        """
+        with self._lock:
+            self._clear()
+            self.refresh()
+
+    def update_player(self, player_id, mean, deviation, num_games, is_active):
+        """
+        Moves a player into the bucket of their current rating, or removes them if they're no longer counted.
+        """
+        with self._lock:
+            old_bucket = self._player_buckets.pop(player_id, None)
+            if old_bucket is not None:
+                self._counts[old_bucket] -= 1
+
+            if not is_active or not num_games or mean is None or deviation is None \
+                    or not 0 <= mean <= 3000 or deviation > 240:
+                return
+
+            bucket = (math.floor(mean - 3 * deviation) - MIN_RATING) // BUCKET_WIDTH
+            self._counts[bucket] += 1
+            self._player_buckets[player_id] = bucket
+
+    def distribution(self, bucket_width=100):
+        """
+        Returns a dict mapping the lower bound of every non-empty bucket to the number of players in it.
+
+        :param bucket_width: the width of the returned buckets, must be a positive multiple of `BUCKET_WIDTH`
+        """
+        counts = self._snapshot()
+
+        result = {}
+        for index, count in enumerate(counts):
+            if count:
+                rating = (MIN_RATING + index * BUCKET_WIDTH) // bucket_width * bucket_width
+                result[rating] = result.get(rating, 0) + count
+
+        return result
+
+    def percentile(self, rating):
+        """
+        Returns the percentage of players with a rating lower than `rating`, to a precision of `BUCKET_WIDTH`.
+        """
+        cumulative = list(accumulate(self._snapshot()))
+        if not cumulative[-1]:
+            return 0
+
+        index = (math.floor(rating) - MIN_RATING) // BUCKET_WIDTH
+        if index <= 0:
+            return 0
+        if index >= len(cumulative):
+            return 100
+
+        return 100 * cumulative[index - 1] / cumulative[-1]
+
+    def rating_at_percentile(self, percentile):
+        """
+        Returns the lower bound of the bucket that contains the player at `percentile`, or `None` if there are no
+        players.
+        """
+        cumulative = list(accumulate(self._snapshot()))
+        if not cumulative[-1]:
+            return None
+
+        rank = max(1, math.ceil(cumulative[-1] * min(max(percentile, 0), 100) / 100))
+        return MIN_RATING + bisect_left(cumulative, rank) * BUCKET_WIDTH
+
+    def _snapshot(self):
+        now = time.time()
+        if self._last_rebuild is not None and now - self._last_rebuild >= self._rebuild_interval:
+            self.rebuild()
+        elif self._last_poll is None or now - self._last_poll >= self._poll_interval:
+            self.refresh()
+
+        with self._lock:
+            return array('l', self._counts)
@@ -0,0 +1,364 @@
+"""
+Cache of rendered responses of public GET endpoints, invalidated by tags when the underlying resources change.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import faf.db as db
+from flask import current_app, request
+
+from api import compression
+
+# Rough per-entry overhead of the entry object, its key and its bookkeeping, counted towards the memory limit
+ENTRY_OVERHEAD_BYTES = 512
+# How long requests wait for another request that computes the same response before computing it themselves
+FLIGHT_TIMEOUT = 30
+
+
+class CacheEntry(object):
+    """
+    A cached response. Only the parts needed to rebuild the response are kept, along with the body compressed with
+    each of the available content codings (`encoded_bodies`), if it's worth compressing.
+
+    The entry's strong ETag is a hash of its body; compressed representations get the coding appended. There's no
+    ``Last-Modified``: the time an entry was cached differs between processes and says nothing about when its data
+    changed, whereas the ETag is the same for the same body in every process.
+    """
+
+    def __init__(self, body, status_code, headers, tags, expires, stale_expires=None, encoded_bodies=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers
+        self.tags = tags
+        self.expires = expires
+        # Until then, the expired entry may still be served while it's being recomputed
+        self.stale_expires = stale_expires or expires
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.encoded_bodies = encoded_bodies or {}  # content coding -> compressed body
+        self.size = (len(body) + sum(len(data) for data in self.encoded_bodies.values())
+                     + sum(len(name) + len(value) for name, value in headers) + ENTRY_OVERHEAD_BYTES)
+
+    @classmethod
+    def from_response(cls, response, tags, timeout, stale_timeout=0):
+        body = response.get_data()
+        encoded_bodies = {}
+        if compression.is_compressible(response) and len(body) >= compression.MIN_SIZE:
+            encoded_bodies = {encoding: compression.compress(body, encoding)
+                              for encoding in compression.available_encodings()}
+
+        # The length depends on the representation that is sent
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() != 'content-length']
+        if encoded_bodies:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        expires = time.time() + timeout
+        return cls(body, response.status_code, headers, tags, expires, expires + stale_timeout,
+                   encoded_bodies=encoded_bodies)
+
+    def validators(self, encoding=None):
+        """
+        The ``ETag`` header of the representation with the given content coding.
+        """
+        return [('ETag', '"{}"'.format(self._etag(encoding)))]
+
+    def is_not_modified(self, if_none_match, encoding=None):
+        """
+        Returns whether a conditional request with the given ``If-None-Match`` ETags (a container of unquoted ETags)
+        can be answered with 304 Not Modified.
+        """
+        return bool(if_none_match) and (self._etag(encoding) in if_none_match or '*' in if_none_match)
+
+    def is_expired(self, now=None):
+        return (now or time.time()) >= self.expires
+
+    def is_stale_expired(self, now=None):
+        return (now or time.time()) >= self.stale_expires
+
+    def to_response(self):
+        """
+        Returns the cached response in the best content coding the client accepts, or an empty 304 response if the
+        current request is conditional and the client's copy is still up to date.
+        """
+        encoding = None
+        if self.encoded_bodies:
+            encoding = compression.choose_encoding(request.accept_encodings)
+            if encoding not in self.encoded_bodies:
+                encoding = None
+
+        if self.is_not_modified(request.if_none_match, encoding):
+            return current_app.response_class(status=304, headers=self.validators(encoding))
+
+        if encoding is None:
+            return current_app.response_class(self.body, status=self.status_code,
+                                              headers=self.headers + self.validators())
+
+        return current_app.response_class(self.encoded_bodies[encoding], status=self.status_code,
+                                          headers=self.headers + self.validators(encoding)
+                                          + [('Content-Encoding', encoding)])
+
+    def _etag(self, encoding):
+        return self.etag if encoding is None else '{}-{}'.format(self.etag, encoding)
+
+
+class DatabaseTagVersions(object):
+    """
+    Counts the purges of each tag in the database, so that processes can tell which tags other processes purged. See
+    db_migrations/003_response_cache_tags.sql.
+    """
+
+    def load(self):
+        """
+        Returns a dict of tags to their versions.
+        """
+        with db.connection:
+            cursor = db.connection.cursor()
+            cursor.execute('SELECT tag, version FROM response_cache_tags')
+            return dict(cursor.fetchall())
+
+    def increment(self, tags):
+        """
+        Increments the versions of `tags` and returns their new versions.
+        """
+        with db.connection:
+            cursor = db.connection.cursor()
+            cursor.executemany('''INSERT INTO response_cache_tags (tag, version) VALUES (%s, 1)
+                                  ON DUPLICATE KEY UPDATE version = version + 1''', [(tag,) for tag in tags])
+            cursor.execute('SELECT tag, version FROM response_cache_tags WHERE tag IN %s', (tags,))
+            return dict(cursor.fetchall())
+
+
+class ResponseCache(object):
+    """
+    An LRU cache of responses that uses at most `max_bytes` of memory. Entries expire after `default_timeout`
+    seconds, unless another timeout is given, and are tagged with the resources they contain so that they can be
+    purged when those resources change. Use `cached` to cache the responses of a view.
+
+    Cached responses carry an ``ETag`` header; conditional requests for unchanged responses are answered with 304 Not
+    Modified.
+
+    Only one request per key computes a missing response at a time; concurrent requests for the same key wait for its
+    result instead of running the same queries. Expired entries are kept for another `stale_timeout` seconds, during
+    which they are served to all requests but the one recomputing them.
+
+    Each process has its own cache. If `tag_versions` (e.g. `DatabaseTagVersions`) is set, purges are shared with
+    the other processes through it: every `sync_interval` seconds, the entries of tags that other processes purged in
+    the meantime are removed.
+
+    `key_function` returns the cache key of the current request.
+    """
+
+    def __init__(self, key_function, max_bytes=64 * 1024 * 1024, default_timeout=3600, stale_timeout=300,
+                 tag_versions=None, sync_interval=5):
+        self._key_function = key_function
+        self._max_bytes = max_bytes
+        self._default_timeout = default_timeout
+        self._stale_timeout = stale_timeout
+        self._tag_versions = tag_versions
+        self._sync_interval = sync_interval
+        self._known_versions = None  # tag -> version as of the last sync
+        self._next_sync = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> CacheEntry, least recently used first
+        self._tags = {}  # tag -> set of keys
+        self._flights = {}  # key -> threading.Event, set once the request computing the key's response is done
+        self._generation = 0  # incremented by every purge, so that responses computed before aren't cached
+        self._size = 0
+
+    def configure(self, max_bytes=None, default_timeout=None, stale_timeout=None, tag_versions=None,
+                  sync_interval=None):
+        with self._lock:
+            if max_bytes is not None:
+                self._max_bytes = max_bytes
+            if default_timeout is not None:
+                self._default_timeout = default_timeout
+            if stale_timeout is not None:
+                self._stale_timeout = stale_timeout
+            if tag_versions is not None:
+                self._tag_versions = tag_versions
+                self._known_versions = None
+                self._next_sync = 0
+            if sync_interval is not None:
+                self._sync_interval = sync_interval
+            self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._size
+
+    def get(self, key, stale=False):
+        """
+        Returns the entry of `key`, or ``None`` if there is none or it expired. If `stale` is set, expired entries are
+        returned until they're too stale to be served.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.is_stale_expired():
+                self._remove(key)
+                return None
+            if not stale and entry.is_expired():
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, generation=None):
+        """
+        Adds an entry. If `generation` is given and there has been a purge since, the entry is discarded.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._remove(key)
+            if entry.size > self._max_bytes:
+                return
+
+            self._entries[key] = entry
+            self._size += entry.size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._evict()
+
+    def purge(self, *tags):
+        """
+        Removes all entries tagged with any of `tags`, in all processes if `tag_versions` is set.
+        """
+        with self._lock:
+            self._purge(tags)
+
+        if self._tag_versions is not None and tags:
+            versions = self._tag_versions.increment(tags)
+            with self._lock:
+                # This process is up to date with its own purges already
+                if self._known_versions is not None:
+                    self._known_versions.update(versions)
+
+    def sync(self, now=None):
+        """
+        Removes the entries of tags that other processes purged since the last sync. Does nothing if the last sync
+        was less than `sync_interval` seconds ago.
+        """
+        if self._tag_versions is None:
+            return
+
+        now = now or time.time()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self._sync_interval
+
+        versions = self._tag_versions.load()
+        with self._lock:
+            if self._known_versions is not None:
+                self._purge([tag for tag, version in versions.items() if self._known_versions.get(tag) != version])
+            self._known_versions = versions
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def cached(self, *tags, timeout=None):
+        """
+        Decorator that caches successful responses of GET requests to a view, tagged with `tags`. Other requests
+        are passed through.
+
+        :param tags: the resources the responses contain, e.g. ``'maps'``
+        :param timeout: the number of seconds after which entries expire, defaults to `default_timeout`
+        """
+
+        def decorator(view):
+            @functools.wraps(view)
+            def decorated_view(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                self.sync()
+                key = self._key_function()
+                entry = self.get(key, stale=True)
+                if entry is not None and not entry.is_expired():
+                    return entry.to_response()
+
+                flight, leader = self._join_flight(key)
+                if not leader:
+                    if entry is not None:
+                        # Another request is recomputing the response already
+                        return entry.to_response()
+
+                    flight.wait(FLIGHT_TIMEOUT)
+                    entry = self.get(key)
+                    if entry is not None:
+                        return entry.to_response()
+                    # The other request failed, didn't get a cacheable response or took too long
+                    return self._compute(key, view, args, kwargs, tags, timeout)
+
+                try:
+                    return self._compute(key, view, args, kwargs, tags, timeout)
+                finally:
+                    self._land_flight(key, flight)
+
+            return decorated_view
+
+        return decorator
+
+    def _compute(self, key, view, args, kwargs, tags, timeout):
+        generation = self._generation
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+
+        entry = CacheEntry.from_response(response, tags, timeout or self._default_timeout, self._stale_timeout)
+        self.set(key, entry, generation)
+        return entry.to_response()
+
+    def _join_flight(self, key):
+        """
+        Returns the flight of `key` and whether the caller started it and therefore has to compute the response.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+
+            flight = self._flights[key] = threading.Event()
+            return flight, True
+
+    def _land_flight(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.set()
+
+    def _purge(self, tags):
+        self._generation += 1
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        self._size -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _evict(self):
+        while self._size > self._max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
@@ -0,0 +1,240 @@
+"""
+In-process full text search over the map and mod vault.
+"""
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from api.query_commons import fetch_data, get_page_attributes
+from faf import db
+
+TOKEN_REGEX = re.compile(r'\w+', re.UNICODE)
+
+# Matches on a prefix of a term (e.g. "sera" for "seraphim") count less than full matches
+PREFIX_MATCH_FACTOR = 0.5
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_REGEX.findall(text.lower())
+
+
+class SearchIndex(object):
+    """
+    An inverted index mapping terms to the documents containing them, ranked by a field weighted TF-IDF score.
+
+    Documents are provided by `loader`, a function that takes an optional watermark and returns rows (dicts) with:
+
+    * ``id``: the document ID, as used by the API
+    * ``watermark``: a monotonically increasing value (e.g. an auto increment ID); when called with a watermark, the
+      loader must return all rows whose watermark is greater than the given one
+    * ``group`` (optional): documents of the same group replace each other, e.g. versions of the same mod
+    * one value for each field in `field_weights`
+
+    The index is built on first use and updated incrementally by calling `refresh`, which is done automatically
+    every `refresh_interval` seconds to pick up changes made by other processes. Since documents may also be edited,
+    hidden or deleted, which the watermark doesn't tell, the whole index is rebuilt every `rebuild_interval` seconds.
+    """
+
+    def __init__(self, loader, field_weights, refresh_interval=60, rebuild_interval=3600):
+        self._loader = loader
+        self._field_weights = field_weights
+        self._refresh_interval = refresh_interval
+        self._rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._postings = {}  # term -> {doc_id: weight}
+        self._doc_terms = {}  # doc_id -> [term]
+        self._doc_groups = {}  # doc_id -> group
+        self._group_docs = {}  # group -> doc_id
+        self._vocabulary = []  # sorted list of all terms, used for prefix matches
+        self._watermark = None
+        self._last_refresh = None
+        self._last_rebuild = None
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def refresh(self):
+        """
+        Loads all documents that changed since the last refresh, or all documents if the index hasn't been built yet.
+        """
+        with self._lock:
+            rows = self._loader(self._watermark)
+            for row in rows:
+                self.update(row)
+                if self._watermark is None or row['watermark'] > self._watermark:
+                    self._watermark = row['watermark']
+            self._last_refresh = time.time()
+            if self._last_rebuild is None:
+                self._last_rebuild = self._last_refresh
+
+    def notify_update(self):
+        """
+        Picks up new documents right away (e.g. after an upload), unless the index hasn't been built yet.
+        """
+        if self._last_refresh is not None:
+            self.refresh()
+
+    def rebuild(self):
+        """
+        Discards and rebuilds the whole index.
+        """
+        with self._lock:
+            self._clear()
+            self.refresh()
+
+    def update(self, row):
+        """
+        Adds or replaces a single document.
+        """
+        doc_id = str(row['id'])
+        group = row.get('group')
+
+        with self._lock:
+            self.remove(doc_id)
+            if group is not None and group in self._group_docs:
+                self.remove(self._group_docs[group])
+
+            frequencies = {}
+            for field, weight in self._field_weights.items():
+                for term in tokenize(row.get(field)):
+                    frequencies.setdefault(term, {}).setdefault(weight, 0)
+                    frequencies[term][weight] += 1
+
+            for term, weight_counts in frequencies.items():
+                if term not in self._postings:
+                    self._postings[term] = {}
+                    insort(self._vocabulary, term)
+                self._postings[term][doc_id] = sum(weight * (1 + math.log(count))
+                                                   for weight, count in weight_counts.items())
+
+            self._doc_terms[doc_id] = list(frequencies.keys())
+            if group is not None:
+                self._doc_groups[doc_id] = group
+                self._group_docs[group] = doc_id
+
+    def remove(self, doc_id):
+        with self._lock:
+            for term in self._doc_terms.pop(doc_id, []):
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+                    del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+            group = self._doc_groups.pop(doc_id, None)
+            if group is not None and self._group_docs.get(group) == doc_id:
+                del self._group_docs[group]
+
+    def search(self, query):
+        """
+        Returns the IDs of all documents matching every term in `query`, ordered by relevance (best match first).
+        """
+        self._refresh_if_due()
+
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self._doc_terms)
+            scores = None
+            for term in terms:
+                term_scores = self._score_term(term, doc_count)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: score + term_scores[doc_id]
+                              for doc_id, score in scores.items() if doc_id in term_scores}
+                if not scores:
+                    return []
+
+        return sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+
+    def _score_term(self, term, doc_count):
+        scores = {}
+        index = bisect_left(self._vocabulary, term)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(term):
+            candidate = self._vocabulary[index]
+            postings = self._postings[candidate]
+            factor = 1 if candidate == term else PREFIX_MATCH_FACTOR
+            idf = math.log(1 + doc_count / len(postings))
+            for doc_id, weight in postings.items():
+                score = factor * weight * idf
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+            index += 1
+
+        return scores
+
+    def _refresh_if_due(self):
+        now = time.time()
+        if self._last_rebuild is not None and now - self._last_rebuild >= self._rebuild_interval:
+            self.rebuild()
+        elif self._last_refresh is None or now - self._last_refresh >= self._refresh_interval:
+            self.refresh()
+
+
+def fetch_search_results(index, query, schema, table, select_expression_dict, max_page_size, request, id_expression,
+                         where='', args=None, enricher=None):
+    """
+    Like `fetch_data`, but only returns the page of documents in `index` that match `query`. Unless a sort order is
+    requested, results are ordered by relevance. The number of matches and pages is returned in ``meta``.
+
+    :param index: the `SearchIndex` to search
+    :param query: the search query
+    :param id_expression: the SQL expression of the document ID, e.g. ``version.id``
+    :param where: additional WHERE clauses, without the WHERE
+    :param args: additional (positional) arguments for `where`
+    """
+    page, page_size = get_page_attributes(max_page_size, request)
+    sort = request.values.get('sort')
+
+    ids = index.search(query)
+    if ids and where:
+        # The index may still contain documents that no longer match `where` (e.g. mods hidden since the last rebuild),
+        # which must not count towards the pages
+        ids = filter_ids(ids, table, id_expression, where, args)
+
+    meta = {'page': {'number': page, 'size': page_size, 'total_records': len(ids),
+                     'total_pages': math.ceil(len(ids) / page_size)}}
+
+    if not sort:
+        # Paginate by relevance here; otherwise, the database sorts and paginates all matches
+        ids = ids[(page - 1) * page_size:page * page_size]
+    if not ids:
+        return {'data': [], 'meta': meta}
+
+    id_where = '{} IN ({})'.format(id_expression, ','.join(['%s'] * len(ids)))
+    if where:
+        id_where = '{} AND {}'.format(where, id_where)
+
+    result = fetch_data(schema, table, select_expression_dict, max_page_size, request, where=id_where,
+                        args=tuple(args or ()) + tuple(ids), enricher=enricher, limit=bool(sort))
+
+    if not sort:
+        ranks = {doc_id: rank for rank, doc_id in enumerate(ids)}
+        result['data'].sort(key=lambda item: ranks.get(str(item['id']), len(ranks)))
+
+    result['meta'] = meta
+    return result
+
+
+def filter_ids(ids, table, id_expression, where, args=None):
+    """
+    Returns the document IDs in `ids` whose rows match `where`, in the same order.
+    """
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute('SELECT {0} FROM {1} WHERE {2} AND {0} IN ({3})'.format(
+            id_expression, table, where, ','.join(['%s'] * len(ids))), tuple(args or ()) + tuple(ids))
+
+        matching = {str(row[0]) for row in cursor.fetchall()}
+
+    return [doc_id for doc_id in ids if doc_id in matching]
@@ -0,0 +1,160 @@
+"""
+Log of slow SQL queries, aggregated by query shape.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%(?:\(\w+\))?s')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+SORT_FIELDS = ('total_time', 'max_time', 'count')
+
+
+def normalize(sql):
+    """
+    Returns the shape of a query: the query with all literals and placeholders replaced by ``?``, lists of them
+    collapsed and whitespace normalized, so that queries differing only in their parameters have the same shape.
+    """
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryShape(object):
+    """
+    Statistics of all slow queries of one shape, along with the most recent example and its query plan.
+    """
+
+    def __init__(self, shape):
+        self.id = hashlib.sha1(shape.encode('utf-8')).hexdigest()[:16]
+        self.shape = shape
+        self.count = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.endpoints = set()
+        self.last_sql = None
+        self.last_args = None
+        self.last_row_count = None
+        self.last_seen = None
+        self.explain = None
+
+    def add(self, sql, args, endpoint, duration, row_count):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.endpoints.add(endpoint)
+        self.last_sql = sql
+        self.last_args = args
+        self.last_row_count = row_count
+        self.last_seen = time.time()
+
+    def to_dict(self):
+        return {
+            'shape': self.shape,
+            'count': self.count,
+            'total_time': self.total_time,
+            'mean_time': self.total_time / self.count,
+            'max_time': self.max_time,
+            'endpoints': sorted(endpoint or 'unknown' for endpoint in self.endpoints),
+            'last_sql': self.last_sql,
+            'last_args': repr(self.last_args),
+            'last_row_count': self.last_row_count,
+            'last_seen': self.last_seen,
+            'explain': self.explain
+        }
+
+
+class SlowQueryLog(object):
+    """
+    Logs and aggregates queries that took at least `threshold` milliseconds; nothing is recorded if `threshold` is
+    ``None``. If `explain` is set, the plan of the first slow ``SELECT`` of every shape is captured using ``EXPLAIN``.
+
+    At most `max_shapes` shapes are kept; when a new one comes in, the one with the lowest total time is dropped.
+    """
+
+    def __init__(self, threshold=None, explain=False, max_shapes=500):
+        self._threshold = threshold
+        self._explain = explain
+        self._max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._shapes = {}  # shape -> QueryShape
+
+    def configure(self, threshold=None, explain=None):
+        self._threshold = threshold
+        if explain is not None:
+            self._explain = explain
+
+    @property
+    def enabled(self):
+        return self._threshold is not None
+
+    def record(self, sql, args, endpoint, duration, row_count, cursor=None):
+        """
+        Records a query if it was slow.
+
+        :param sql: the query, with placeholders
+        :param args: the query's arguments
+        :param endpoint: the Flask endpoint that ran the query
+        :param duration: how long the query took, in milliseconds
+        :param row_count: the number of rows it returned
+        :param cursor: a cursor to run ``EXPLAIN`` with; it must not have unread results
+        """
+        if self._threshold is None or duration < self._threshold:
+            return
+
+        logger.warning('Slow query (%.1f ms, %s rows) in %s: %s; args: %r', duration, row_count, endpoint, sql, args)
+
+        shape = normalize(sql)
+        with self._lock:
+            query_shape = self._shapes.get(shape)
+            if query_shape is None:
+                if len(self._shapes) >= self._max_shapes:
+                    del self._shapes[min(self._shapes.values(), key=lambda item: item.total_time).shape]
+                query_shape = self._shapes[shape] = QueryShape(shape)
+            query_shape.add(sql, args, endpoint, duration, row_count)
+
+            needs_explain = (self._explain and cursor is not None and query_shape.explain is None
+                             and sql.lstrip().upper().startswith('SELECT'))
+            if needs_explain:
+                # Placeholder, so that concurrent requests don't explain the same shape again
+                query_shape.explain = []
+
+        if needs_explain:
+            query_shape.explain = self._run_explain(cursor, sql, args)
+
+    def top(self, limit=20, sort='total_time'):
+        """
+        Returns the `limit` shapes with the highest `sort` (one of `SORT_FIELDS`), as dicts.
+        """
+        with self._lock:
+            shapes = sorted(self._shapes.values(), key=lambda item: getattr(item, sort), reverse=True)[:limit]
+            return [dict(query_shape.to_dict(), id=query_shape.id) for query_shape in shapes]
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+
+    @staticmethod
+    def _run_explain(cursor, sql, args):
+        try:
+            cursor.execute('EXPLAIN ' + sql, args)
+            columns = [column[0] for column in cursor.description]
+            return [row if isinstance(row, dict) else dict(zip(columns, row)) for row in cursor.fetchall()]
+        except pymysql.MySQLError as e:
+            logger.warning('Could not explain slow query: %s', e)
+            return [{'error': str(e)}]
+
+
+slow_query_log = SlowQueryLog()
@@ -28,6 +28,35 @@ CONTENT_URL = 'http://content.faforever.com'
 
 STATSD_SERVER = os.getenv('STATSD_SERVER', None)
 
+# Queries of fetch_data taking at least this many milliseconds are logged and listed at /admin/slow_queries. If
+# SLOW_QUERY_EXPLAIN is set, the plan of every new query shape is captured using EXPLAIN.
+SLOW_QUERY_THRESHOLD = int(os.getenv('SLOW_QUERY_THRESHOLD', 0)) or None
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false') == 'true'
+
+# Fraction of requests whose stacks are sampled every PROFILER_INTERVAL seconds, see /admin/profile. 0 disables it.
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+PROFILER_INTERVAL = 0.005
+
+# Bearer token that scrapers of the Prometheus metrics at /metrics have to send (`bearer_token` in Prometheus' scrape
+# config). /metrics is disabled if it isn't set.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', None)
+# Metrics are kept per process. When running several processes (e.g. Passenger workers), set this to a directory
+# shared by all of them, so that /metrics aggregates all processes instead of showing only the one that handles the
+# scrape. Empty the directory when restarting the application.
+PROMETHEUS_MULTIPROCESS_DIR = os.getenv('PROMETHEUS_MULTIPROCESS_DIR', None)
+
+# Memory limit and default timeout (in seconds) of the response cache of public GET endpoints. Expired responses are
+# served for another RESPONSE_CACHE_STALE_TIMEOUT seconds while they're being recomputed.
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_TIMEOUT = 3600
+RESPONSE_CACHE_STALE_TIMEOUT = 300
+# Each process has its own response cache. Purges (e.g. after uploads or deployments) are shared through the database
+# and reach the other processes within this many seconds.
+RESPONSE_CACHE_SYNC_INTERVAL = 5
+
+# If set, leaderboard pages are served from snapshots that are rebuilt every this many seconds
+LEADERBOARD_SNAPSHOT_INTERVAL = int(os.getenv('LEADERBOARD_SNAPSHOT_INTERVAL', 0)) or None
+
 GITHUB_USER = os.getenv("GITHUB_USER", 'some-user')
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", 'some-token')
 GITHUB_SECRET = os.getenv("GITHUB_SECRET", '')
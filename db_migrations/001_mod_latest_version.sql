@@ -0,0 +1,11 @@
+-- Newest version of each mod, so that listing mods doesn't need to group the whole mod_version table on every request.
+-- The API updates it when a mod version is uploaded.
+CREATE TABLE IF NOT EXISTS mod_latest_version (
+  mod_id  INT UNSIGNED      NOT NULL,
+  version SMALLINT UNSIGNED NOT NULL,
+  PRIMARY KEY (mod_id)
+);
+
+INSERT INTO mod_latest_version (mod_id, version)
+  SELECT * FROM (SELECT mod_id, MAX(version) AS latest FROM mod_version GROUP BY mod_id) AS newest
+ON DUPLICATE KEY UPDATE version = GREATEST(mod_latest_version.version, newest.latest);
@@ -0,0 +1,41 @@
+-- Unlock stats of each achievement, so that listing achievements doesn't need to aggregate the whole
+-- player_achievements table on every request. The API updates them when achievements are unlocked.
+-- timed_count is the number of unlocks whose duration is known, i.e. of players whose login still exists, and the
+-- average duration is sum_time / timed_count.
+CREATE TABLE IF NOT EXISTS achievement_unlock_stats (
+  achievement_id VARCHAR(36)  NOT NULL,
+  count          INT UNSIGNED NOT NULL,
+  timed_count    INT UNSIGNED NOT NULL,
+  sum_time       BIGINT       NOT NULL,
+  min_time       INT,
+  max_time       INT,
+  PRIMARY KEY (achievement_id)
+);
+
+-- Single row (id = 1) holding the number of players that have at least one player achievement
+CREATE TABLE IF NOT EXISTS achievers_count (
+  id    TINYINT UNSIGNED NOT NULL,
+  count INT UNSIGNED     NOT NULL,
+  PRIMARY KEY (id)
+);
+
+INSERT INTO achievement_unlock_stats (achievement_id, count, timed_count, sum_time, min_time, max_time)
+  SELECT achievement_id, count(*), count(unlock_time), COALESCE(SUM(unlock_time), 0), MIN(unlock_time), MAX(unlock_time)
+  FROM (SELECT
+          pa.achievement_id,
+          TIMESTAMPDIFF(SECOND, GREATEST(ach.create_time, login.create_time), pa.update_time) AS unlock_time
+        FROM player_achievements pa
+          JOIN achievement_definitions ach ON ach.id = pa.achievement_id
+          LEFT JOIN login ON login.id = pa.player_id
+        WHERE pa.state = 'UNLOCKED') AS unlocks
+  GROUP BY achievement_id
+ON DUPLICATE KEY UPDATE
+  count       = VALUES(count),
+  timed_count = VALUES(timed_count),
+  sum_time    = VALUES(sum_time),
+  min_time    = VALUES(min_time),
+  max_time    = VALUES(max_time);
+
+INSERT INTO achievers_count (id, count)
+  SELECT 1, count(*) FROM login WHERE id IN (SELECT player_id FROM player_achievements)
+ON DUPLICATE KEY UPDATE count = VALUES(count);
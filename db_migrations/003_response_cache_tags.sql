@@ -0,0 +1,7 @@
+-- Number of times each tag of the API's response cache has been purged, so that the API's processes can tell which
+-- tags other processes purged
+CREATE TABLE IF NOT EXISTS response_cache_tags (
+  tag     VARCHAR(64)  NOT NULL,
+  version INT UNSIGNED NOT NULL,
+  PRIMARY KEY (tag)
+);
@@ -0,0 +1,4 @@
+-- Indexes for the delta syncs of player achievements and events, which filter by player and update time (see
+-- `filter[updated_since]`)
+CREATE INDEX player_achievements_player_update_time ON player_achievements (player_id, update_time);
+CREATE INDEX player_events_player_update_time ON player_events (player_id, update_time);
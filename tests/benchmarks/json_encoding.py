@@ -0,0 +1,106 @@
+"""
+Compares `api.json_encoding` to the pretty-printed encoding of `flask.jsonify`, which is its default, on payloads shaped
+like a full leaderboard page and a full map page.
+
+Usage::
+
+    python -m tests.benchmarks.json_encoding [--repeat N] [--url URL ...]
+
+With ``--url``, the responses of a running API are benchmarked instead, e.g.
+``--url http://localhost:8080/leaderboards/global?page[size]=5000``.
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import requests
+
+from api import json_encoding
+
+
+def leaderboard_payload(size=5000):
+    return {'data': [{
+        'id': str(player_id),
+        'type': 'ranked1v1',
+        'attributes': {
+            'id': str(player_id),
+            'login': 'player{}'.format(player_id),
+            'mean': 2000 - player_id * 0.3123456789,
+            'deviation': 50 + (player_id % 100) * 0.51234,
+            'num_games': 100 + player_id % 1000,
+            'is_active': True,
+            'rating': Decimal(1850 - player_id // 3),
+            'ranking': player_id,
+            'won_games': 50 + player_id % 500,
+            'lost_games': 50 + player_id % 500,
+            'winning_percentage': Decimal(50)
+        }
+    } for player_id in range(1, size + 1)]}
+
+
+def map_payload(size=1000):
+    create_time = datetime(2016, 1, 1)
+    return {'data': [{
+        'id': str(map_id),
+        'type': 'map',
+        'attributes': {
+            'id': map_id,
+            'display_name': 'SCMP_{:03d}'.format(map_id),
+            'description': '<LOC SCMP_{0:03d}_Description>Map number {0} with a longer description'.format(map_id),
+            'max_players': 2 + map_id % 7,
+            'map_type': 'skirmish',
+            'battle_type': 'FFA',
+            'width': 512,
+            'height': 512,
+            'author': 'author{}'.format(map_id % 50),
+            'version': 1 + map_id % 5,
+            'ranked': map_id % 2 == 0,
+            'download_url': 'http://content.faforever.com/faf/vault/maps/scmp_{:03d}.v0001.zip'.format(map_id),
+            'thumbnail_url_small': 'http://content.faforever.com/faf/vault/map_previews/small/scmp_{:03d}.png'
+                .format(map_id),
+            'thumbnail_url_large': 'http://content.faforever.com/faf/vault/map_previews/large/scmp_{:03d}.png'
+                .format(map_id),
+            'folder_name': 'scmp_{:03d}.v0001'.format(map_id),
+            'downloads': map_id * 17,
+            'num_draws': map_id % 3,
+            'rating': Decimal('4.2'),
+            'times_played': map_id * 5,
+            'create_time': create_time + timedelta(hours=map_id)
+        }
+    } for map_id in range(1, size + 1)]}
+
+
+def pretty_dumps(obj):
+    """
+    Encodes `obj` like `flask.jsonify` does with ``JSONIFY_PRETTYPRINT_REGULAR`` enabled.
+    """
+    return (json.dumps(obj, indent=2, separators=(', ', ': '), sort_keys=True, default=json_encoding.default) +
+            '\n').encode('utf-8')
+
+
+def benchmark(name, payload, repeat):
+    print(name)
+    for encoder_name, dumps in (('pretty', pretty_dumps), ('compact', json_encoding.dumps)):
+        best = min(timeit.repeat(lambda: dumps(payload), number=1, repeat=repeat))
+        print('  {:<8} {:8.2f} ms {:>9} bytes'.format(encoder_name, best * 1000, len(dumps(payload))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='runs per encoder, the best one is reported')
+    parser.add_argument('--url', action='append', default=[], help='benchmark the response of this URL instead')
+    args = parser.parse_args()
+
+    if args.url:
+        for url in args.url:
+            benchmark(url, json.loads(requests.get(url).text), args.repeat)
+        return
+
+    benchmark('leaderboard page (5000 entries)', leaderboard_payload(), args.repeat)
+    benchmark('map page (1000 entries)', map_payload(), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
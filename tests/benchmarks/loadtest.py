@@ -0,0 +1,291 @@
+"""
+Replays the requests of an access log against the API at a given concurrency and arrival rate, and reports the
+throughput, latency percentiles and error rate per endpoint.
+
+Usage::
+
+    python -m tests.benchmarks.loadtest ACCESS_LOG [--concurrency 8] [--rate 50] [--requests 10000] [--url URL]
+    python -m tests.benchmarks.loadtest --serve 8080
+
+Each line of the access log is ``METHOD PATH QUERY AUTH [BODY]``, separated by whitespace. QUERY is ``-`` if there
+is none, AUTH is ``none``, ``oauth:<player ID>`` or ``jwt:<player ID>``, and BODY is the rest of the line, which is sent
+as JSON. Blank lines and lines starting with ``#`` are ignored, e.g.::
+
+    GET /maps page[size]=100 none
+    GET /players/1/achievements - oauth:1
+    POST /jwt/achievements/updateMultiple - jwt:1 {"updates": [{"achievement_id": "...", "update_type": "UNLOCK"}]}
+
+The log is replayed in order, starting over until ``--requests`` requests have been sent. OAuth and JWT tokens are not
+verified: the token is the ID of the player and grants all scopes, so no authorization server or service account is
+needed. Requests are sent in-process through Flask's test client or, with ``--url``, over HTTP to an API started with
+``--serve``, which is like ``run.py`` but with the same stubbed authentication.
+
+With ``--rate``, requests arrive at that many per second regardless of how fast they are handled, and latencies
+include the time a request waited for a free client; without it, every client sends its next request as soon as the
+previous one completed. In-process, the app handles one request at a time as it shares one database connection between
+all requests, like ``run.py`` with its single worker.
+"""
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, namedtuple
+from queue import Queue
+from unittest.mock import Mock
+from urllib.parse import urlsplit
+
+from werkzeug.exceptions import HTTPException
+
+import api
+from api import User
+from tests.benchmarks.run import percentile
+
+AUTH_TYPES = ('none', 'oauth', 'jwt')
+DEFAULT_PLAYER_ID = 1
+SCOPES = ['public_profile', 'read_achievements', 'write_achievements', 'read_events', 'write_events', 'upload_map',
+          'upload_mod', 'write_account_data']
+
+Entry = namedtuple('Entry', ['method', 'path', 'query', 'auth', 'player_id', 'body'])
+
+
+def parse_entry(line):
+    """
+    Parses a line of an access log, see the module documentation. Returns ``None`` for blank lines and comments.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    parts = line.split(None, 4)
+    if len(parts) < 4:
+        raise ValueError('Invalid access log line: {}'.format(line))
+
+    method, path, query, auth = parts[:4]
+    auth_type, _, player_id = auth.partition(':')
+    if auth_type not in AUTH_TYPES:
+        raise ValueError('Invalid auth type: {}'.format(auth))
+
+    return Entry(method.upper(), path, '' if query == '-' else query.lstrip('?'), auth_type,
+                 int(player_id) if player_id else DEFAULT_PLAYER_ID, parts[4] if len(parts) > 4 else None)
+
+
+def read_log(path):
+    with open(path) as file:
+        entries = [entry for entry in map(parse_entry, file) if entry is not None]
+    if not entries:
+        raise ValueError('{} contains no requests'.format(path))
+    return entries
+
+
+def get_token(access_token=None, refresh_token=None):
+    try:
+        player_id = int(access_token)
+    except (TypeError, ValueError):
+        return None
+    return Mock(user=User(id=player_id), expires=datetime.datetime.now() + datetime.timedelta(hours=1), scopes=SCOPES)
+
+
+def install_stubs():
+    """
+    Replaces the verification of OAuth and JWT tokens: the token is the ID of the player.
+    """
+    api.oauth.tokengetter(get_token)
+    api.flask_jwt.jwt_decode_handler(lambda token: {'identity': int(token)})
+    api.flask_jwt.identity_handler(lambda payload: User(id=payload['identity']))
+
+
+def request_headers(entry):
+    headers = []
+    if entry.auth == 'oauth':
+        headers.append(('Authorization', 'Bearer {}'.format(entry.player_id)))
+    elif entry.auth == 'jwt':
+        prefix = api.app.config.get('JWT_AUTH_HEADER_PREFIX', 'JWT')
+        headers.append(('Authorization', '{} {}'.format(prefix, entry.player_id)))
+    if entry.body is not None:
+        headers.append(('Content-Type', 'application/json'))
+    return headers
+
+
+class WsgiSender(object):
+    """
+    Sends requests to the app through Flask's test client, one at a time.
+    """
+
+    def __init__(self, app):
+        self._client = app.test_client()
+        self._lock = threading.Lock()
+
+    def send(self, entry):
+        with self._lock:
+            response = self._client.open(entry.path, method=entry.method, query_string=entry.query,
+                                         headers=request_headers(entry), data=entry.body)
+            response.get_data()
+            return response.status_code
+
+
+class HttpSender(object):
+    """
+    Sends requests over HTTP to `url`, using one persistent connection per thread. Returns ``None`` as status if the
+    request failed.
+    """
+
+    def __init__(self, url, timeout=60):
+        url = urlsplit(url)
+        self._connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self._netloc = url.netloc
+        self._prefix = url.path.rstrip('/')
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def send(self, entry):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connection_class(self._netloc, timeout=self._timeout)
+
+        path = self._prefix + entry.path + ('?' + entry.query if entry.query else '')
+        body = entry.body.encode('utf-8') if entry.body is not None else None
+        try:
+            connection.request(entry.method, path, body=body, headers=dict(request_headers(entry)))
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            return None
+
+
+def endpoint_name(url_adapter, entry):
+    try:
+        return url_adapter.match(entry.path, entry.method)[0]
+    except HTTPException:
+        return 'unmatched'
+
+
+def replay(entries, sender, concurrency=1, rate=None, requests=None):
+    """
+    Sends `requests` requests of `entries`, in order and starting over when all have been sent, using `concurrency`
+    threads. Returns the elapsed time and a dict of endpoints to lists of (latency, status) tuples.
+    """
+    url_adapter = api.app.url_map.bind('localhost')
+    queue = Queue(maxsize=concurrency * 2 if rate is None else 0)
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            entry, scheduled = item
+            start = time.perf_counter()
+            status = sender.send(entry)
+            latency = time.perf_counter() - (scheduled if scheduled is not None else start)
+            with lock:
+                results[endpoint_name(url_adapter, entry)].append((latency, status))
+
+    workers = [threading.Thread(target=work, name='loadtest_worker', daemon=True) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    start = time.perf_counter()
+    for i, entry in enumerate(itertools.islice(itertools.cycle(entries), requests or len(entries))):
+        scheduled = None
+        if rate:
+            scheduled = start + i / rate
+            time.sleep(max(scheduled - time.perf_counter(), 0))
+        queue.put((entry, scheduled))
+
+    for _ in workers:
+        queue.put(None)
+    for worker in workers:
+        worker.join()
+
+    return time.perf_counter() - start, results
+
+
+def summarize(elapsed, results):
+    """
+    Returns the throughput (requests per second), latency percentiles (in milliseconds) and error rate of each
+    endpoint and, as ``total``, of all of them. Failed requests and responses with status 400 or above are errors.
+    """
+    results = dict(results)
+    results['total'] = [result for endpoint_results in results.values() for result in endpoint_results]
+
+    summary = {}
+    for endpoint, endpoint_results in results.items():
+        latencies = sorted(latency * 1000 for latency, _ in endpoint_results)
+        errors = sum(1 for _, status in endpoint_results if status is None or status >= 400)
+        summary[endpoint] = {
+            'requests': len(endpoint_results),
+            'throughput': len(endpoint_results) / elapsed,
+            'p50_ms': percentile(latencies, 0.5),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'error_rate': errors / len(endpoint_results)
+        }
+    return summary
+
+
+def serve(port):
+    """
+    Runs the API like ``run.py`` does, but with stubbed authentication.
+    """
+    from aiohttp_wsgi import serve as serve_wsgi
+    from concurrent.futures import ThreadPoolExecutor
+
+    api.app.config.from_object('config')
+    api.api_init()
+    install_stubs()
+    print('listen on port {0} with stubbed authentication'.format(port))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        serve_wsgi(api.app, executor=executor, port=port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', nargs='?', help='access log to replay')
+    parser.add_argument('--concurrency', type=int, default=1, help='number of concurrent clients')
+    parser.add_argument('--rate', type=float, help='requests per second, as fast as possible by default')
+    parser.add_argument('--requests', type=int, help='number of requests, one per log line by default')
+    parser.add_argument('--url', help='URL of an API started with --serve, in-process by default')
+    parser.add_argument('--json', help='file to write the results to')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='run the API with stubbed authentication')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+    if not args.log:
+        parser.error('the access log is required')
+
+    entries = read_log(args.log)
+    if args.url:
+        sender = HttpSender(args.url)
+    else:
+        api.app.config.from_object('config')
+        api.api_init()
+        install_stubs()
+        sender = WsgiSender(api.app)
+
+    elapsed, results = replay(entries, sender, args.concurrency, args.rate, args.requests)
+    summary = summarize(elapsed, results)
+
+    print('{:<40} {:>8} {:>9} {:>9} {:>9} {:>9} {:>7}'.format(
+        'endpoint', 'requests', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+    for endpoint in sorted(summary, key=lambda endpoint: (endpoint == 'total', endpoint)):
+        result = summary[endpoint]
+        print('{:<40} {:>8} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>7.1%}'.format(
+            endpoint, result['requests'], result['throughput'], result['p50_ms'], result['p95_ms'], result['p99_ms'],
+            result['error_rate']))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(summary, file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Measures latency and throughput of the hot API paths against a database seeded by `tests.benchmarks.seed`, and
+compares them to a stored baseline.
+
+Usage::
+
+    python -m tests.benchmarks.run [--iterations 50] [--scenario maps ...] [--save-baseline]
+
+Requests are made in-process through Flask's test client, one at a time, so throughput is that of a single worker.
+Write requests are authorized with a stubbed OAuth token of a random seeded player, like in the unit tests. The
+response cache is disabled unless ``--response-cache`` is given, so that the database paths are measured.
+
+Results are compared to ``tests/benchmarks/baseline.json`` if it exists; the exit code is 1 if the median or 95th
+percentile latency of any scenario regressed by more than ``--tolerance``, or if any request failed, since the
+timings of error responses are meaningless. ``--save-baseline`` replaces the baseline with the current results; only
+do so on the reference machine and database.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import namedtuple
+from unittest.mock import Mock
+
+from faf import db
+
+import api
+from api import User
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+Scenario = namedtuple('Scenario', ['name', 'method', 'request'])
+
+
+class Fixture(object):
+    """
+    The seeded data requests are made for, and the player the stubbed OAuth token belongs to.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        with db.connection:
+            cursor = db.connection.cursor()
+            cursor.execute("SELECT MIN(id), MAX(id) FROM login WHERE login LIKE 'bench\\_%%'")
+            self.first_player, self.last_player = cursor.fetchone()
+            cursor.execute('SELECT id, type FROM achievement_definitions')
+            self.achievements = cursor.fetchall()
+            cursor.execute('SELECT id FROM event_definitions')
+            self.events = [row[0] for row in cursor.fetchall()]
+
+        if self.first_player is None:
+            raise RuntimeError('The database has not been seeded, run tests.benchmarks.seed first')
+        self.player_id = self.first_player
+
+    def random_player(self):
+        self.player_id = self.rng.randint(self.first_player, self.last_player)
+        return self.player_id
+
+    def get_token(self, access_token=None, refresh_token=None):
+        return Mock(
+            user=User(id=self.player_id),
+            expires=datetime.datetime.now() + datetime.timedelta(hours=1),
+            scopes=['write_achievements', 'write_events']
+        )
+
+
+def update_achievements(fixture):
+    # Updates are made for the owner of the stubbed token, see Fixture.get_token
+    fixture.random_player()
+    updates = []
+    for achievement_id, type_ in fixture.rng.sample(fixture.achievements, min(5, len(fixture.achievements))):
+        if type_ == 'INCREMENTAL':
+            updates.append(dict(achievement_id=achievement_id, update_type='INCREMENT', steps=1))
+        else:
+            updates.append(dict(achievement_id=achievement_id, update_type='UNLOCK'))
+    return dict(path='/achievements/updateMultiple', headers=[('Content-Type', 'application/json')],
+                data=json.dumps(dict(updates=updates)))
+
+
+def record_events(fixture):
+    fixture.random_player()
+    updates = [dict(event_id=event_id, count=1)
+               for event_id in fixture.rng.sample(fixture.events, min(3, len(fixture.events)))]
+    return dict(path='/events/recordMultiple', headers=[('Content-Type', 'application/json')],
+                data=json.dumps(dict(updates=updates)))
+
+
+SCENARIOS = [
+    Scenario('leaderboards_1v1', 'GET', lambda fixture: dict(
+        path='/leaderboards/1v1?page[size]=5000&page[number]={}'.format(fixture.rng.randint(1, 10)))),
+    Scenario('leaderboards_global', 'GET', lambda fixture: dict(
+        path='/leaderboards/global?page[size]=5000&page[number]={}'.format(fixture.rng.randint(1, 10)))),
+    Scenario('maps', 'GET', lambda fixture: dict(
+        path='/maps?page[size]=1000&page[number]={}'.format(fixture.rng.randint(1, 20)))),
+    Scenario('mods', 'GET', lambda fixture: dict(
+        path='/mods?page[size]=1000&page[number]={}'.format(fixture.rng.randint(1, 10)))),
+    Scenario('rating_history', 'GET', lambda fixture: dict(
+        path='/players/{}/ratings/global/history'.format(fixture.random_player()))),
+    Scenario('achievements_update_multiple', 'POST', update_achievements),
+    Scenario('events_record_multiple', 'POST', record_events),
+]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def measure(client, scenario, fixture, iterations, warmup):
+    """
+    Runs a scenario and returns its latency percentiles (in milliseconds), throughput (requests per second) and the
+    number of failed requests.
+    """
+    durations = []
+    errors = 0
+    for iteration in range(warmup + iterations):
+        kwargs = scenario.request(fixture)
+        start = time.perf_counter()
+        response = client.open(method=scenario.method, **kwargs)
+        response.get_data()
+        duration = time.perf_counter() - start
+
+        if iteration < warmup:
+            continue
+        durations.append(duration * 1000)
+        if response.status_code >= 400:
+            errors += 1
+
+    durations.sort()
+    return {
+        'p50_ms': percentile(durations, 0.5),
+        'p95_ms': percentile(durations, 0.95),
+        'p99_ms': percentile(durations, 0.99),
+        'throughput': len(durations) / (sum(durations) / 1000),
+        'errors': errors
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a description of every regression of the median or 95th percentile latency beyond `tolerance`.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if result[key] > reference[key] * (1 + tolerance):
+                regressions.append('{} {}: {:.1f} ms, baseline {:.1f} ms (+{:.0%})'.format(
+                    name, key, result[key], reference[key], result[key] / reference[key] - 1))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per scenario')
+    parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                        help='scenarios to run, all by default')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random requests')
+    parser.add_argument('--response-cache', action='store_true', help="don't disable the response cache")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='replace the baseline with the results')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed latency increase, 0.2 being 20%%')
+    args = parser.parse_args()
+
+    api.app.config.from_object('config')
+    api.api_init()
+    if not args.response_cache:
+        api.response_cache.configure(max_bytes=0)
+
+    fixture = Fixture(random.Random(args.seed))
+    api.oauth.tokengetter(fixture.get_token)
+    client = api.app.test_client()
+
+    results = {}
+    for scenario in SCENARIOS:
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        results[scenario.name] = result = measure(client, scenario, fixture, args.iterations, args.warmup)
+        print('{:<30} p50 {:8.1f} ms  p95 {:8.1f} ms  p99 {:8.1f} ms  {:7.1f} req/s  {} errors'.format(
+            scenario.name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['throughput'],
+            result['errors']))
+
+    failed = sorted(name for name, result in results.items() if result['errors'])
+    if failed:
+        print('Requests failed in {}; not saving or comparing the results'.format(', '.join(failed)))
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'python': platform.python_version(), 'scenarios': results}, file, indent=2, sort_keys=True)
+        print('Baseline saved to {}'.format(args.baseline))
+        return
+
+    if not os.path.exists(args.baseline):
+        print('No baseline at {}, nothing to compare'.format(args.baseline))
+        return
+
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file)['scenarios'], args.tolerance)
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
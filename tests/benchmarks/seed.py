@@ -0,0 +1,196 @@
+"""
+Seeds a database with production-like volumes for the benchmarks in `tests.benchmarks.run`.
+
+At scale 1, this creates 1M players with ratings, 2.5M games with 10M player stats, 20k maps with 100k versions, 10k
+mods with 50k versions, about 3M player achievements and 2M player events. Rows are added to the existing data (e.g.
+the test data), with IDs above the existing ones, and are deterministic for a given scale and seed.
+
+Usage::
+
+    python -m tests.benchmarks.seed [--scale 0.01] [--database faf_benchmark]
+
+Use a dedicated database; seeding takes hours at scale 1.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import pymysql
+
+from tests.migrations import apply_migrations
+
+PLAYERS = 1000000
+GAMES = 2500000
+PLAYERS_PER_GAME = 4
+MAPS = 20000
+VERSIONS_PER_MAP = 5
+MODS = 10000
+VERSIONS_PER_MOD = 5
+MAX_ACHIEVEMENTS_PER_PLAYER = 6
+MAX_EVENTS_PER_PLAYER = 4
+
+START_TIME = datetime(2014, 1, 1)
+
+
+def insert(cursor, table, columns, rows, batch_size):
+    """
+    Inserts rows in batches, using one multi-row INSERT per batch.
+    """
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(table, ', '.join(columns), ', '.join(['%s'] * len(columns)))
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def next_id(cursor, table, column='id'):
+    cursor.execute('SELECT COALESCE(MAX({}), 0) + 1 FROM {}'.format(column, table))
+    return cursor.fetchone()[0]
+
+
+def seed(connection, scale=1.0, seed_value=0, batch_size=5000, log=print):
+    rng = random.Random(seed_value)
+    cursor = connection.cursor()
+    cursor.execute('SET unique_checks = 0, foreign_key_checks = 0')
+
+    def step(name, table, columns, rows):
+        start = time.time()
+        count = insert(cursor, table, columns, rows, batch_size)
+        connection.commit()
+        log('{:<20} {:>10} rows in {:.0f} s'.format(name, count, time.time() - start))
+
+    players = max(int(PLAYERS * scale), PLAYERS_PER_GAME)
+    first_player = next_id(cursor, 'login')
+    player_ids = range(first_player, first_player + players)
+
+    step('login', 'login', ('id', 'login', 'password', 'email'),
+         ((player_id, 'bench_{}'.format(player_id), '', 'bench_{}@example.com'.format(player_id))
+          for player_id in player_ids))
+    step('global_rating', 'global_rating', ('id', 'mean', 'deviation', 'numGames', 'is_active'),
+         ((player_id, rng.gauss(1200, 300), rng.uniform(50, 500), rng.randint(0, 2000), int(rng.random() < 0.6))
+          for player_id in player_ids))
+    step('ladder1v1_rating', 'ladder1v1_rating', ('id', 'mean', 'deviation', 'numGames', 'winGames', 'is_active'),
+         ((player_id, rng.gauss(1200, 300), rng.uniform(50, 500), games, games // 2, int(rng.random() < 0.4))
+          for player_id, games in ((player_id, rng.randint(0, 1000)) for player_id in player_ids)))
+
+    maps = max(int(MAPS * scale), 1)
+    first_map = next_id(cursor, 'map')
+    step('map', 'map', ('id', 'display_name', 'map_type', 'battle_type', 'author'),
+         ((map_id, 'Benchmark map {}'.format(map_id), 'skirmish', 'FFA', rng.choice(player_ids))
+          for map_id in range(first_map, first_map + maps)))
+    step('map_version', 'map_version',
+         ('description', 'max_players', 'width', 'height', 'version', 'filename', 'hidden', 'map_id'),
+         (('Benchmark map {} version {}'.format(map_id, version), rng.choice((2, 4, 6, 8)), 512, 512, version,
+           'maps/bench_{}.v{:04d}.zip'.format(map_id, version), 0, map_id)
+          for map_id in range(first_map, first_map + maps) for version in range(1, VERSIONS_PER_MAP + 1)))
+    step('table_map_features', 'table_map_features', ('map_id', 'times_played', 'downloads', 'num_draws', 'rating'),
+         ((map_id, rng.randint(0, 100000), rng.randint(0, 100000), rng.randint(0, 100), rng.uniform(1, 5))
+          for map_id in range(first_map, first_map + maps)))
+
+    mods = max(int(MODS * scale), 1)
+    first_mod = next_id(cursor, '`mod`')
+    step('mod', '`mod`', ('id', 'display_name', 'author'),
+         ((mod_id, 'Benchmark mod {}'.format(mod_id), 'bench_{}'.format(rng.choice(player_ids)))
+          for mod_id in range(first_mod, first_mod + mods)))
+    step('mod_version', 'mod_version', ('mod_id', 'uid', 'version', 'description', 'type', 'filename', 'icon'),
+         ((mod_id, 'bench-{}-{}'.format(mod_id, version), version, 'Benchmark mod', rng.choice(('UI', 'SIM')),
+           'bench_{}.v{:04d}.zip'.format(mod_id, version), None)
+          for mod_id in range(first_mod, first_mod + mods) for version in range(1, VERSIONS_PER_MOD + 1)))
+    step('mod_latest_version', 'mod_latest_version', ('mod_id', 'version'),
+         ((mod_id, VERSIONS_PER_MOD) for mod_id in range(first_mod, first_mod + mods)))
+    step('mod_stats', 'mod_stats', ('mod_id', 'times_played', 'likes', 'likers'),
+         ((mod_id, rng.randint(0, 10000), rng.randint(0, 1000), '') for mod_id in range(first_mod, first_mod + mods)))
+
+    cursor.execute("SELECT id FROM game_featuredMods WHERE gamemod IN ('faf', 'ladder1v1') ORDER BY id")
+    game_mods = [row[0] for row in cursor.fetchall()]
+    games = max(int(GAMES * scale), 1)
+    first_game = next_id(cursor, 'game_stats')
+
+    def start_time(game_id):
+        return START_TIME + timedelta(seconds=(game_id - first_game) * 30)
+
+    def game_rows():
+        for game_id in range(first_game, first_game + games):
+            yield (game_id, start_time(game_id), 1, rng.choice(game_mods), rng.choice(player_ids),
+                   first_map + rng.randrange(maps), 'Benchmark game {}'.format(game_id), 0)
+
+    def game_player_rows():
+        for game_id in range(first_game, first_game + games):
+            score_time = start_time(game_id) + timedelta(minutes=25)
+            for place, player_id in enumerate(rng.sample(player_ids, PLAYERS_PER_GAME), start=1):
+                mean, deviation = rng.gauss(1200, 300), rng.uniform(50, 500)
+                yield (game_id, player_id, 0, rng.randint(1, 4), place, 1 + (place - 1) % 2, place, mean, deviation,
+                       mean + rng.uniform(-30, 30), deviation * 0.98, rng.randint(-10, 10), score_time)
+
+    step('game_stats', 'game_stats',
+         ('id', 'startTime', 'gameType', 'gameMod', 'host', 'mapId', 'gameName', 'validity'), game_rows())
+    step('game_player_stats', 'game_player_stats',
+         ('gameId', 'playerId', 'AI', 'faction', 'color', 'team', 'place', 'mean', 'deviation', 'after_mean',
+          'after_deviation', 'score', 'scoreTime'), game_player_rows())
+
+    cursor.execute('SELECT id, type, total_steps FROM achievement_definitions')
+    achievements = cursor.fetchall()
+
+    def player_achievement_rows():
+        for player_id in player_ids:
+            count = rng.randint(0, min(MAX_ACHIEVEMENTS_PER_PLAYER, len(achievements)))
+            for achievement_id, type_, total_steps in rng.sample(achievements, count):
+                current_steps = rng.randint(1, total_steps) if type_ == 'INCREMENTAL' else None
+                yield player_id, achievement_id, current_steps, rng.choice(('REVEALED', 'UNLOCKED'))
+
+    step('player_achievements', 'player_achievements', ('player_id', 'achievement_id', 'current_steps', 'state'),
+         player_achievement_rows())
+
+    cursor.execute('SELECT id FROM event_definitions')
+    events = [row[0] for row in cursor.fetchall()]
+
+    def player_event_rows():
+        for player_id in player_ids:
+            for event_id in rng.sample(events, rng.randint(0, min(MAX_EVENTS_PER_PLAYER, len(events)))):
+                yield player_id, event_id, rng.randint(1, 1000)
+
+    step('player_events', 'player_events', ('player_id', 'event_id', 'count'), player_event_rows())
+
+    cursor.execute('SET unique_checks = 1, foreign_key_checks = 1')
+    return first_player, players
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='fraction of the production-like volumes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random data')
+    parser.add_argument('--database', help='database to seed instead of the one in config.DATABASE')
+    args = parser.parse_args()
+
+    database = dict(config.DATABASE)
+    if args.database:
+        database['db'] = args.database
+
+    apply_migrations(database)
+    connection = pymysql.connect(**database)
+    try:
+        seed(connection, args.scale, args.seed)
+    finally:
+        connection.close()
+
+    # The achievement statistics are kept in summary tables, which don't know about the inserted rows yet
+    import api
+    api.app.config.from_object('config')
+    api.app.config['DATABASE'] = database
+    api.api_init()
+    api.achievements.reconcile_achievement_stats()
+
+
+if __name__ == '__main__':
+    main()
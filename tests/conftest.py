@@ -3,6 +3,13 @@ import importlib
 import pytest
 
 import api
+from tests.migrations import apply_migrations
+
+
+@pytest.fixture(scope='session', autouse=True)
+def migrations():
+    import config
+    apply_migrations(config.DATABASE)
 
 
 @pytest.fixture
@@ -21,6 +28,7 @@ def app():
     importlib.reload(api.featured_mods)
     importlib.reload(api.helpers)
     importlib.reload(api.deployment.routes)
+    importlib.reload(api.admin)
 
     api.app.config.from_object('config')
     api.app.debug = True
@@ -0,0 +1,43 @@
+"""
+Applies the schema changes in `db_migrations` to a database created from a faf-db release that doesn't contain them
+yet, see `db_migrations/README.md`.
+"""
+import os
+
+import pymysql
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db_migrations')
+
+# Errors of statements whose change has already been applied: table exists, duplicate column, duplicate key name
+ALREADY_APPLIED_ERRORS = {1050, 1060, 1061}
+
+
+def read_statements(name):
+    with open(os.path.join(MIGRATIONS_DIR, name)) as file:
+        sql = ''.join(line for line in file if not line.lstrip().startswith('--'))
+    return [statement.strip() for statement in sql.split(';') if statement.strip()]
+
+
+def apply_migration(cursor, name):
+    for statement in read_statements(name):
+        try:
+            cursor.execute(statement)
+        except pymysql.MySQLError as e:
+            if not e.args or e.args[0] not in ALREADY_APPLIED_ERRORS:
+                raise
+
+
+def apply_migrations(database):
+    """
+    Applies all migrations, in the order of their file names, to the database described by the `DATABASE` dict of
+    the config.
+    """
+    connection = pymysql.connect(**database)
+    try:
+        cursor = connection.cursor()
+        for name in sorted(os.listdir(MIGRATIONS_DIR)):
+            if name.endswith('.sql'):
+                apply_migration(cursor, name)
+        connection.commit()
+    finally:
+        connection.close()
@@ -47,6 +47,8 @@ class AchievementsTestCase(unittest.TestCase):
             values
             (1, 'User 1', '', 'user1@example.com')""")
 
+        api.achievements.reconcile_achievement_stats()
+
     def tearDown(self):
         db.connection.close()
 
@@ -73,6 +75,21 @@ class AchievementsTestCase(unittest.TestCase):
         self.assertGreaterEqual(0, result[0]['unlockers_avg_duration'])
         self.assertGreaterEqual(0, result[0]['unlockers_max_duration'])
 
+    def test_achievements_list_sorted_by_localized_name(self):
+        response = self.app.get('/achievements?sort=name')
+        self.assertEqual(200, response.status_code)
+        result, errors = AchievementSchema().loads(response.get_data(as_text=True), many=True)
+
+        names = [achievement['name'] for achievement in result]
+        self.assertEqual(57, len(names))
+        self.assertEqual(sorted(names), names)
+        self.assertIn('Novice', names)
+
+        response = self.app.get('/achievements?sort=-name&page[size]=10&page[number]=2')
+        result, errors = AchievementSchema().loads(response.get_data(as_text=True), many=True)
+
+        self.assertEqual(sorted(names, reverse=True)[10:20], [achievement['name'] for achievement in result])
+
     def test_achievements_get(self):
         response = self.app.get('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81')
         self.assertEqual(200, response.status_code)
@@ -87,6 +104,99 @@ class AchievementsTestCase(unittest.TestCase):
         self.assertEqual("http://content.faforever.com/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81.png", result['revealed_icon_url'])
         self.assertEqual("http://content.faforever.com/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81.png", result['unlocked_icon_url'])
 
+    def test_achievements_get_falls_back_to_default_language(self):
+        response = self.app.get('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81?language=xx&region=YY')
+        self.assertEqual(200, response.status_code)
+        result, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+        self.assertEqual('Novice', result['name'])
+        self.assertEqual('Play 10 games', result['description'])
+
+    def test_achievements_get_reloads_changed_messages(self):
+        self.app.get('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81?language=xx')
+
+        with db.connection:
+            cursor = db.connection.cursor()
+            cursor.execute("""INSERT INTO messages (`key`, language, region, value)
+                              SELECT `key`, 'xx', 'YY', 'Anfaenger' FROM messages
+                              WHERE `key` = (SELECT name_key FROM achievement_definitions
+                                             WHERE id = 'c6e6039f-c543-424e-ab5f-b34df1336e81')
+                                AND language = 'en' AND region = 'US'""")
+        try:
+            api.achievements.message_catalog.refresh()
+
+            response = self.app.get('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81?language=xx&region=YY')
+            result, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+            self.assertEqual('Anfaenger', result['name'])
+            self.assertEqual('Play 10 games', result['description'])
+        finally:
+            with db.connection:
+                cursor = db.connection.cursor()
+                cursor.execute("DELETE FROM messages WHERE language = 'xx'")
+
+    def test_achievements_unlock_updates_stats(self):
+        self.app.post('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd/unlock')
+        self.app.post('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81/increment', data=dict(steps=5))
+
+        response = self.app.get('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd')
+        result, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+        self.assertEqual(1, result['unlockers_count'])
+        self.assertEqual(100.00, result['unlockers_percent'])
+
+        response = self.app.get('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81')
+        result, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+        self.assertEqual(0, result['unlockers_count'])
+
+    def test_reconcile_achievement_stats(self):
+        self.app.post('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd/unlock')
+        with db.connection:
+            cursor = db.connection.cursor()
+            cursor.execute("UPDATE achievement_unlock_stats SET count = 42")
+            cursor.execute("UPDATE achievers_count SET count = 42")
+
+        self.assertEqual(1, api.achievements.reconcile_achievement_stats())
+
+        response = self.app.get('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd')
+        result, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+        self.assertEqual(1, result['unlockers_count'])
+        self.assertEqual(100.00, result['unlockers_percent'])
+
+    def test_unlock_stats_include_players_without_login(self):
+        self.app.post('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd/unlock')
+        with db.connection:
+            cursor = db.connection.cursor()
+            cursor.execute('SET FOREIGN_KEY_CHECKS = 0')
+            cursor.execute("""insert into player_achievements (player_id, achievement_id, state)
+                              values (2, '50260d04-90ff-45c8-816b-4ad8d7b97ecd', 'UNLOCKED')""")
+            cursor.execute('SET FOREIGN_KEY_CHECKS = 1')
+            api.achievements.count_unlock(cursor, '50260d04-90ff-45c8-816b-4ad8d7b97ecd', 2)
+
+        response = self.app.get('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd')
+        incremental, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+        api.achievements.reconcile_achievement_stats()
+        response = self.app.get('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd')
+        reconciled, errors = AchievementSchema().loads(response.get_data(as_text=True))
+
+        for result in (incremental, reconciled):
+            self.assertEqual(2, result['unlockers_count'])
+            self.assertIsNotNone(result['unlockers_min_duration'])
+            self.assertEqual(result['unlockers_min_duration'], result['unlockers_avg_duration'])
+            self.assertEqual(result['unlockers_min_duration'], result['unlockers_max_duration'])
+
+    def test_count_new_achiever_once(self):
+        self.app.post('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd/unlock')
+        with db.connection:
+            cursor = db.connection.cursor()
+            api.achievements.count_new_achiever(cursor, 1)
+            cursor.execute('SELECT count FROM achievers_count WHERE id = 1')
+
+            self.assertEqual(1, cursor.fetchone()[0])
+
     def test_achievements_increment_inserts_if_not_existing(self):
         response = self.app.post('/achievements/c6e6039f-c543-424e-ab5f-b34df1336e81/increment', data=dict(steps=5))
         self.assertEqual(200, response.status_code)
@@ -312,6 +422,22 @@ class AchievementsTestCase(unittest.TestCase):
         self.assertTrue('create_time' in result[1])
         self.assertTrue('update_time' in result[1])
 
+    def test_achievements_list_player_updated_since(self):
+        self.app.post('/achievements/50260d04-90ff-45c8-816b-4ad8d7b97ecd/unlock')
+
+        response = self.app.get('/players/1/achievements?filter%5Bupdated_since%5D=0')
+        self.assertEqual(200, response.status_code)
+
+        result = json.loads(response.get_data(as_text=True))
+        self.assertEqual(1, len(result['data']))
+        server_time = result['meta']['server_time']
+
+        response = self.app.get('/players/1/achievements?filter%5Bupdated_since%5D={}'.format(server_time + 1))
+        self.assertEqual(200, response.status_code)
+
+        result = json.loads(response.get_data(as_text=True))
+        self.assertEqual(0, len(result['data']))
+
 
 if __name__ == '__main__':
     unittest.main()
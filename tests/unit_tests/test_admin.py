@@ -0,0 +1,178 @@
+import datetime
+import importlib
+import json
+from collections import Counter
+from unittest.mock import Mock
+
+import pytest
+
+import api
+import faf.db as db
+from api.error import ErrorCode
+from api.profiler import profiler
+from api.slow_queries import slow_query_log
+from api.user import User
+
+
+def oauth_client(request, group):
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("""insert into login
+        (login, password, email)
+        values
+        ('Test Admin', '', 'admin@example.com')""")
+        user_id = cursor.lastrowid
+        cursor.execute("""insert into lobby_admin
+        (`user_id`, `group`)
+        values
+        (%s, %s)""", (user_id, group))
+
+    def get_token(access_token=None, refresh_token=None):
+        return Mock(
+            user=User(id=user_id),
+            expires=datetime.datetime.now() + datetime.timedelta(hours=1),
+            scopes=['public_profile']
+        )
+
+    importlib.reload(api)
+    importlib.reload(api.oauth_handlers)
+    importlib.reload(api.admin)
+
+    api.app.config.from_object('config')
+    api.api_init()
+    api.app.debug = True
+    slow_query_log.configure(threshold=100)
+
+    def finalizer():
+        slow_query_log.configure(threshold=None)
+        slow_query_log.clear()
+        with db.connection:
+            db.connection.cursor().execute('DELETE FROM login WHERE id=%s', user_id)
+        db.connection.close()
+
+    request.addfinalizer(finalizer)
+
+    api.oauth.tokengetter(get_token)
+
+    return api.app.test_client()
+
+
+@pytest.fixture
+def admin(request):
+    return oauth_client(request, 2)
+
+
+@pytest.fixture
+def moderator(request):
+    return oauth_client(request, 1)
+
+
+def test_slow_queries(admin):
+    slow_query_log.record('SELECT * FROM map WHERE id = %s', (1,), 'maps', 150, 1)
+    slow_query_log.record('SELECT * FROM map WHERE id = %s', (2,), 'maps', 250, 1)
+    slow_query_log.record('SELECT * FROM mods', None, 'mods', 300, 1000)
+    slow_query_log.record('SELECT * FROM login', None, 'players', 50, 1)
+
+    response = admin.get('/admin/slow_queries')
+
+    assert response.status_code == 200
+    result = json.loads(response.data.decode('utf-8'))
+    assert len(result['data']) == 2
+    assert result['data'][0]['type'] == 'slow_query'
+    assert result['data'][0]['attributes']['shape'] == 'SELECT * FROM map WHERE id = ?'
+    assert result['data'][0]['attributes']['count'] == 2
+    assert result['data'][0]['attributes']['total_time'] == 400
+    assert result['data'][0]['attributes']['last_args'] == '(2,)'
+    assert result['data'][1]['attributes']['shape'] == 'SELECT * FROM mods'
+
+    response = admin.get('/admin/slow_queries?sort=max_time&limit=1')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert len(result['data']) == 1
+    assert result['data'][0]['attributes']['shape'] == 'SELECT * FROM mods'
+
+
+def test_slow_queries_invalid_sort(admin):
+    response = admin.get('/admin/slow_queries?sort=shape')
+
+    assert response.status_code == 400
+    error = json.loads(response.data.decode('utf-8'))['errors'][0]
+    assert error['code'] == ErrorCode.QUERY_INVALID_SORT_FIELD.value['code']
+
+
+def test_slow_queries_forbidden_for_moderators(moderator):
+    response = moderator.get('/admin/slow_queries')
+
+    assert response.status_code == 400
+    error = json.loads(response.data.decode('utf-8'))['errors'][0]
+    assert error['code'] == ErrorCode.FORBIDDEN.value['code']
+
+
+def test_slow_queries_requires_authentication(test_client):
+    response = test_client.get('/admin/slow_queries')
+
+    assert response.status_code == 400
+    error = json.loads(response.data.decode('utf-8'))['errors'][0]
+    assert error['code'] == ErrorCode.AUTHENTICATION_NEEDED.value['code']
+
+
+def test_profile(admin):
+    profiler._stacks = {'maps': Counter({'flask.app:wsgi_app:1;api.maps:maps:10': 3}),
+                        'mods': Counter({'flask.app:wsgi_app:1;api.mods:mods:12': 1})}
+
+    response = admin.get('/admin/profile')
+
+    assert response.status_code == 200
+    assert response.data.decode('utf-8') == ('maps;flask.app:wsgi_app:1;api.maps:maps:10 3\n'
+                                             'mods;flask.app:wsgi_app:1;api.mods:mods:12 1\n')
+
+    response = admin.get('/admin/profile?endpoint=mods')
+
+    assert response.data.decode('utf-8') == 'mods;flask.app:wsgi_app:1;api.mods:mods:12 1\n'
+
+    response = admin.delete('/admin/profile')
+
+    assert response.status_code == 204
+    assert profiler.collapsed() == ''
+
+
+def test_profile_forbidden_for_moderators(moderator):
+    response = moderator.get('/admin/profile')
+
+    assert response.status_code == 400
+    error = json.loads(response.data.decode('utf-8'))['errors'][0]
+    assert error['code'] == ErrorCode.FORBIDDEN.value['code']
+
+
+def test_metrics(app, test_client):
+    app.config['METRICS_TOKEN'] = 'secret'
+    test_client.get('/coop/missions')
+
+    response = test_client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/plain; version=0.0.4'
+    body = response.data.decode('utf-8')
+    assert 'faf_api_request_duration_seconds_count{endpoint="coop_missions",status="200"}' in body
+    assert 'faf_api_db_connection_open 1' in body
+    assert 'faf_api_deployment_workers 0' in body
+
+
+@pytest.mark.parametrize('headers', [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'secret'}])
+def test_metrics_forbidden_without_token(app, test_client, headers):
+    app.config['METRICS_TOKEN'] = 'secret'
+
+    # Local addresses aren't trusted either, since a local reverse proxy may forward any request
+    response = test_client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': '127.0.0.1'})
+
+    assert response.status_code == 400
+    error = json.loads(response.data.decode('utf-8'))['errors'][0]
+    assert error['code'] == ErrorCode.FORBIDDEN.value['code']
+
+
+def test_metrics_disabled_without_configured_token(app, test_client):
+    app.config['METRICS_TOKEN'] = None
+
+    response = test_client.get('/metrics', headers={'Authorization': 'Bearer '})
+
+    assert response.status_code == 400
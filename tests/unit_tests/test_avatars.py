@@ -175,6 +175,16 @@ def test_user_avatar_get(test_client, avatar_user):
     assert len(response_data) >= 0
     assert avatar.id in [a['id'] for a in response_data]
 
+def test_user_avatar_get_sees_assignments_from_elsewhere(test_client, avatar_user):
+    user, avatar = avatar_user
+    test_client.get('/user_avatars?id={}'.format(user.id))
+
+    # Like the lobby server, which doesn't purge the response cache
+    Avatar.remove_user_avatars(user, [avatar])
+
+    response = test_client.get('/user_avatars?id={}'.format(user.id))
+    assert avatar.id not in [a['id'] for a in json.loads(response.data.decode("utf-8"))]
+
 @pytest.mark.skip
 def test_user_avatar_cannot_be_added_by_unauthed_user(test_client, avatar_user):
     user, old_avatar = avatar_user
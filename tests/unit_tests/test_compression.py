@@ -0,0 +1,52 @@
+import gzip
+
+from werkzeug.datastructures import Accept
+from werkzeug.wrappers import Response
+
+from api import compression
+
+BODY = b'{"data": []}' * 200
+
+
+def test_choose_encoding():
+    assert compression.choose_encoding(Accept([('gzip', 1), ('deflate', 1)])) == 'gzip'
+    assert compression.choose_encoding(Accept([('deflate', 1)])) is None
+    assert compression.choose_encoding(Accept()) is None
+
+
+def test_compress_response():
+    response = Response(BODY, mimetype='application/json')
+
+    compression.compress_response(response, Accept([('gzip', 1)]))
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Length'] == str(len(response.get_data()))
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.get_data()) == BODY
+
+
+def test_small_bodies_are_not_compressed():
+    response = Response(b'{"data": []}', mimetype='application/json')
+
+    compression.compress_response(response, Accept([('gzip', 1)]))
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'{"data": []}'
+
+
+def test_other_mimetypes_are_not_compressed():
+    response = Response(BODY, mimetype='image/png')
+
+    compression.compress_response(response, Accept([('gzip', 1)]))
+
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_uncompressed_if_not_accepted():
+    response = Response(BODY, mimetype='application/json')
+
+    compression.compress_response(response, Accept())
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_data() == BODY
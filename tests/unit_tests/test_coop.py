@@ -296,3 +296,103 @@ def test_coop_leaderboards_player_count_all(test_client, test_data, player_count
         }, 'id': "2",
         'type': 'coop_leaderboard'
     }]}
+
+
+def test_coop_leaderboards_new_record(test_client, test_data):
+    test_client.get('/coop/leaderboards/1/1')
+
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("""insert into coop_leaderboard (id, mission, gameuid, secondary, time, player_count)
+        values (5, 1, 4, 1, '00:30', 1)""")
+    api.coop.coop_leaderboard.refresh()
+
+    response = test_client.get('/coop/leaderboards/1/1')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [(item['id'], item['attributes']['ranking']) for item in result['data']] == [('5', 1), ('2', 2)]
+
+
+def test_coop_leaderboards_sort(test_client, test_data):
+    response = test_client.get('/coop/leaderboards/1/0?sort=-duration')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [(item['id'], item['attributes']['ranking']) for item in result['data']] == [('2', 3), ('1', 2), ('3', 1)]
+
+
+def test_coop_leaderboards_page(test_client, test_data):
+    response = test_client.get('/coop/leaderboards/1/0?page[size]=1&page[number]=2')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [(item['id'], item['attributes']['ranking']) for item in result['data']] == [('1', 2)]
+
+
+def test_coop_player_records(test_client, test_data):
+    response = test_client.get('/coop/players/1/records')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [(item['id'], item['attributes']['mission'], item['attributes']['player_count'],
+             item['attributes']['ranking']) for item in result['data']] == [
+        ('2', 1, 1, 1),
+        ('1', 1, 2, 2),
+        ('4', 2, 3, 1)
+    ]
+    assert result['data'][1]['attributes']['player_names'] == 'a, b'
+    assert result['data'][1]['attributes']['duration'] == 2340
+
+
+def test_coop_player_records_fields(test_client, test_data):
+    response = test_client.get('/coop/players/1/records?fields[coop_record]=mission,ranking')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data'][0] == {'id': '2', 'type': 'coop_record', 'attributes': {'mission': 1, 'ranking': 1}}
+
+
+def test_coop_player_records_none(test_client, test_data):
+    response = test_client.get('/coop/players/99/records')
+
+    assert response.status_code == 200
+    assert json.loads(response.data.decode('utf-8')) == {'data': []}
+
+
+def test_coop_missions_cached(test_client, test_data):
+    response = test_client.get('/coop/missions')
+    assert len(json.loads(response.data.decode('utf-8'))['data']) == 3
+
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("DELETE FROM coop_map WHERE id = 3")
+
+    response = test_client.get('/coop/missions')
+    assert len(json.loads(response.data.decode('utf-8'))['data']) == 3
+
+    api.response_cache.purge('coop')
+
+    response = test_client.get('/coop/missions')
+    assert len(json.loads(response.data.decode('utf-8'))['data']) == 2
+
+
+def test_coop_missions_not_modified(test_client, test_data):
+    response = test_client.get('/coop/missions')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = test_client.get('/coop/missions', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    assert 'Last-Modified' not in response.headers
+
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("DELETE FROM coop_map WHERE id = 3")
+    api.response_cache.purge('coop')
+
+    response = test_client.get('/coop/missions', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
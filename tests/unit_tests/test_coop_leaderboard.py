@@ -0,0 +1,81 @@
+from api.coop_leaderboard import CoopLeaderboard
+
+
+def record(record_id, game_id, mission, player_count, duration, player_ids=(1,)):
+    return dict(id=record_id, game_id=game_id, mission=mission, player_count=player_count,
+                secondary_objectives=True, duration=duration, player_names='a', player_ids=list(player_ids))
+
+
+class FakeLoader(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def __call__(self, after=None):
+        self.calls.append(after)
+        return [row for row in self.rows if after is None or row['id'] > after]
+
+
+def test_ranking():
+    leaderboard = CoopLeaderboard(FakeLoader([
+        record(1, 1, 1, 2, 2340),
+        record(2, 2, 1, 1, 2700),
+        record(3, 3, 1, 2, 2160),
+        record(4, 4, 2, 3, 1260)
+    ]))
+
+    assert [(row['id'], row['ranking']) for row in leaderboard.ranking(1, 2)] == [(3, 1), (1, 2)]
+    assert [(row['id'], row['ranking']) for row in leaderboard.ranking(1, 0)] == [(3, 1), (1, 2), (2, 3)]
+    assert [(row['id'], row['ranking']) for row in leaderboard.ranking(1, -1)] == [(3, 1), (1, 2), (2, 3)]
+    assert leaderboard.ranking(3, 0) == []
+
+
+def test_one_record_per_game():
+    leaderboard = CoopLeaderboard(FakeLoader([
+        record(1, 1, 1, 2, 2340),
+        record(2, 1, 1, 2, 2000)
+    ]))
+
+    assert [row['id'] for row in leaderboard.ranking(1, 2)] == [1]
+
+
+def test_refresh_loads_new_records_only():
+    loader = FakeLoader([record(1, 1, 1, 2, 2340)])
+    leaderboard = CoopLeaderboard(loader)
+    leaderboard.refresh()
+
+    loader.rows.append(record(2, 2, 1, 2, 1000))
+    leaderboard.refresh()
+
+    assert loader.calls == [None, 1]
+    assert [row['id'] for row in leaderboard.ranking(1, 2)] == [2, 1]
+
+
+def test_rebuild_drops_deleted_records():
+    loader = FakeLoader([record(1, 1, 1, 2, 2340), record(2, 2, 1, 2, 1000)])
+    leaderboard = CoopLeaderboard(loader)
+    leaderboard.refresh()
+
+    del loader.rows[1]
+    leaderboard.rebuild()
+
+    assert [row['id'] for row in leaderboard.ranking(1, 2)] == [1]
+
+
+def test_player_records():
+    leaderboard = CoopLeaderboard(FakeLoader([
+        record(1, 1, 1, 2, 2340, player_ids=[1, 2]),
+        record(2, 2, 1, 1, 2700, player_ids=[1]),
+        record(3, 3, 1, 2, 2160, player_ids=[3, 4]),
+        record(4, 4, 1, 2, 2500, player_ids=[1, 3]),
+        record(5, 5, 2, 3, 1260, player_ids=[1, 2, 3])
+    ]))
+
+    records = leaderboard.player_records(1)
+
+    assert [(row['mission'], row['player_count'], row['id'], row['ranking']) for row in records] == [
+        (1, 1, 2, 1),
+        (1, 2, 1, 2),
+        (2, 3, 5, 1)
+    ]
+    assert leaderboard.player_records(99) == []
@@ -0,0 +1,45 @@
+import numpy as np
+
+from api.downsampling import largest_triangle_three_buckets
+
+
+def test_fewer_points_than_threshold():
+    x = np.arange(5, dtype=np.float64)
+
+    indices = largest_triangle_three_buckets(x, x, 10)
+
+    assert indices.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_keeps_first_and_last_point():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x / 50)
+
+    indices = largest_triangle_three_buckets(x, y, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_keeps_spikes():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[123] = 500
+    y[777] = -500
+
+    indices = largest_triangle_three_buckets(x, y, 10)
+
+    assert 123 in indices
+    assert 777 in indices
+
+
+def test_one_point_per_bucket():
+    x = np.arange(10, dtype=np.float64)
+    y = np.array([0, 1, 0, 1, 0, 1, 0, 1, 0, 1], dtype=np.float64)
+
+    indices = largest_triangle_three_buckets(x, y, 9)
+
+    assert len(indices) == 9
+    assert len(set(indices.tolist())) == 9
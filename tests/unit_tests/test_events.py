@@ -10,6 +10,8 @@ from api.oauth_token import OAuthToken
 import faf.db as db
 import unittest
 
+from api.error import ErrorCode
+
 
 class EventsTestCase(unittest.TestCase):
     def get_token(self, access_token=None, refresh_token=None):
@@ -130,6 +132,36 @@ class EventsTestCase(unittest.TestCase):
         self.assertEqual('225e9b2e-ae09-4ae1-a198-eca8780b0fcd', data[1]['attributes']['event_id'])
         self.assertEqual(33, data[1]['attributes']['count'])
 
+    def test_events_list_player_updated_since(self):
+        request_data = dict(
+            player_id=1,
+            updates=[
+                dict(event_id='15b6c19a-6084-4e82-ada9-6c30e282191f', count=10)
+            ]
+        )
+        self.app.post('/events/recordMultiple', headers=[('Content-Type', 'application/json')],
+                      data=json.dumps(request_data))
+
+        response = self.app.get('/players/1/events?filter%5Bupdated_since%5D=0')
+        self.assertEqual(200, response.status_code)
+
+        result = json.loads(response.get_data(as_text=True))
+        self.assertEqual(1, len(result['data']))
+        server_time = result['meta']['server_time']
+
+        response = self.app.get('/players/1/events?filter%5Bupdated_since%5D={}'.format(server_time + 1))
+        self.assertEqual(200, response.status_code)
+
+        result = json.loads(response.get_data(as_text=True))
+        self.assertEqual(0, len(result['data']))
+
+    def test_events_list_player_invalid_updated_since(self):
+        response = self.app.get('/players/1/events?filter%5Bupdated_since%5D=yesterday')
+        self.assertEqual(400, response.status_code)
+
+        result = json.loads(response.get_data(as_text=True))
+        self.assertEqual(ErrorCode.QUERY_INVALID_TIMESTAMP.value['code'], result['errors'][0]['code'])
+
 
 if __name__ == '__main__':
     unittest.main()
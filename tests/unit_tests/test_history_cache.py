@@ -0,0 +1,106 @@
+from api.history_cache import RatingHistoryCache
+
+
+class FakeLoader(object):
+    def __init__(self):
+        self.rows = {}
+        self.calls = []
+
+    def __call__(self, player_id, game_mod, after):
+        self.calls.append((player_id, game_mod, after))
+        return [row for row in self.rows.get((player_id, game_mod), []) if after is None or row[0] >= after]
+
+
+def test_get_loads_history():
+    loader = FakeLoader()
+    loader.rows[(1, 'faf')] = [(100, 1500, 200, 1), (200, 1520, 190, 2)]
+    cache = RatingHistoryCache(loader, 1024)
+
+    history = cache.get(1, 'faf')
+
+    assert history.times.tolist() == [100, 200]
+    assert history.means.tolist() == [1500, 1520]
+    assert history.deviations.tolist() == [200, 190]
+    assert history.game_ids.tolist() == [1, 2]
+    assert loader.calls == [(1, 'faf', None)]
+
+
+def test_get_appends_new_entries():
+    loader = FakeLoader()
+    loader.rows[(1, 'faf')] = [(100, 1500, 200, 1)]
+    cache = RatingHistoryCache(loader, 1024)
+    cache.get(1, 'faf')
+
+    loader.rows[(1, 'faf')].append((300, 1540, 180, 2))
+    history = cache.get(1, 'faf')
+
+    assert history.times.tolist() == [100, 300]
+    assert loader.calls == [(1, 'faf', None), (1, 'faf', 100)]
+    assert type(loader.calls[1][2]) is float
+
+
+def test_get_appends_games_scored_in_the_same_second():
+    loader = FakeLoader()
+    loader.rows[(1, 'faf')] = [(100, 1500, 200, 1)]
+    cache = RatingHistoryCache(loader, 1024)
+    cache.get(1, 'faf')
+
+    loader.rows[(1, 'faf')].append((100, 1520, 190, 2))
+    history = cache.get(1, 'faf')
+
+    assert history.times.tolist() == [100, 100]
+    assert history.game_ids.tolist() == [1, 2]
+
+    history = cache.get(1, 'faf')
+
+    assert history.game_ids.tolist() == [1, 2]
+    assert loader.calls[1:] == [(1, 'faf', 100), (1, 'faf', 100)]
+
+
+def test_slice():
+    loader = FakeLoader()
+    loader.rows[(1, 'faf')] = [(100, 1500, 200, 1), (200, 1520, 190, 2), (300, 1540, 180, 3)]
+    cache = RatingHistoryCache(loader, 1024)
+
+    history = cache.get(1, 'faf')
+
+    assert history.slice(150, 300).times.tolist() == [200, 300]
+    assert history.slice(time_from=200).times.tolist() == [200, 300]
+    assert history.slice(time_to=200).times.tolist() == [100, 200]
+    assert len(history.slice(400)) == 0
+
+
+def test_evicts_least_recently_used():
+    loader = FakeLoader()
+    for player_id in range(3):
+        loader.rows[(player_id, 'faf')] = [(100, 1500, 200, 1)]
+    # Every history takes 4 * 8 bytes
+    cache = RatingHistoryCache(loader, 64)
+
+    cache.get(0, 'faf')
+    cache.get(1, 'faf')
+    cache.get(0, 'faf')
+    cache.get(2, 'faf')
+
+    assert len(cache) == 2
+    assert cache.nbytes == 64
+
+    loader.calls = []
+    cache.get(1, 'faf')
+    assert loader.calls == [(1, 'faf', None)]
+
+
+def test_invalidate():
+    loader = FakeLoader()
+    loader.rows[(1, 'faf')] = [(100, 1500, 200, 1)]
+    loader.rows[(1, 'ladder1v1')] = [(100, 1500, 200, 2)]
+    cache = RatingHistoryCache(loader, 1024)
+    cache.get(1, 'faf')
+    cache.get(1, 'ladder1v1')
+
+    cache.invalidate(1, 'faf')
+    assert len(cache) == 1
+
+    cache.invalidate()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
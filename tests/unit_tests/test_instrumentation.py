@@ -0,0 +1,55 @@
+from api.instrumentation import Metrics, endpoint_metric
+
+
+class RecordingClient(object):
+    def __init__(self):
+        self.timings = []
+        self.counters = []
+
+    def timing(self, name, value):
+        self.timings.append((name, value))
+
+    def incr(self, name, count=1):
+        self.counters.append((name, count))
+
+
+def test_endpoint_metric():
+    assert endpoint_metric('leaderboards_type', 'fetch_data.sql') == 'endpoints.leaderboards_type.fetch_data.sql'
+    assert endpoint_metric('deployment.github_hook', 200) == 'endpoints.deployment_github_hook.200'
+    assert endpoint_metric(None, 404) == 'endpoints.unknown.404'
+
+
+def test_disabled_metrics_do_nothing():
+    metrics = Metrics()
+
+    with metrics.timer('endpoints.maps.fetch_data.sql'):
+        pass
+    metrics.incr('endpoints.maps.200')
+
+    assert not metrics.enabled
+
+
+def test_timer():
+    client = RecordingClient()
+    metrics = Metrics()
+    metrics.configure(client)
+
+    with metrics.timer('endpoints.maps.fetch_data.sql'):
+        pass
+
+    name, value = client.timings[0]
+    assert name == 'api.endpoints.maps.fetch_data.sql'
+    assert value >= 0
+
+
+def test_record_request():
+    client = RecordingClient()
+    metrics = Metrics()
+    metrics.configure(client)
+
+    metrics.record_request('achievements_list', 200, 12.5, 2048)
+
+    assert client.timings == [('api.request', 12.5),
+                              ('api.endpoints.achievements_list.200', 12.5),
+                              ('api.endpoints.achievements_list.response_bytes', 2048)]
+    assert client.counters == [('api.endpoints.achievements_list.200', 1)]
@@ -0,0 +1,60 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import flask
+import pytest
+
+from api import json_encoding
+
+ROW = {
+    'id': 1,
+    'login': 'Dostya',
+    'mean': 1600.123456789,
+    'small': 1e-07,
+    'create_time': datetime(2016, 10, 19, 12, 30, 5),
+    'day': date(2016, 10, 19),
+    'description': 'Für die Ehre\n"quoted"',
+    'uid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'ranked': None,
+    'is_active': True
+}
+
+
+def test_dumps():
+    encoded = json_encoding.dumps({'data': [ROW], 'meta': {}})
+
+    assert encoded.startswith(b'{"data":[{"create_time":"Wed, 19 Oct 2016 12:30:05 GMT","day":')
+    assert b'"F\\u00fcr die Ehre\\n\\"quoted\\""' in encoded
+    assert encoded.endswith(b'}\n')
+    assert json.loads(encoded.decode('utf-8'))['data'][0] == {
+        'id': 1,
+        'login': 'Dostya',
+        'mean': 1600.123456789,
+        'small': 1e-07,
+        'create_time': 'Wed, 19 Oct 2016 12:30:05 GMT',
+        'day': 'Wed, 19 Oct 2016 00:00:00 GMT',
+        'description': 'Für die Ehre\n"quoted"',
+        'uid': '12345678-1234-5678-1234-567812345678',
+        'ranked': None,
+        'is_active': True
+    }
+
+
+def test_dumps_matches_jsonify(app):
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    data = {'data': [dict(ROW, id=i) for i in range(100)], 'meta': {'page': 1}, 'history': {999: [1500.0, 200.0],
+                                                                                           1000: [1510.0, 190.0]}}
+
+    with app.test_request_context():
+        assert json_encoding.dumps(data) == flask.jsonify(data).get_data()
+
+
+def test_dumps_decimal():
+    assert json_encoding.dumps({'rating': Decimal('1500.5')}) == b'{"rating":1500.5}\n'
+
+
+def test_unserializable_values():
+    with pytest.raises(TypeError):
+        json_encoding.dumps({'value': object()})
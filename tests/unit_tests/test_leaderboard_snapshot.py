@@ -0,0 +1,42 @@
+from api.leaderboard_snapshot import LeaderboardSnapshot
+
+ROWS = [
+    dict(id=4, login='d', mean=1500, deviation=99, rating=1203, num_games=30, won_games=17, winning_percentage=57),
+    dict(id=3, login='c', mean=1720, deviation=100, rating=1420, num_games=13, won_games=7, winning_percentage=54)
+]
+
+
+def test_entries():
+    snapshot = LeaderboardSnapshot(ROWS, 1477052000)
+
+    entries = snapshot.entries(1, 10, include_win_stats=True)
+
+    assert len(snapshot) == 2
+    assert entries == [{
+        'id': 3,
+        'login': 'c',
+        'mean': 1720,
+        'deviation': 100,
+        'num_games': 13,
+        'is_active': 1,
+        'rating': 1420,
+        'ranking': 2,
+        'won_games': 7,
+        'lost_games': 6,
+        'winning_percentage': 54
+    }]
+
+
+def test_entries_without_win_stats():
+    snapshot = LeaderboardSnapshot(ROWS, 1477052000)
+
+    entries = snapshot.entries(0, 1)
+
+    assert [entry['ranking'] for entry in entries] == [1]
+    assert 'won_games' not in entries[0]
+
+
+def test_entries_out_of_range():
+    snapshot = LeaderboardSnapshot(ROWS, 1477052000)
+
+    assert snapshot.entries(5, 10) == []
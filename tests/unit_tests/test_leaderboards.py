@@ -1,8 +1,11 @@
 import json
+import time
+from unittest.mock import patch
 
 import pytest
 from faf.api import LeaderboardSchema
 
+import api
 from api.error import ErrorCode
 from faf import db
 
@@ -118,6 +121,48 @@ def test_leaderboards_page(test_client, rating_ratings):
     assert result['data'][0]['attributes']['ranking'] == 2
 
 
+# The snapshot is refreshed by the test instead of a background thread with its own database connection
+@patch('api.leaderboard_snapshot.LeaderboardSnapshotter.start')
+def test_leaderboards_snapshot(start, app, test_client, rating_ratings):
+    app.config['LEADERBOARD_SNAPSHOT_INTERVAL'] = 3600
+    try:
+        api.leaderboards.get_snapshotter('1v1').refresh(db.connection)
+
+        response = test_client.get('/leaderboards/1v1?page[size]=1&page[number]=2')
+
+        assert response.status_code == 200
+
+        result = json.loads(response.data.decode('utf-8'))
+        assert 'generated_at' in result['meta']
+        assert len(result['data']) == 1
+        assert result['data'][0]['id'] == '3'
+        assert result['data'][0]['attributes']['login'] == 'c'
+        assert result['data'][0]['attributes']['ranking'] == 2
+        assert result['data'][0]['attributes']['won_games'] == 7
+        assert start.called
+    finally:
+        app.config['LEADERBOARD_SNAPSHOT_INTERVAL'] = None
+        api.leaderboards.leaderboard_snapshotters.clear()
+
+
+@patch('api.leaderboard_snapshot.LeaderboardSnapshotter.start')
+def test_leaderboards_snapshot_global(start, app, test_client, rating_ratings):
+    app.config['LEADERBOARD_SNAPSHOT_INTERVAL'] = 3600
+    try:
+        api.leaderboards.get_snapshotter('global').refresh(db.connection)
+
+        response = test_client.get('/leaderboards/global')
+
+        result = json.loads(response.data.decode('utf-8'))
+        assert [(item['attributes']['login'], item['attributes']['ranking']) for item in result['data']] == [
+            ('d', 1), ('c', 2), ('b', 3)
+        ]
+        assert 'won_games' not in result['data'][0]['attributes']
+    finally:
+        app.config['LEADERBOARD_SNAPSHOT_INTERVAL'] = None
+        api.leaderboards.leaderboard_snapshotters.clear()
+
+
 def test_leaderboards_invalid_page(test_client):
     response = test_client.get('/leaderboards/1v1?page[number]=-1')
 
@@ -148,6 +193,36 @@ def test_leaderboards_1v1_stats(test_client, rating_ratings):
     assert result['data']['attributes']['rating_distribution'] == {'1200': 1, '1400': 2}
 
 
+def test_leaderboards_stats_rebuilt_after_delete(test_client, rating_ratings):
+    test_client.get('/leaderboards/1v1/stats')
+    with db.connection:
+        db.connection.cursor().execute("DELETE FROM ladder1v1_rating WHERE id = 4")
+
+    # Polling doesn't see deleted rows, only the periodic rebuild does
+    with patch('api.rating_distribution.time.time', return_value=time.time() + 60):
+        response = test_client.get('/leaderboards/1v1/stats')
+    assert json.loads(response.data.decode('utf-8'))['data']['attributes']['rating_distribution'] == {
+        '1200': 1, '1400': 2}
+
+    with patch('api.rating_distribution.time.time', return_value=time.time() + 3600):
+        response = test_client.get('/leaderboards/1v1/stats')
+    assert json.loads(response.data.decode('utf-8'))['data']['attributes']['rating_distribution'] == {'1400': 2}
+
+
+def test_leaderboards_stats_polled_without_update_time(test_client, rating_ratings):
+    with db.connection:
+        db.connection.cursor().execute("UPDATE ladder1v1_rating SET update_time = NULL")
+    test_client.get('/leaderboards/1v1/stats')
+    with db.connection:
+        db.connection.cursor().execute(
+            "UPDATE ladder1v1_rating SET mean = 1000, deviation = 100, update_time = NOW() WHERE id = 4")
+
+    with patch('api.rating_distribution.time.time', return_value=time.time() + 60):
+        response = test_client.get('/leaderboards/1v1/stats')
+    assert json.loads(response.data.decode('utf-8'))['data']['attributes']['rating_distribution'] == {
+        '700': 1, '1400': 2}
+
+
 def test_leaderboards_global_stats(test_client, rating_ratings):
     response = test_client.get('/leaderboards/global/stats')
 
@@ -158,6 +233,41 @@ def test_leaderboards_global_stats(test_client, rating_ratings):
     assert result['data']['attributes']['rating_distribution'] == {'1000': 1, '1600': 1}
 
 
+def test_leaderboards_stats_bucket_width(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/1v1/stats?bucket_width=10')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data']['attributes']['rating_distribution'] == {'1200': 1, '1400': 1, '1420': 1}
+
+
+def test_leaderboards_stats_invalid_bucket_width(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/1v1/stats?bucket_width=15')
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.QUERY_INVALID_BUCKET_WIDTH.value['code']
+    assert result['errors'][0]['meta']['args'] == [10, 15]
+
+
+def test_leaderboards_stats_percentile_of_rating(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/1v1/stats/percentiles?rating=1410')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data']['attributes'] == {'rating': 1410, 'percentile': 66.67}
+
+
+def test_leaderboards_stats_rating_at_percentile(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/1v1/stats/percentiles?percentile=100')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data']['attributes'] == {'rating': 1420, 'percentile': 100.0}
+
+
 def test_leaderboards_invalid(test_client, rating_ratings):
     response = test_client.get('/leaderboards/')
 
@@ -200,4 +310,32 @@ def test_leaderboards_get_player_global(test_client, rating_ratings):
     assert response.content_type == 'application/vnd.api+json'
     assert not errors
     assert result['login'] == 'a'
-    assert result['ranking'] == 2
\ No newline at end of file
+    assert result['ranking'] == 2
+
+def test_leaderboards_filter_by_id(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/1v1?filter[id]=1,2,4,999')
+
+    assert response.status_code == 200
+    assert response.content_type == 'application/vnd.api+json'
+
+    result = json.loads(response.data.decode('utf-8'))
+    rankings = {item['id']: item['attributes']['ranking'] for item in result['data']}
+    assert rankings == {'1': 3, '2': 2, '4': 3}
+
+
+def test_leaderboards_filter_by_id_global(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/global?filter[id]=3,4')
+
+    result = json.loads(response.data.decode('utf-8'))
+    rankings = {item['id']: item['attributes']['ranking'] for item in result['data']}
+    assert rankings == {'3': 2, '4': 1}
+
+
+def test_leaderboards_filter_by_id_too_many(test_client, rating_ratings):
+    response = test_client.get('/leaderboards/1v1?filter[id]=' + ','.join(str(i) for i in range(101)))
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.QUERY_TOO_MANY_IDS.value['code']
+    assert result['errors'][0]['meta']['args'] == [100, 101]
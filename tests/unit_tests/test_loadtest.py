@@ -0,0 +1,61 @@
+import pytest
+
+from tests.benchmarks.loadtest import Entry, get_token, parse_entry, replay, summarize
+
+
+class RecordingSender(object):
+    def __init__(self, status=200):
+        self.status = status
+        self.entries = []
+
+    def send(self, entry):
+        self.entries.append(entry)
+        return self.status
+
+
+def test_parse_entry():
+    assert parse_entry('GET /maps page[size]=100 none') == Entry('GET', '/maps', 'page[size]=100', 'none', 1, None)
+    assert parse_entry('get /players/1/achievements - oauth:42') == Entry(
+        'GET', '/players/1/achievements', '', 'oauth', 42, None)
+    assert parse_entry('POST /jwt/events/recordMultiple - jwt:5 {"updates": []}') == Entry(
+        'POST', '/jwt/events/recordMultiple', '', 'jwt', 5, '{"updates": []}')
+
+
+def test_parse_entry_ignores_comments_and_blank_lines():
+    assert parse_entry('# GET /maps - none') is None
+    assert parse_entry('  \n') is None
+
+
+@pytest.mark.parametrize('line', ['GET /maps', 'GET /maps - basic'])
+def test_parse_entry_invalid(line):
+    with pytest.raises(ValueError):
+        parse_entry(line)
+
+
+def test_get_token():
+    token = get_token(access_token='42')
+
+    assert token.user.id == 42
+    assert 'write_achievements' in token.scopes
+    assert get_token(access_token='invalid') is None
+
+
+def test_replay_starts_over():
+    sender = RecordingSender()
+    entries = [parse_entry('GET /maps - none'), parse_entry('GET /mods - none')]
+
+    elapsed, results = replay(entries, sender, concurrency=2, requests=5)
+
+    assert sorted(entry.path for entry in sender.entries) == ['/maps'] * 3 + ['/mods'] * 2
+    assert len(results['maps']) == 3
+    assert len(results['mods']) == 2
+
+
+def test_summarize():
+    summary = summarize(2.0, {'maps': [(0.01, 200), (0.02, 200), (0.03, 500), (0.04, None)]})
+
+    assert summary['maps']['requests'] == 4
+    assert summary['maps']['throughput'] == 2.0
+    assert summary['maps']['p50_ms'] == 30.0
+    assert summary['maps']['error_rate'] == 0.5
+    assert summary['total']['requests'] == 4
@@ -281,6 +281,31 @@ def test_map_by_name(test_client, app, maps):
                                                                      '/map_previews/large/scmp_002.v0001.png'
 
 
+def test_maps_search(test_client, maps):
+    response = test_client.get('/maps?filter%5Bsearch%5D=user%202')
+
+    assert response.status_code == 200
+    assert response.content_type == 'application/vnd.api+json'
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [item['id'] for item in result['data']] == ['2', '3']
+
+
+def test_maps_search_prefix(test_client, maps):
+    response = test_client.get('/maps?filter%5Bsearch%5D=spa')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert len(result['data']) == 1
+    assert result['data'][0]['attributes']['display_name'] == 'Map with space'
+
+
+def test_maps_search_page(test_client, maps):
+    response = test_client.get('/maps?filter%5Bsearch%5D=scmp&page[size]=2&page[number]=2')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert len(result['data']) == 1
+
+
 @pytest.mark.parametrize("ranked", [True, False])
 def test_map_upload(oauth, ranked, maps, upload_dir, preview_dir):
     map_zip = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../data/scmp 037.zip')
@@ -17,6 +17,7 @@ from api import User
 from api.error import ErrorCode
 from faf import db
 from faf.api import ModSchema
+from tests.migrations import apply_migration
 
 
 @pytest.fixture
@@ -24,6 +25,7 @@ def mods(request):
     with db.connection:
         cursor = db.connection.cursor()
         cursor.execute("DELETE FROM mod_stats")
+        cursor.execute("DELETE FROM mod_latest_version")
         cursor.execute("DELETE FROM mod_version")
         cursor.execute("""DELETE FROM mod_stats""")
         cursor.execute("""DELETE FROM mod_version""")
@@ -46,6 +48,7 @@ def mods(request):
                     (1, 0, 3, ''),
                     (2, 0, 4, ''),
                     (3, 1, 5, '')""")
+        cursor.execute("insert into mod_latest_version (mod_id, version) VALUES (1, 2), (2, 1), (3, 1)")
 
 
 @pytest.fixture
@@ -284,6 +287,85 @@ def test_mods_inject_sql_order(test_client):
     assert result['errors'][0]['meta']['args'] == ["' or 1=1; --"]
 
 
+def test_mods_search(test_client, mods):
+    response = test_client.get('/mods?filter%5Bsearch%5D=test-mod2')
+
+    assert response.status_code == 200
+    assert response.content_type == 'application/vnd.api+json'
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data'][0]['id'] == 'baz'
+
+
+def test_mods_search_newest_version_only(test_client, mods):
+    response = test_client.get('/mods?filter%5Bsearch%5D=baz&sort=display_name')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [item['id'] for item in result['data']] == ['bar', 'baz', 'EA040F8E-857A-4566-9879-0D37420A5B9D']
+
+
+def test_mods_search_meta(test_client, mods):
+    response = test_client.get('/mods?filter%5Bsearch%5D=baz&page%5Bsize%5D=2')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert len(result['data']) == 2
+    assert result['meta']['page'] == {'number': 1, 'size': 2, 'total_records': 3, 'total_pages': 2}
+
+
+def test_mods_search_skips_hidden_before_paging(test_client, mods):
+    test_client.get('/mods?filter%5Bsearch%5D=baz')
+    with db.connection:
+        db.connection.cursor().execute("UPDATE mod_version SET hidden = 1 WHERE uid = 'bar'")
+
+    ids = []
+    for page in (1, 2):
+        response = test_client.get('/mods?filter%5Bsearch%5D=baz&page%5Bsize%5D=1&page%5Bnumber%5D={}'.format(page))
+        result = json.loads(response.data.decode('utf-8'))
+        assert len(result['data']) == 1
+        assert result['meta']['page']['total_records'] == 2
+        ids.append(result['data'][0]['id'])
+
+    assert sorted(ids) == ['EA040F8E-857A-4566-9879-0D37420A5B9D', 'baz']
+
+
+def test_mods_sync(test_client, mods):
+    response = test_client.post('/mods/sync', data=json.dumps({'uids': ['foo', 'bar', 'baz', 'unknown']}),
+                                content_type='application/json')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    mods_by_uid = {item['uid']: item for item in result['mods']}
+    assert len(mods_by_uid) == 3
+    assert mods_by_uid['foo']['outdated']
+    assert mods_by_uid['foo']['newest_uid'] == 'bar'
+    assert mods_by_uid['foo']['newest_version'] == 2
+    assert mods_by_uid['foo']['download_url'] == 'http://content.faforever.com/faf/vault/foobar2.zip'
+    assert not mods_by_uid['bar']['outdated']
+    assert not mods_by_uid['baz']['outdated']
+    assert result['unknown_uids'] == ['unknown']
+
+
+def test_mods_sync_uids_missing(test_client, mods):
+    response = test_client.post('/mods/sync', data=json.dumps({}), content_type='application/json')
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.PARAMETER_MISSING.value['code']
+
+
+def test_mods_sync_too_many_uids(test_client, mods):
+    response = test_client.post('/mods/sync', data=json.dumps({'uids': ['foo'] * 1001}),
+                                content_type='application/json')
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.QUERY_TOO_MANY_IDS.value['code']
+    assert result['errors'][0]['meta']['args'] == [1000, 1001]
+
+
 def test_mods_upload_no_file_results_400(oauth, app, tmpdir):
     response = oauth.post('/mods/upload')
 
@@ -375,3 +457,27 @@ def test_mod_upload(oauth, mods, upload_dir, thumbnail_dir):
         assert result['likes'] == 0
         assert result['downloads'] == 0
         assert result['times_played'] == 0
+
+        cursor.execute("SELECT version FROM mod_latest_version WHERE mod_id = %s", mod_id)
+        result = cursor.fetchone()
+
+        assert result['version'] == 3
+
+
+def test_mod_latest_version_migration(mods):
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("DELETE FROM mod_latest_version WHERE mod_id = 2")
+        cursor.execute("UPDATE mod_latest_version SET version = 1 WHERE mod_id = 1")
+
+        apply_migration(cursor, '001_mod_latest_version.sql')
+
+    with db.connection:
+        cursor = db.connection.cursor(DictCursor)
+        cursor.execute("SELECT mod_id, version FROM mod_latest_version ORDER BY mod_id")
+
+        assert cursor.fetchall() == [
+            {'mod_id': 1, 'version': 2},
+            {'mod_id': 2, 'version': 1},
+            {'mod_id': 3, 'version': 1}
+        ]
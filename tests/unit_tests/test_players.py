@@ -8,6 +8,7 @@ import pytest
 import api
 from faf import db
 from api import User
+from api.error import ErrorCode
 
 
 @pytest.fixture
@@ -121,6 +122,85 @@ def test_players_1v1_history(test_client, test_data):
     }
 
 
+def test_players_global_history_twice(test_client, test_data):
+    first = test_client.get('/players/1/ratings/global/history')
+    second = test_client.get('/players/1/ratings/global/history')
+
+    assert second.status_code == 200
+    assert json.loads(second.data.decode('utf-8')) == json.loads(first.data.decode('utf-8'))
+
+
+def test_players_global_history_appends_new_games(test_client, test_data):
+    test_client.get('/players/1/ratings/global/history')
+
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("UPDATE game_player_stats SET after_mean = 1410, after_deviation = 140 WHERE id = 6")
+
+    response = test_client.get('/players/1/ratings/global/history')
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data']['attributes']['history'] == {
+        '1476276660': [1390.0, 110.0],
+        '1476280260': [1401.0, 150.0],
+        '1476283860': [1405.0, 149.0],
+        '1476287460': [1410.0, 140.0]
+    }
+
+
+def test_players_global_history_appends_games_scored_in_the_same_second(test_client, test_data):
+    test_client.get('/players/1/ratings/global/history')
+
+    with db.connection:
+        cursor = db.connection.cursor()
+        cursor.execute("""INSERT INTO game_stats
+        (id, startTime, gameType, gameMod, host, mapId, gameName, validity) VALUES
+        (8, '2016-10-12T14:40', 1, 1, 1, 1, '', 0)""")
+        cursor.execute("""INSERT INTO game_player_stats
+        (id, gameId, playerId, AI, faction, color, team, place, mean, deviation, after_mean, after_deviation, score,
+         scoreTime) VALUES
+        (10, 8, 1, 0, 1, 1, 1, 1, 1405, 149, 1420, 145, 0, '2016-10-12T14:51')""")
+
+    response = test_client.get('/players/1/ratings/global/history')
+
+    result = json.loads(response.data.decode('utf-8'))
+    # Both games were scored at the same time, the later one's rating is returned
+    assert result['data']['attributes']['history'] == {
+        '1476276660': [1390.0, 110.0],
+        '1476280260': [1401.0, 150.0],
+        '1476283860': [1420.0, 145.0]
+    }
+
+
+def test_players_global_history_time_range(test_client, test_data):
+    response = test_client.get('/players/1/ratings/global/history?from=1476280000&to=1476283000')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['data']['attributes']['history'] == {
+        '1476280260': [1401.0, 150.0]
+    }
+
+
+def test_players_global_history_max_points(test_client, test_data):
+    response = test_client.get('/players/1/ratings/global/history?max_points=3')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert len(result['data']['attributes']['history']) == 3
+
+
+def test_players_global_history_invalid_max_points(test_client, test_data):
+    response = test_client.get('/players/1/ratings/global/history?max_points=2')
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.QUERY_INVALID_MAX_POINTS.value['code']
+
+
 def test_get_player(test_client, test_data):
     response = test_client.get('/players/2')
 
@@ -145,6 +225,43 @@ def test_get_player_by_name(test_client, test_data):
         'login': 'b'
     }
 
+def test_get_players_by_id(test_client, test_data):
+    response = test_client.get('/players?filter[id]=1,3,999&sort=id')
+
+    assert response.status_code == 200
+    assert response.content_type == 'application/vnd.api+json'
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [item['attributes'] for item in result['data']] == [
+        {'id': '1', 'login': 'a'},
+        {'id': '3', 'login': 'c'}
+    ]
+
+def test_get_players_by_login(test_client, test_data):
+    response = test_client.get('/players?filter[login]=b,A_Long_Name&sort=id')
+
+    assert response.status_code == 200
+
+    result = json.loads(response.data.decode('utf-8'))
+    assert [item['id'] for item in result['data']] == ['2', '4']
+
+def test_get_players_without_filter(test_client, test_data):
+    response = test_client.get('/players')
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.PARAMETER_MISSING.value['code']
+
+def test_get_players_too_many(test_client, test_data):
+    response = test_client.get('/players?filter[id]=' + ','.join(str(i) for i in range(201)))
+
+    result = json.loads(response.data.decode('utf-8'))
+
+    assert response.status_code == 400
+    assert result['errors'][0]['code'] == ErrorCode.QUERY_TOO_MANY_IDS.value['code']
+    assert result['errors'][0]['meta']['args'] == [200, 201]
+
 def test_player_search(test_client, test_data):
     response = test_client.get('/players/prefix/A_Long')
 
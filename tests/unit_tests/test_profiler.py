@@ -0,0 +1,71 @@
+import sys
+import threading
+
+from api.profiler import SamplingProfiler, TRUNCATED_STACK, collapse
+
+
+def innermost():
+    return sys._getframe()
+
+
+def outer():
+    return innermost()
+
+
+def test_collapse():
+    stack = collapse(outer(), 100)
+
+    assert stack.endswith(';{0}:outer:{1};{0}:innermost:{2}'.format(
+        __name__, outer.__code__.co_firstlineno, innermost.__code__.co_firstlineno))
+    assert collapse(outer(), 1) == '{}:innermost:{}'.format(__name__, innermost.__code__.co_firstlineno)
+
+
+def test_requests_are_not_profiled_if_disabled():
+    profiler = SamplingProfiler(sample_rate=0)
+
+    profiler.start_request('maps')
+    profiler.sample()
+
+    assert profiler.collapsed() == ''
+
+
+def test_sample():
+    profiler = SamplingProfiler(sample_rate=1)
+    started = threading.Event()
+    done = threading.Event()
+
+    def handle_request():
+        profiler.start_request('maps')
+        started.set()
+        done.wait()
+        profiler.stop_request()
+
+    thread = threading.Thread(target=handle_request)
+    thread.start()
+    started.wait()
+    profiler.sample()
+    profiler.sample()
+    done.set()
+    thread.join()
+
+    lines = profiler.collapsed().splitlines()
+    assert len(lines) == 1
+    assert lines[0].startswith('maps;')
+    assert ';{}:handle_request:'.format(__name__) in lines[0]
+    assert lines[0].endswith(' 2')
+    assert profiler.collapsed('mods') == ''
+
+    profiler.clear()
+
+    assert profiler.collapsed() == ''
+
+
+def test_distinct_stacks_are_limited():
+    profiler = SamplingProfiler(sample_rate=1, max_stacks=1)
+    profiler._active = {threading.get_ident(): 'maps'}
+
+    profiler.sample()
+    first_stack = profiler.collapsed().strip()
+    (lambda: profiler.sample())()
+
+    assert set(profiler.collapsed().splitlines()) == {first_stack, 'maps;{} 1'.format(TRUNCATED_STACK)}
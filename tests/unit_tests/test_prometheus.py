@@ -0,0 +1,161 @@
+import json
+import os
+
+from api.prometheus import CallbackGauge, Counter, CountingCache, CountingGrantProvider, Gauge, Histogram, Registry, \
+    counting_getter
+
+# A PID that isn't used by a running process
+EXITED_PID = 2 ** 22 + 1
+
+
+class DictCache(object):
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def test_histogram():
+    histogram = Histogram('request_duration_seconds', 'Request duration.', ('endpoint',), buckets=(0.5, 1))
+
+    histogram.observe(0.25, 'maps')
+    histogram.observe(0.5, 'maps')
+    histogram.observe(2.5, 'maps')
+
+    assert histogram.render() == [
+        '# HELP request_duration_seconds Request duration.',
+        '# TYPE request_duration_seconds histogram',
+        'request_duration_seconds_bucket{endpoint="maps",le="0.5"} 2',
+        'request_duration_seconds_bucket{endpoint="maps",le="1.0"} 2',
+        'request_duration_seconds_bucket{endpoint="maps",le="+Inf"} 3',
+        'request_duration_seconds_sum{endpoint="maps"} 3.25',
+        'request_duration_seconds_count{endpoint="maps"} 3'
+    ]
+
+
+def test_counter_escapes_labels():
+    counter = Counter('errors_total', 'Errors.', ('message',))
+
+    counter.inc('say "hi"\\\n')
+    counter.inc('say "hi"\\\n', amount=2)
+
+    assert counter.render()[2] == 'errors_total{message="say \\"hi\\"\\\\\\n"} 3'
+
+
+def test_gauge_tracks_in_progress():
+    gauge = Gauge('uploads_in_progress', 'Uploads.', ('type',))
+
+    with gauge.track_in_progress('map'):
+        assert gauge.render()[2] == 'uploads_in_progress{type="map"} 1'
+
+    assert gauge.render()[2] == 'uploads_in_progress{type="map"} 0'
+
+
+def test_registry_renders_callback_gauges():
+    registry = Registry()
+    registry.register(CallbackGauge('workers', 'Workers.', lambda: 2))
+    registry.register(CallbackGauge('cache_size', 'Cache size.', lambda: {('entries',): 5}, ('unit',)))
+
+    assert registry.render() == ('# HELP workers Workers.\n'
+                                 '# TYPE workers gauge\n'
+                                 'workers 2\n'
+                                 '# HELP cache_size Cache size.\n'
+                                 '# TYPE cache_size gauge\n'
+                                 'cache_size{unit="entries"} 5\n')
+
+
+def test_counting_cache():
+    counter = Counter('cache_requests_total', 'Cache lookups.', ('cache', 'result'))
+    cache = CountingCache(DictCache({'a': 1}), 'flask_cache', counter)
+
+    cache.get('a')
+    cache.get('b')
+    cache.set('b', 2)
+    cache.get('b')
+
+    assert counter.render()[2:] == ['cache_requests_total{cache="flask_cache",result="hit"} 2',
+                                    'cache_requests_total{cache="flask_cache",result="miss"} 1']
+
+
+def test_counting_getter():
+    counter = Counter('cache_requests_total', 'Cache lookups.', ('cache', 'result'))
+    getter = counting_getter(lambda client_id, code: None, 'oauth_grant', counter)
+
+    assert getter('client', 'code') is None
+    assert counter.render()[2:] == ['cache_requests_total{cache="oauth_grant",result="miss"} 1']
+
+
+def test_counting_grant_provider():
+    class Provider(object):
+        def grantgetter(self, getter):
+            self._grantgetter = getter
+            return getter
+
+    provider = Provider()
+    counter = Counter('cache_requests_total', 'Cache lookups.', ('cache', 'result'))
+
+    @CountingGrantProvider(provider, 'oauth_grant', counter).grantgetter
+    def get(client_id, code):
+        return 'grant'
+
+    assert provider._grantgetter('client', 'code') == 'grant'
+    assert counter.render()[2:] == ['cache_requests_total{cache="oauth_grant",result="hit"} 1']
+
+
+def write_process_file(directory, pid, data):
+    with open(os.path.join(str(directory), '{}.json'.format(pid)), 'w') as file:
+        json.dump(data, file)
+
+
+def test_registry_aggregates_processes(tmpdir):
+    registry = Registry()
+    registry.configure(directory=str(tmpdir))
+    counter = registry.register(Counter('requests_total', 'Requests.', ('endpoint',)))
+    gauge = registry.register(Gauge('uploads_in_progress', 'Uploads.'))
+    histogram = registry.register(Histogram('duration_seconds', 'Duration.', buckets=(1,)))
+    counter.inc('maps')
+    gauge.inc()
+    histogram.observe(0.5)
+
+    write_process_file(tmpdir, os.getppid(), {'requests_total': [[['maps'], 2], [['mods'], 1]],
+                                              'uploads_in_progress': [[[], 1]],
+                                              'duration_seconds': [[[], [[0, 1], 2.5]]]})
+    write_process_file(tmpdir, EXITED_PID, {'requests_total': [[['maps'], 4]], 'uploads_in_progress': [[[], 3]]})
+
+    assert registry.render() == ('# HELP requests_total Requests.\n'
+                                 '# TYPE requests_total counter\n'
+                                 'requests_total{endpoint="maps"} 7\n'
+                                 'requests_total{endpoint="mods"} 1\n'
+                                 '# HELP uploads_in_progress Uploads.\n'
+                                 '# TYPE uploads_in_progress gauge\n'
+                                 'uploads_in_progress 2\n'
+                                 '# HELP duration_seconds Duration.\n'
+                                 '# TYPE duration_seconds histogram\n'
+                                 'duration_seconds_bucket{le="1.0"} 1\n'
+                                 'duration_seconds_bucket{le="+Inf"} 2\n'
+                                 'duration_seconds_sum 3.0\n'
+                                 'duration_seconds_count 2\n')
+    assert os.path.exists(os.path.join(str(tmpdir), '{}.json'.format(os.getpid())))
+
+
+def test_registry_archives_exited_processes(tmpdir):
+    registry = Registry()
+    registry.configure(directory=str(tmpdir))
+    counter = registry.register(Counter('requests_total', 'Requests.', ('endpoint',)))
+    registry.register(Gauge('uploads_in_progress', 'Uploads.'))
+    counter.inc('maps')
+
+    write_process_file(tmpdir, EXITED_PID, {'requests_total': [[['maps'], 4]], 'uploads_in_progress': [[[], 3]]})
+
+    rendered = registry.render()
+    assert 'requests_total{endpoint="maps"} 5\n' in rendered
+    assert 'uploads_in_progress 3' not in rendered
+    assert registry.render() == rendered
+
+    assert not os.path.exists(os.path.join(str(tmpdir), '{}.json'.format(EXITED_PID)))
+    with open(os.path.join(str(tmpdir), 'archive.json')) as file:
+        assert json.load(file) == {'requests_total': [[['maps'], 4]]}
@@ -1,8 +1,10 @@
+from unittest.mock import patch
+
 import pytest
 
 from api import ApiException
 from api.error import Error, ErrorCode
-from api.query_commons import get_select_expressions, get_order_by, get_limit
+from api.query_commons import DatabaseClock, get_select_expressions, get_order_by, get_limit, sort_items
 
 FIELD_EXPRESSION_DICT = {
     'id': 'map.uid',
@@ -92,3 +94,51 @@ def test_get_order_by_invalid_column():
 
 def test_get_limit():
     assert get_limit(3, 11) == 'LIMIT 22, 11'
+
+
+def test_sort_items():
+    items = [
+        {'id': 1, 'likes': 3, 'timestamp': 20},
+        {'id': 2, 'likes': 5, 'timestamp': 10},
+        {'id': 3, 'likes': 3, 'timestamp': 30},
+        {'id': 4, 'likes': None, 'timestamp': 40}
+    ]
+
+    sort_items(items, 'likes,-timestamp', FIELD_EXPRESSION_DICT)
+
+    assert [item['id'] for item in items] == [4, 3, 1, 2]
+
+
+def test_sort_items_empty():
+    items = [{'id': 2}, {'id': 1}]
+
+    sort_items(items, '', FIELD_EXPRESSION_DICT)
+
+    assert items == [{'id': 2}, {'id': 1}]
+
+
+def test_sort_items_invalid_column():
+    with pytest.raises(ApiException) as exception:
+        sort_items([], 'foobar', FIELD_EXPRESSION_DICT)
+
+    assert exception.value.errors[0].code == ErrorCode.QUERY_INVALID_SORT_FIELD
+    assert exception.value.errors[0].args == ('foobar',)
+
+
+def test_database_clock_only_checks_the_database_periodically():
+    clock = DatabaseClock(check_interval=600)
+
+    with patch('api.query_commons.db') as db, patch('api.query_commons.time.time') as time:
+        cursor = db.connection.cursor.return_value
+        cursor.fetchone.return_value = (1000,)
+
+        time.return_value = 100.5
+        assert clock.time() == 1000
+        time.return_value = 400.5
+        assert clock.time() == 1300
+        assert cursor.execute.call_count == 1
+
+        cursor.fetchone.return_value = (1550,)
+        time.return_value = 700.5
+        assert clock.time() == 1550
+        assert cursor.execute.call_count == 2
@@ -0,0 +1,64 @@
+from api.rating_distribution import RatingDistribution
+
+
+def create_distribution():
+    distribution = RatingDistribution('ladder1v1_rating', poll_interval=3600)
+    # Pretend the table has been loaded already, so no database is needed
+    distribution._last_poll = float('inf')
+    return distribution
+
+
+def test_update_player():
+    distribution = create_distribution()
+    distribution.update_player(1, 1500, 100, 10, True)
+    distribution.update_player(2, 1520, 100, 10, True)
+    distribution.update_player(3, 800, 50, 10, True)
+
+    assert distribution.distribution() == {600: 1, 1200: 2}
+    assert distribution.distribution(10) == {650: 1, 1200: 1, 1220: 1}
+
+
+def test_update_player_moves_bucket():
+    distribution = create_distribution()
+    distribution.update_player(1, 1500, 100, 10, True)
+    distribution.update_player(1, 2000, 100, 11, True)
+
+    assert distribution.distribution() == {1700: 1}
+
+
+def test_update_player_removes_inactive():
+    distribution = create_distribution()
+    distribution.update_player(1, 1500, 100, 10, True)
+    distribution.update_player(1, 1500, 100, 10, False)
+    distribution.update_player(2, 1500, 300, 10, True)
+    distribution.update_player(3, 1500, 100, 0, True)
+
+    assert distribution.distribution() == {}
+
+
+def test_negative_ratings():
+    distribution = create_distribution()
+    distribution.update_player(1, 0, 240, 10, True)
+
+    assert distribution.distribution() == {-800: 1}
+    assert distribution.distribution(10) == {-720: 1}
+
+
+def test_percentiles():
+    distribution = create_distribution()
+    for player_id in range(100):
+        distribution.update_player(player_id, 1000 + 10 * player_id, 0, 1, True)
+
+    assert distribution.percentile(500) == 0
+    assert distribution.percentile(1500) == 50
+    assert distribution.percentile(5000) == 100
+    assert distribution.rating_at_percentile(50) == 1490
+    assert distribution.rating_at_percentile(0) == 1000
+    assert distribution.rating_at_percentile(100) == 1990
+
+
+def test_percentiles_empty():
+    distribution = create_distribution()
+
+    assert distribution.percentile(1500) == 0
+    assert distribution.rating_at_percentile(50) is None
@@ -0,0 +1,183 @@
+import gzip
+import hashlib
+import time
+
+from api.response_cache import CacheEntry, ResponseCache, ENTRY_OVERHEAD_BYTES
+
+
+def entry(body, *tags, expires=None):
+    return CacheEntry(body, 200, [], tags, expires or time.time() + 60)
+
+
+def test_get_and_set():
+    cache = ResponseCache(lambda: 'key')
+
+    cache.set('/maps?', entry(b'maps', 'maps'))
+
+    assert cache.get('/maps?').body == b'maps'
+    assert cache.get('/mods?') is None
+
+
+def test_expired_entries_are_removed():
+    cache = ResponseCache(lambda: 'key')
+
+    cache.set('/maps?', entry(b'maps', 'maps', expires=time.time() - 1))
+
+    assert cache.get('/maps?') is None
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_purge():
+    cache = ResponseCache(lambda: 'key')
+    cache.set('/maps?', entry(b'maps', 'maps'))
+    cache.set('/maps/1?', entry(b'map', 'maps'))
+    cache.set('/mods?', entry(b'mods', 'mods'))
+
+    cache.purge('maps', 'avatars')
+
+    assert cache.get('/maps?') is None
+    assert cache.get('/maps/1?') is None
+    assert cache.get('/mods?').body == b'mods'
+
+
+class SharedTagVersions(object):
+    def __init__(self):
+        self.versions = {}
+
+    def load(self):
+        return dict(self.versions)
+
+    def increment(self, tags):
+        for tag in tags:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+        return {tag: self.versions[tag] for tag in tags}
+
+
+def test_purge_reaches_other_processes():
+    tag_versions = SharedTagVersions()
+    cache = ResponseCache(lambda: 'key', tag_versions=tag_versions, sync_interval=5)
+    other_cache = ResponseCache(lambda: 'key', tag_versions=tag_versions, sync_interval=5)
+    cache.sync(now=100)
+    cache.set('/maps?', entry(b'maps', 'maps'))
+    cache.set('/mods?', entry(b'mods', 'mods'))
+
+    other_cache.purge('maps')
+
+    cache.sync(now=102)
+    assert cache.get('/maps?') is not None
+
+    cache.sync(now=105)
+    assert cache.get('/maps?') is None
+    assert cache.get('/mods?').body == b'mods'
+
+
+def test_own_purges_are_not_repeated_on_sync():
+    cache = ResponseCache(lambda: 'key', tag_versions=SharedTagVersions(), sync_interval=5)
+    cache.sync(now=100)
+
+    cache.purge('maps')
+    cache.set('/maps?', entry(b'maps', 'maps'))
+    cache.sync(now=105)
+
+    assert cache.get('/maps?').body == b'maps'
+
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(lambda: 'key', max_bytes=2 * (ENTRY_OVERHEAD_BYTES + 10))
+    cache.set('a', entry(b'0123456789', 'maps'))
+    cache.set('b', entry(b'0123456789', 'maps'))
+    cache.get('a')
+
+    cache.set('c', entry(b'0123456789', 'maps'))
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert cache.nbytes == 2 * (ENTRY_OVERHEAD_BYTES + 10)
+
+
+def test_entries_larger_than_the_limit_are_not_cached():
+    cache = ResponseCache(lambda: 'key', max_bytes=ENTRY_OVERHEAD_BYTES)
+
+    cache.set('a', entry(b'0123456789', 'maps'))
+
+    assert cache.get('a') is None
+
+
+def test_replacing_an_entry_updates_tags():
+    cache = ResponseCache(lambda: 'key')
+    cache.set('a', entry(b'old', 'maps'))
+    cache.set('a', entry(b'new', 'mods'))
+
+    cache.purge('maps')
+
+    assert cache.get('a').body == b'new'
+
+
+def test_stale_entries_are_served_until_they_are_too_stale():
+    cache = ResponseCache(lambda: 'key')
+    now = time.time()
+    cache.set('fresh', CacheEntry(b'fresh', 200, [], ('mods',), now + 60, now + 120))
+    cache.set('stale', CacheEntry(b'stale', 200, [], ('mods',), now - 1, now + 60))
+    cache.set('gone', CacheEntry(b'gone', 200, [], ('mods',), now - 60, now - 1))
+
+    assert cache.get('stale') is None
+    assert cache.get('stale', stale=True).body == b'stale'
+    assert cache.get('fresh', stale=True).body == b'fresh'
+    assert cache.get('gone', stale=True) is None
+    assert len(cache) == 2
+
+
+def test_entries_computed_before_a_purge_are_discarded():
+    cache = ResponseCache(lambda: 'key')
+    generation = cache._generation
+
+    cache.purge('mods')
+    cache.set('/mods?', entry(b'mods', 'mods'), generation)
+
+    assert cache.get('/mods?') is None
+
+
+def test_only_the_first_request_of_a_key_computes_it():
+    cache = ResponseCache(lambda: 'key')
+
+    flight, leader = cache._join_flight('/mods?')
+    other_flight, other_leader = cache._join_flight('/mods?')
+    _, unrelated_leader = cache._join_flight('/maps?')
+
+    assert leader
+    assert not other_leader
+    assert other_flight is flight
+    assert unrelated_leader
+
+    cache._land_flight('/mods?', flight)
+
+    assert flight.is_set()
+    assert cache._join_flight('/mods?')[1]
+
+
+def test_conditional_requests():
+    cached = entry(b'mods', 'mods')
+
+    assert cached.is_not_modified({cached.etag})
+    assert cached.is_not_modified({'*'})
+    assert not cached.is_not_modified({'0' * 40})
+    assert not cached.is_not_modified(set())
+
+
+def test_validators():
+    cached = CacheEntry(b'mods', 200, [], ('mods',), time.time() + 60)
+
+    # Only the ETag, which is the same in every process, unlike the time the entry was cached
+    assert cached.validators() == [('ETag', '"{}"'.format(hashlib.sha1(b'mods').hexdigest()))]
+    assert cached.validators('gzip') == [('ETag', '"{}-gzip"'.format(hashlib.sha1(b'mods').hexdigest()))]
+
+
+def test_compressed_representations_have_their_own_etag():
+    cached = CacheEntry(b'mods', 200, [], ('mods',), time.time() + 60,
+                        encoded_bodies={'gzip': gzip.compress(b'mods')})
+
+    assert cached.is_not_modified({cached.etag + '-gzip'}, 'gzip')
+    assert not cached.is_not_modified({cached.etag}, 'gzip')
+    assert cached.size == 4 + len(cached.encoded_bodies['gzip']) + ENTRY_OVERHEAD_BYTES
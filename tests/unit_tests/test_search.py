@@ -0,0 +1,89 @@
+import time
+from unittest.mock import patch
+
+from api.search import SearchIndex, tokenize
+
+DOCUMENTS = [
+    {'id': 1, 'watermark': 1, 'display_name': 'Seton\'s Clutch', 'description': 'A classic', 'author': 'GPG'},
+    {'id': 2, 'watermark': 2, 'display_name': 'Setons Remake', 'description': 'Seton\'s Clutch, but better',
+     'author': 'Someone'},
+    {'id': 3, 'watermark': 3, 'display_name': 'Dual Gap', 'description': 'Two gaps', 'author': 'GPG'},
+]
+
+FIELD_WEIGHTS = {'display_name': 3, 'author': 2, 'description': 1}
+
+
+def create_index(documents):
+    def loader(after=None):
+        return [document for document in documents if after is None or document['watermark'] > after]
+
+    return SearchIndex(loader, FIELD_WEIGHTS)
+
+
+def test_tokenize():
+    assert tokenize('Seton\'s Clutch, v2') == ['seton', 's', 'clutch', 'v2']
+    assert tokenize(None) == []
+
+
+def test_search_ranks_name_matches_first():
+    index = create_index(DOCUMENTS)
+
+    assert index.search('clutch') == ['1', '2']
+
+
+def test_search_requires_all_terms():
+    index = create_index(DOCUMENTS)
+
+    assert index.search('gpg gap') == ['3']
+    assert index.search('gpg remake') == []
+
+
+def test_search_prefix():
+    index = create_index(DOCUMENTS)
+
+    assert index.search('du') == ['3']
+
+
+def test_search_empty_query():
+    index = create_index(DOCUMENTS)
+
+    assert index.search(' ') == []
+
+
+def test_refresh_is_incremental():
+    documents = list(DOCUMENTS)
+    index = create_index(documents)
+    index.search('gap')
+
+    documents.append({'id': 4, 'watermark': 4, 'display_name': 'Gap of Rohan', 'description': '', 'author': 'x'})
+    index.notify_update()
+
+    assert len(index) == 4
+    assert index.search('rohan') == ['4']
+
+
+def test_group_replaces_document():
+    index = create_index([])
+    index.update({'id': 'a', 'group': 1, 'display_name': 'Old name'})
+    index.update({'id': 'b', 'group': 1, 'display_name': 'New name'})
+
+    assert len(index) == 1
+    assert index.search('name') == ['b']
+    assert index.search('old') == []
+
+
+def test_rebuild_drops_changed_documents():
+    documents = list(DOCUMENTS)
+    index = create_index(documents)
+    index.search('gap')
+
+    del documents[2]
+    documents[0] = dict(documents[0], display_name='Setons Original')
+
+    # Changes of existing documents aren't seen by refreshes, only by the periodic rebuild
+    with patch('api.search.time.time', return_value=time.time() + 60):
+        assert index.search('gap') == ['3']
+
+    with patch('api.search.time.time', return_value=time.time() + 3600):
+        assert index.search('gap') == []
+        assert index.search('original') == ['1']
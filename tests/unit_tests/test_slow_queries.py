@@ -0,0 +1,81 @@
+from api.slow_queries import SlowQueryLog, normalize
+
+
+class ExplainCursor(object):
+    description = (('id',), ('table',), ('rows',))
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql, args=None):
+        self.executed.append((sql, args))
+
+    def fetchall(self):
+        return [(1, 'map', 4211)]
+
+
+def test_normalize():
+    assert normalize("SELECT id FROM map  WHERE name = 'Setons Clutch' AND id IN (1, 2, 3)\n LIMIT 0, 1000") == \
+        'SELECT id FROM map WHERE name = ? AND id IN (...) LIMIT ?, ?'
+    assert normalize('SELECT id FROM map WHERE id = %s AND author = %(author)s') == \
+        'SELECT id FROM map WHERE id = ? AND author = ?'
+
+
+def test_fast_queries_are_not_recorded():
+    log = SlowQueryLog(threshold=100)
+
+    log.record('SELECT * FROM map', None, 'maps', 99, 10)
+
+    assert log.top() == []
+
+
+def test_disabled():
+    log = SlowQueryLog()
+
+    log.record('SELECT * FROM map', None, 'maps', 10000, 10)
+
+    assert not log.enabled
+    assert log.top() == []
+
+
+def test_aggregates_by_shape():
+    log = SlowQueryLog(threshold=100)
+
+    log.record('SELECT * FROM map LIMIT 0, 100', None, 'maps', 100, 100)
+    log.record('SELECT * FROM map LIMIT 100, 100', None, 'maps_ladder1v1', 300, 50)
+    log.record('SELECT * FROM mods', None, 'mods', 350, 1000)
+
+    top = log.top()
+    assert [query_shape['shape'] for query_shape in top] == ['SELECT * FROM map LIMIT ?, ?', 'SELECT * FROM mods']
+    assert top[0]['count'] == 2
+    assert top[0]['mean_time'] == 200
+    assert top[0]['max_time'] == 300
+    assert top[0]['endpoints'] == ['maps', 'maps_ladder1v1']
+    assert top[0]['last_sql'] == 'SELECT * FROM map LIMIT 100, 100'
+    assert top[0]['last_row_count'] == 50
+
+    assert [query_shape['shape'] for query_shape in log.top(sort='max_time')] == \
+        ['SELECT * FROM mods', 'SELECT * FROM map LIMIT ?, ?']
+    assert len(log.top(limit=1)) == 1
+
+
+def test_drops_shape_with_lowest_total_time():
+    log = SlowQueryLog(threshold=100, max_shapes=2)
+
+    log.record('SELECT * FROM map', None, 'maps', 200, 1)
+    log.record('SELECT * FROM mods', None, 'mods', 100, 1)
+    log.record('SELECT * FROM login', None, 'players', 150, 1)
+
+    assert [query_shape['shape'] for query_shape in log.top()] == ['SELECT * FROM map', 'SELECT * FROM login']
+
+
+def test_explains_each_shape_once():
+    log = SlowQueryLog(threshold=100, explain=True)
+    cursor = ExplainCursor()
+
+    log.record('SELECT * FROM map WHERE id = %s', (1,), 'maps', 200, 1, cursor)
+    log.record('SELECT * FROM map WHERE id = %s', (2,), 'maps', 200, 1, cursor)
+    log.record('UPDATE map SET name = %s', ('x',), 'maps', 200, 1, cursor)
+
+    assert cursor.executed == [('EXPLAIN SELECT * FROM map WHERE id = %s', (1,))]
+    assert log.top()[0]['explain'] == [{'id': 1, 'table': 'map', 'rows': 4211}]